@@ -1,11 +1,47 @@
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+from pathlib import Path
+
 import uvicorn
 
 from app.core.settings import settings
+from app.db.migrate import run_migrations
 from app.gunicorn_runner import GunicornApplication
 
 
-def main() -> None:
-    """Entrypoint of the application."""
+def set_multiproc_dir() -> None:
+    """
+    Sets mutiproc_dir env variable.
+
+    This function cleans up the multiprocess directory
+    and recreates it. This actions are required by prometheus-client
+    to share metrics between processes.
+
+    After cleanup, it sets two variables.
+    Uppercase and lowercase because different
+    versions of the prometheus-client library
+    depend on different environment variables,
+    so I've decided to export all needed variables,
+    to avoid undefined behaviour.
+    """
+    shutil.rmtree(settings.prometheus_dir, ignore_errors=True)
+    os.makedirs(settings.prometheus_dir, exist_ok=True)  # noqa: PTH103
+    os.environ["prometheus_multiproc_dir"] = str(  # noqa: SIM112
+        settings.prometheus_dir.expanduser().absolute(),
+    )
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = str(
+        settings.prometheus_dir.expanduser().absolute(),
+    )
+
+
+def serve() -> None:
+    """Start the server."""
+    set_multiproc_dir()
+    if settings.migrate_on_start:
+        run_migrations()
     if settings.reload:
         uvicorn.run(
             "app.web.application:get_app",
@@ -26,11 +62,71 @@ def main() -> None:
             port=settings.port,
             workers=settings.workers_count,
             factory=True,
+            preload_app=settings.preload_app,
             accesslog="-",
             loglevel=settings.log_level.value.lower(),
             access_log_format='%r "-" %s "-" %Tf',
         ).run()
 
 
+async def snapshot(action: str, directory: Path, collections: list) -> None:
+    """
+    Export or restore collections of the vector store.
+
+    :param action: "export" or "restore".
+    :param directory: directory of the snapshot.
+    :param collections: collections to transfer, all of them if empty.
+    """
+    # Imported lazily, the server does not need pyarrow in the master.
+    from app.db.session import engine
+    from app.utils.snapshot import export_snapshot, restore_snapshot
+
+    transfer = export_snapshot if action == "export" else restore_snapshot
+    try:
+        counts = await transfer(directory, collections or None)
+    finally:
+        await engine.dispose()
+    logging.info(f"Snapshot {action}: {sum(counts.values())} records.")
+
+
+def main() -> None:
+    """Entrypoint of the application."""
+    parser = argparse.ArgumentParser(prog="python -m app")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="Start the server (default).")
+    migrate_parser = commands.add_parser(
+        "migrate",
+        help="Create the database schema and exit.",
+    )
+    migrate_parser.add_argument(
+        "--drop-legacy",
+        action="store_true",
+        help="Drop a records table created before collections existed.",
+    )
+    snapshot_parser = commands.add_parser(
+        "snapshot",
+        help="Export or restore collections with their embeddings.",
+    )
+    snapshot_parser.add_argument("action", choices=("export", "restore"))
+    snapshot_parser.add_argument("directory", type=Path)
+    snapshot_parser.add_argument(
+        "-c",
+        "--collection",
+        action="append",
+        default=[],
+        help="Collection to transfer, may be repeated. Defaults to all.",
+    )
+    args = parser.parse_args()
+
+    if args.command in {"migrate", "snapshot"}:
+        logging.basicConfig(level=settings.log_level.value)
+    if args.command == "migrate":
+        run_migrations(args.drop_legacy)
+    elif args.command == "snapshot":
+        asyncio.run(snapshot(args.action, args.directory, args.collection))
+    else:
+        serve()
+
+
 if __name__ == "__main__":
     main()
@@ -1,14 +1,50 @@
+import atexit
+import copy
 import logging
 import logging.config
+import logging.handlers
 import os
 from pathlib import Path
+from queue import SimpleQueue
+from typing import Optional
 
 import yaml
 
 
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler không format record trong thread gọi log.
+
+    `QueueHandler.prepare` gốc format toàn bộ record trước khi đưa vào
+    queue. Ở đây thread gọi log chỉ ghép message với tham số của nó, để
+    record không phụ thuộc vào các object có thể bị thay đổi sau đó. Việc
+    format record, kể cả traceback, do handler đích thực hiện trên thread
+    của QueueListener. Queue nằm trong cùng process nên `exc_info` được
+    giữ nguyên.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Chuẩn bị record để đưa vào queue.
+
+        Args:
+            record (logging.LogRecord): Record cần ghi.
+
+        Returns:
+            logging.LogRecord: Bản sao của record với message đã ghép tham số.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
 class LoggerSetup:
     """Cấu hình logging cho ứng dụng từ file cấu hình YAML."""
 
+    # File cấu hình đã được nạp, mỗi process chỉ cấu hình một lần
+    _configured_path: Optional[str] = None
+
     @staticmethod
     def setup_logging(config_path: str) -> None:
         """
@@ -23,6 +59,9 @@ class LoggerSetup:
             yaml.YAMLError: Nếu cấu hình không hợp lệ.
             Exception: Nếu có lỗi khi cấu hình logger.
         """
+        if LoggerSetup._configured_path == str(config_path):
+            return
+
         # Đảm bảo folder log tồn tại
         log_dir = Path("logs")
         log_dir.mkdir(parents=True, exist_ok=True)
@@ -32,5 +71,57 @@ class LoggerSetup:
             config = yaml.safe_load(f.read())
             logging.config.dictConfig(config)
 
+        # Ghi log bất đồng bộ: handler được gọi từ một thread riêng
+        for logger_name in (None, *config.get("loggers", {})):
+            LoggerSetup._enqueue_handlers(logging.getLogger(logger_name))
+        LoggerSetup._configured_path = str(config_path)
+
         # Kiểm tra cấu hình đã thành công
         logging.info(f"Logging đã được cấu hình từ file: {config_path}")
+
+    @staticmethod
+    def _enqueue_handlers(logger: logging.Logger) -> None:
+        """
+        Chuyển các handler của logger sang một QueueListener.
+
+        Logger chỉ còn một `DeferredQueueHandler`: thread gọi log chỉ ghép
+        message với tham số, việc format record và ghi ra stdout hoặc file
+        được thực hiện bởi thread của QueueListener.
+
+        Args:
+            logger (logging.Logger): Logger cần chuyển handler.
+        """
+        handlers = [
+            handler
+            for handler in logger.handlers
+            if not isinstance(handler, logging.handlers.QueueHandler)
+        ]
+        if not handlers:
+            return
+        queue: SimpleQueue = SimpleQueue()
+        logger.handlers = [DeferredQueueHandler(queue)]
+        listeners = []
+
+        def start_listener() -> None:
+            listener = logging.handlers.QueueListener(
+                queue,
+                *handlers,
+                respect_handler_level=True,
+            )
+            listener.start()
+            listeners.append(listener)
+
+        def stop_listener() -> None:
+            if listeners:
+                listeners.pop().stop()
+
+        start_listener()
+        atexit.register(stop_listener)
+        # Khi master fork worker (preload_app), thread của listener không
+        # được giữ lại và có thể đang giữ lock của stream. Dừng listener
+        # trước khi fork, rồi chạy lại một listener trong mỗi process.
+        os.register_at_fork(
+            before=stop_listener,
+            after_in_parent=start_listener,
+            after_in_child=start_listener,
+        )
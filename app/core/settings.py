@@ -1,6 +1,7 @@
 import enum
 from pathlib import Path
 from tempfile import gettempdir
+from typing import List, Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from yarl import URL
@@ -50,6 +51,52 @@ class Settings(BaseSettings):
     db_pass: str = ""
     db_base: str = "app"
     db_echo: bool = False
+    # Read replicas serving searches, as "host" or "host:port", with the
+    # credentials and database of the primary. Empty to read from the primary.
+    db_replica_hosts: List[str] = []
+    # Connections of the asyncpg pool of each replica
+    replica_pool_size: int = 10
+    # Replication lag in seconds above which a replica is not read from
+    replica_max_lag: float = 5.0
+    # Seconds between checks of the replication position of the replicas
+    replica_poll_interval: float = 1.0
+    # Shards storing the records, as "host", "host:port" or "host:port/db",
+    # with the credentials of the primary, which keeps the catalog versions.
+    # Empty to store the records on the primary.
+    db_shard_hosts: List[str] = []
+    # Records are placed on a shard by hash of their collection, so searches
+    # hit a single shard, or by hash of their id, so collections spread over
+    # all shards and searches fan out to them
+    shard_placement: Literal["collection", "id"] = "collection"
+    # Connections of the asyncpg pool of each shard
+    shard_pool_size: int = 10
+    # Seconds a shard has to answer a search, slower shards are left out
+    shard_search_timeout: float = 1.0
+    # Connections of the asyncpg pool serving search queries
+    search_pool_size: int = 10
+    # Search with a prepared asyncpg statement selecting only the returned
+    # columns, rather than through the ORM
+    search_fast_path: bool = True
+
+    # Queries slower than this threshold are kept in the slow query log
+    slow_query_threshold_ms: float = 200.0
+    # Share of slow queries for which EXPLAIN (ANALYZE, BUFFERS) is captured
+    slow_query_explain_sample_rate: float = 0.1
+    # Number of slow queries kept per worker
+    slow_query_log_size: int = 100
+
+    # Event loop monitor: the loop is checked every interval in seconds and
+    # the stack of the running code is recorded once it is blocked longer
+    # than the threshold
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval: float = 0.05
+    loop_stall_threshold_ms: float = 100.0
+    # Number of loop stalls kept per worker
+    loop_stall_log_size: int = 100
+
+    # Token required in the X-Admin-Token header by admin endpoints.
+    # Admin endpoints are disabled while it is empty.
+    admin_token: str = ""
 
     # Path to the directory with media
     media_dir: str = "media"
@@ -58,6 +105,118 @@ class Settings(BaseSettings):
     open_api_key: str =""
     embedding_model: str =""
 
+    # Embedding backend: "openai", "local" (a sentence-transformers model
+    # on the CPU, requires sentence-transformers) or "hashing" (tests only)
+    embedding_backend: Literal["openai", "local", "hashing"] = "openai"
+    # Dimension of the embeddings, changing it requires recreating the tables
+    embedding_dim: int = 1536
+    # Directory with the weights of the local model
+    local_embedding_model_path: str = ""
+    # Runtime of the local model: "onnx" or "torch"
+    local_embedding_runtime: str = "onnx"
+    # Processes running the local model, per worker
+    local_embedding_workers: int = 2
+    # Maximum queries per local batch, and time a query waits for a batch
+    local_embedding_batch_size: int = 32
+    local_embedding_batch_wait_ms: float = 2.0
+
+    # Number of query embeddings cached per worker
+    embedding_cache_size: int = 10000
+    # Directory with the snapshot of the most frequent cached embeddings
+    embedding_cache_dir: Path = TEMP_DIR / "embedding_cache"
+    # Number of embeddings preloaded from the snapshot on startup
+    embedding_cache_preload: int = 1000
+
+    # Number of catalog rows embedded and inserted together during ingestion
+    ingest_batch_size: int = 1000
+    # Maximum number of texts sent in one embedding request
+    embedding_batch_size: int = 256
+    # Memory used to build the indexes of a loaded collection
+    index_build_memory: str = "1GB"
+    # Merge catalog rows whose contents only differ in case, whitespace or
+    # diacritics, and optionally the rows of a batch whose embeddings have at
+    # least this cosine similarity
+    ingest_dedup: bool = True
+    ingest_near_duplicate_similarity: Optional[float] = None
+    # Merged rows listed in the metadata of the row kept for them
+    ingest_dedup_max_sources: int = 20
+
+    # Bulk search: queries embedded together, searches of a batch run at
+    # once, and embedded batches read ahead of the searches
+    bulk_search_batch_size: int = 256
+    bulk_search_concurrency: int = 8
+    bulk_search_prefetch: int = 2
+
+    # Quota of the OpenAI account, shared by all workers of the host
+    openai_rpm_limit: int = 3000
+    openai_tpm_limit: int = 1000000
+    # Share of the quota only interactive requests can use
+    openai_interactive_reserve: float = 0.2
+    # Retries of calls rejected with 429 Too Many Requests
+    openai_rate_limit_retries: int = 3
+    # File with the state of the shared rate limiter
+    openai_rate_limit_path: Path = TEMP_DIR / "openai_rate_limit.bin"
+
+    # Connections to the LLM provider pooled per worker, in total and per
+    # host, seconds an idle one is kept open, and seconds DNS answers are cached
+    provider_pool_limit: int = 100
+    provider_pool_limit_per_host: int = 50
+    provider_keepalive_timeout: float = 60.0
+    provider_dns_ttl: int = 300
+
+    # Time budget of a /gen_response request in seconds
+    request_budget_seconds: float = 10.0
+    # Upper bounds of single embedding and completion calls in seconds
+    embedding_timeout: float = 3.0
+    completion_timeout: float = 8.0
+    # Consecutive failures opening the circuit of a provider, and seconds
+    # before a trial call is let through
+    circuit_failure_threshold: int = 5
+    circuit_reset_seconds: float = 30.0
+
+    # Admission control per worker: requests of /gen_response served at once
+    # and waiting for a slot, the same for each batch endpoint
+    admission_limit: int = 16
+    admission_queue_size: int = 32
+    admission_batch_limit: int = 2
+    admission_batch_queue_size: int = 4
+    # Longest wait for a slot in seconds, requests still waiting get a 503
+    admission_queue_timeout: float = 2.0
+
+    # Hierarchical search: number of level-1 categories picked by centroid
+    # similarity, and of level-2 categories searched within them
+    routing_level_1_categories: int = 3
+    routing_level_2_categories: int = 8
+
+    # Directory with downloaded sheets, named after the hash of their content
+    sheet_cache_dir: Path = TEMP_DIR / "sheets"
+    # Timeout of sheet downloads in seconds
+    sheet_fetch_timeout: float = 60.0
+    # Number of parsed sheets kept in memory per worker
+    sheet_parse_cache_size: int = 4
+
+    # Seconds before the typeahead index of a collection is rebuilt, even
+    # without a catalog change
+    suggest_max_age: float = 300.0
+
+    # Seconds between reads of the catalog versions, which catch up with the
+    # change notifications missed and check the listening connection
+    catalog_poll_interval: float = 30.0
+
+    # Warm up connections, caches and the vector index on startup
+    warm_up_enabled: bool = True
+    # Import the application in the gunicorn master before forking workers
+    preload_app: bool = True
+    # Directory with read-only state shared by workers as memory-mapped files
+    shared_state_dir: Path = TEMP_DIR / "shared_state"
+    # Migrate the database once before starting the server, disable it when
+    # migrations are run as a separate deployment step
+    migrate_on_start: bool = True
+
+    # This variable is used to define
+    # multiproc_dir. It's required for [uvi|guni]corn projects.
+    prometheus_dir: Path = TEMP_DIR / "prom"
+
     @property
     def db_url(self) -> URL:
         """
@@ -74,6 +233,39 @@ class Settings(BaseSettings):
             path=f"/{self.db_base}",
         )
 
+    @property
+    def db_replica_urls(self) -> List[URL]:
+        """
+        Assemble the URLs of the read replicas.
+
+        :return: database URL of each replica.
+        """
+        urls = []
+        for replica in self.db_replica_hosts:
+            host, _, port = replica.partition(":")
+            urls.append(
+                self.db_url.with_host(host).with_port(int(port or self.db_port)),
+            )
+        return urls
+
+    @property
+    def db_shard_urls(self) -> List[URL]:
+        """
+        Assemble the URLs of the shards.
+
+        :return: database URL of each shard.
+        """
+        urls = []
+        for shard in self.db_shard_hosts:
+            address, _, database = shard.partition("/")
+            host, _, port = address.partition(":")
+            urls.append(
+                self.db_url.with_host(host)
+                .with_port(int(port or self.db_port))
+                .with_path(f"/{database or self.db_base}"),
+            )
+        return urls
+
     @property
     def media_dir_static(self) -> Path:
         """
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import socket
+import time
+from contextlib import suppress
+from dataclasses import asdict
+from typing import Optional, Set
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from yarl import URL
+
+from app.core.settings import settings
+from app.db.replicas import replica_router
+from app.services.metrics import CATALOG_INVALIDATION_DELAY
+from app.utils.catalog_version import CatalogChange, CatalogVersions, catalog_versions
+
+logger = logging.getLogger(__name__)
+
+# Channel of the catalog change notifications
+CHANNEL = "catalog_changed"
+# Host of this worker, caches shared by the workers of a host use it
+HOST = socket.gethostname()
+
+BUMP_QUERY = text(
+    "INSERT INTO catalog_versions (collection, version, lsn, updated_at) "
+    "VALUES (:collection, 1, :lsn, now()) "
+    "ON CONFLICT (collection) DO UPDATE SET "
+    "version = catalog_versions.version + 1, lsn = EXCLUDED.lsn, updated_at = now() "
+    "RETURNING version",
+)
+NOTIFY_QUERY = text("SELECT pg_notify(:channel, :payload)")
+VERSIONS_QUERY = "SELECT collection, version, lsn FROM catalog_versions"
+
+
+async def publish_change(
+    conn: AsyncConnection,
+    collection: str,
+    lsn: Optional[int] = None,
+) -> CatalogChange:
+    """
+    Bump the version of a collection and notify every worker of the change.
+
+    The notification is sent when the transaction commits, together with
+    the new version.
+
+    Args:
+        conn (AsyncConnection): Connection with an open transaction.
+        collection (str): Name of the collection.
+        lsn (Optional[int]): Position of the primary's write-ahead log after
+            the change, when read replicas are used.
+
+    Returns:
+        CatalogChange: The change.
+    """
+    version = await conn.scalar(BUMP_QUERY, {"collection": collection, "lsn": lsn})
+    change = CatalogChange(collection, version, lsn, HOST, time.time())
+    await conn.execute(
+        NOTIFY_QUERY,
+        {"channel": CHANNEL, "payload": json.dumps(asdict(change))},
+    )
+    return change
+
+
+class CatalogBus:
+    """
+    Delivers the catalog changes of all workers to this worker.
+
+    The worker keeps a connection listening to the change notifications,
+    and applies each change to the catalog versions, which calls the
+    subscribers dropping or refreshing the affected caches. Reads of a
+    changed collection also wait for the read replicas to replay it.
+    Notifications sent while the connection is down are lost, so versions
+    are read from the database on every connection, and every
+    ``poll_interval`` seconds, which also checks the connection.
+    """
+
+    def __init__(
+        self,
+        url: URL,
+        versions: CatalogVersions,
+        poll_interval: float,
+    ) -> None:
+        self.url = url
+        self.versions = versions
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+        self._handlers: Set[asyncio.Task] = set()
+        self._loaded = False
+
+    async def apply(self, change: CatalogChange, notify: bool = True) -> None:
+        """
+        Apply a change to the versions of this worker.
+
+        Args:
+            change (CatalogChange): The change.
+            notify (bool): Whether to call the subscribers of the versions.
+        """
+        if change.lsn is not None and replica_router.enabled:
+            replica_router.require(change.collection, change.lsn)
+        if await self.versions.apply(change, notify) and change.published_at:
+            CATALOG_INVALIDATION_DELAY.observe(
+                max(0.0, time.time() - change.published_at),
+            )
+
+    def _on_notification(
+        self,
+        _conn: asyncpg.Connection,
+        _pid: int,
+        _channel: str,
+        payload: str,
+    ) -> None:
+        try:
+            change = CatalogChange(**json.loads(payload))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring a malformed catalog change {payload!r}: {e}")
+            return
+        handler = asyncio.create_task(self.apply(change))
+        self._handlers.add(handler)
+        handler.add_done_callback(self._handlers.discard)
+
+    async def _load_versions(self, conn: asyncpg.Connection) -> None:
+        """Apply the changes missed while no notification was received."""
+        for collection, version, lsn in await conn.fetch(VERSIONS_QUERY):
+            # The first load only sets the versions, caches start empty.
+            await self.apply(CatalogChange(collection, version, lsn), self._loaded)
+        self._loaded = True
+
+    async def _listen(self) -> None:
+        conn = await asyncpg.connect(str(self.url.with_scheme("postgresql")))
+        try:
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _: closed.set())
+            # Listening first, so no change falls between the load and it.
+            await conn.add_listener(CHANNEL, self._on_notification)
+            while not closed.is_set():
+                await self._load_versions(conn)
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(closed.wait(), self.poll_interval)
+        finally:
+            await conn.close()
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            started = time.monotonic()
+            try:
+                await self._listen()
+                logger.warning("Catalog change notifications connection closed.")
+            except Exception as e:
+                logger.warning(f"Catalog change notifications interrupted: {e}")
+            if time.monotonic() - started > self.poll_interval:
+                delay = 1.0
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def start(self) -> None:
+        """Start listening to the catalog changes in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop listening."""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        for handler in list(self._handlers):
+            handler.cancel()
+
+
+catalog_bus = CatalogBus(
+    settings.db_url,
+    catalog_versions,
+    settings.catalog_poll_interval,
+)
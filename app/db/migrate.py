@@ -0,0 +1,91 @@
+import asyncio
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.settings import settings
+from app.db.meta import meta
+from app.db.models import load_all_models
+
+logger = logging.getLogger(__name__)
+
+
+class LegacySchemaError(Exception):
+    """The database has a records table created before collections existed."""
+
+
+async def create_schema(conn: AsyncConnection, drop_legacy: bool = False) -> None:
+    """
+    Create the extensions, tables and indexes of the application.
+
+    It is idempotent. A `records` table created before collections existed
+    is not partitioned, it is only dropped when asked to, the catalog must
+    then be uploaded again.
+
+    Args:
+        conn (AsyncConnection): Connection with an open transaction.
+        drop_legacy (bool): Whether to drop an unpartitioned records table.
+
+    Raises:
+        LegacySchemaError: If there is an unpartitioned records table and it
+            may not be dropped.
+    """
+    load_all_models()
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    legacy = await conn.scalar(
+        text(
+            "SELECT to_regclass('records') IS NOT NULL AND NOT EXISTS "
+            "(SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass('records'))",
+        ),
+    )
+    if legacy:
+        if not drop_legacy:
+            raise LegacySchemaError(
+                "The records table predates collections and is not partitioned. "
+                "Run `python -m app migrate --drop-legacy` to drop it, "
+                "then upload the catalog again.",
+            )
+        logger.warning("Dropping the unpartitioned records table.")
+        await conn.execute(text("DROP TABLE records"))
+    await conn.run_sync(meta.create_all)
+
+
+async def migrate(drop_legacy: bool = False) -> None:
+    """
+    Create the database schema of the primary and the shards.
+
+    Args:
+        drop_legacy (bool): Whether to drop an unpartitioned records table.
+    """
+    for url in (settings.db_url, *settings.db_shard_urls):
+        engine = create_async_engine(str(url), poolclass=NullPool)
+        try:
+            async with engine.begin() as conn:
+                await create_schema(conn, drop_legacy)
+        finally:
+            await engine.dispose()
+
+
+def run_migrations(drop_legacy: bool = False) -> None:
+    """
+    Migrate the database once, before any worker starts.
+
+    Workers used to create the tables in their lifespan, each with its own
+    engine. The migration now runs in the process that starts the server,
+    or on its own with ``python -m app migrate``.
+
+    Args:
+        drop_legacy (bool): Whether to drop an unpartitioned records table.
+
+    Raises:
+        SystemExit: If the records table must be dropped first.
+    """
+    try:
+        asyncio.run(migrate(drop_legacy))
+    except LegacySchemaError as e:
+        logger.error(str(e))
+        raise SystemExit(1) from e
+    logger.info("The database schema is up to date.")
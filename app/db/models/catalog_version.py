@@ -0,0 +1,40 @@
+from sqlalchemy import BigInteger, Column, DateTime, Text, func
+
+from app.db.base import Base
+
+
+class CatalogVersion(Base):
+    """
+    Represents the version of a collection, shared by all workers.
+
+    Writers bump it in the transaction notifying the other workers of the
+    change, see `CatalogBus`. Workers reconnecting to the bus read it to
+    catch up with the changes they missed.
+
+    Attributes:
+        collection (Text): The collection.
+        version (BigInteger): Number of changes of the collection so far.
+        lsn (BigInteger): Position of the write-ahead log after the last
+            change, when read replicas are used.
+        updated_at (DateTime): Time of the last change.
+    """
+
+    __tablename__ = "catalog_versions"
+
+    collection = Column(Text, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    lsn = Column(BigInteger, nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the CatalogVersion object.
+
+        Returns:
+            str: A string representation of the CatalogVersion object.
+        """
+        return f"CatalogVersion(collection={self.collection}, version={self.version})"
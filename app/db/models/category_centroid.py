@@ -0,0 +1,45 @@
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, Integer, SmallInteger, Text
+
+from app.core.settings import settings
+from app.db.base import Base
+
+
+class CategoryCentroid(Base):
+    """
+    Represents the centroid of the records of a category.
+
+    Centroids are computed per collection for level-1 and level-2
+    categories, they route hierarchical searches to the closest categories.
+
+    Attributes:
+        collection (Text): The collection of the category.
+        level (SmallInteger): Level of the category, 1 or 2.
+        category_1 (Text): The level-1 category, empty for records without one.
+        category_2 (Text): The level-2 category, empty for level-1 centroids
+            and for records without one.
+        centroid (Vector): Average embedding of the category's records.
+        record_count (Integer): Number of records in the category.
+    """
+
+    __tablename__ = "category_centroids"
+
+    collection = Column(Text, primary_key=True)
+    level = Column(SmallInteger, primary_key=True)
+    category_1 = Column(Text, primary_key=True)
+    category_2 = Column(Text, primary_key=True, default="")
+    centroid = Column(Vector(settings.embedding_dim), nullable=False)
+    record_count = Column(Integer, nullable=False)
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the CategoryCentroid object.
+
+        Returns:
+            str: A string representation of the CategoryCentroid object.
+        """
+        return (
+            f"CategoryCentroid(collection={self.collection}, "
+            f"level={self.level}, category_1={self.category_1}, "
+            f"category_2={self.category_2})"
+        )
@@ -1,11 +1,36 @@
 import uuid  # noqa: N999
 
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import JSON, Column, Text
+from sqlalchemy import JSON, Column, Index, Text, literal_column
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql.elements import ColumnElement
 
+from app.core.settings import settings
 from app.db.base import Base
 
+# Metadata keys of the category levels used to route searches
+CATEGORY_KEYS = ("Danh mục cấp 1", "Danh mục cấp 2")
+
+
+def category_expression(level: int, table: str = "records") -> ColumnElement:
+    """
+    Get the SQL expression of a record's category at a level.
+
+    The key is inlined rather than bound, so queries match the expression
+    indexes on the categories.
+
+    Args:
+        level (int): Category level, 1 or 2.
+        table (str): Name of the records table.
+
+    Returns:
+        ColumnElement: The category as text.
+    """
+    return literal_column(
+        f"{table}.record_metadata ->> '{CATEGORY_KEYS[level - 1]}'",
+        Text,
+    )
+
 
 class Record(Base):
     """
@@ -13,21 +38,46 @@ class Record(Base):
 
     Attributes:
         id (UUID): The primary key of the record, automatically generated using UUID.
+        collection (Text): The collection of the record, e.g. one brand catalog.
         record_metadata (JSON): Metadata associated with the record, stored as JSON.
         contents (Text): The main content of the record, cannot be null.
         embedding (Vector): The vector representation of the record, cannot be null.
     """
 
     __tablename__ = "records"
+    # Each collection is stored in its own partition, see VectorStore.
+    # Indexes defined here are created on every partition.
+    __table_args__ = (
+        Index(
+            "ix_records_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_l2_ops"},
+        ),
+        # Restricts hierarchical searches to the routed categories.
+        Index(
+            "ix_records_category",
+            literal_column(f"(record_metadata ->> '{CATEGORY_KEYS[0]}')"),
+            literal_column(f"(record_metadata ->> '{CATEGORY_KEYS[1]}')"),
+        ),
+        {"postgresql_partition_by": "LIST (collection)"},
+    )
 
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
         default=uuid.uuid4,
-        unique=True,
         nullable=False,
         comment="Primary key of the record, automatically generated using UUID.",
     )
+    collection = Column(
+        Text,
+        primary_key=True,
+        nullable=False,
+        default="default",
+        comment="Name of the collection the record belongs to, the partition key.",
+    )
     record_metadata = Column(
         JSON,
         nullable=True,
@@ -39,7 +89,7 @@ class Record(Base):
         comment="The main content of the record, cannot be null.",
     )
     embedding = Column(
-        Vector(1536),
+        Vector(settings.embedding_dim),
         nullable=False,
         comment="The vector representation of the record, cannot be null.",
     )
@@ -0,0 +1,157 @@
+import asyncio
+import itertools
+import logging
+from contextlib import suppress
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from yarl import URL
+
+from app.core.settings import settings
+from app.db.search_pool import SearchPool
+from app.services.metrics import DB_READS, REPLICA_LAG
+
+logger = logging.getLogger(__name__)
+
+# Replay position and lag of a replica. The lag is 0 while it has replayed
+# all it received, the last replayed commit is old when the primary is idle.
+REPLICA_STATUS_QUERY = """
+SELECT
+    (pg_last_wal_replay_lsn() - '0/0'::pg_lsn)::bigint,
+    CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END
+"""
+# Position of the write-ahead log of the primary, after a committed write
+PRIMARY_LSN_QUERY = "SELECT (pg_current_wal_lsn() - '0/0'::pg_lsn)::bigint"
+
+
+class Replica:
+    """A read replica, with its search pool and ORM sessions."""
+
+    def __init__(self, url: URL, pool_size: int) -> None:
+        self.name = f"{url.host}:{url.port}"
+        self.pool = SearchPool(pool_size, url)
+        self.engine = create_async_engine(
+            str(url),
+            echo=settings.db_echo,
+            pool_size=pool_size,
+        )
+        self.Session = sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+        )
+        # Unknown until the first successful poll, the replica is not read
+        # from before.
+        self.replay_lsn: Optional[int] = None
+        self.lag = float("inf")
+
+    async def poll(self) -> None:
+        """Fetch the replay position and lag of the replica."""
+        pool = await self.pool.get()
+        replay_lsn, lag = await pool.fetchrow(REPLICA_STATUS_QUERY)
+        self.replay_lsn = replay_lsn
+        self.lag = float(lag or 0.0)
+        REPLICA_LAG.labels(replica=self.name).set(self.lag)
+
+    async def close(self) -> None:
+        """Close the connections to the replica."""
+        await self.pool.close()
+        await self.engine.dispose()
+
+
+class ReplicaRouter:
+    """
+    Routes reads to the read replicas, and writes to the primary.
+
+    A replica is read from while its lag is under ``max_lag``. After a
+    write to a collection, e.g. a catalog swap, reads of the collection also
+    wait for the replica to replay the write-ahead log up to the write, and
+    go to the primary meanwhile. Readers therefore see the new catalog
+    together with the caches and centroids built from it, never an older
+    catalog. Replicas are polled in the background, reads never wait on it.
+    """
+
+    def __init__(self, urls: List[URL], pool_size: int, max_lag: float) -> None:
+        self.replicas = [Replica(url, pool_size) for url in urls]
+        self.max_lag = max_lag
+        self._required_lsn: Dict[str, int] = {}
+        self._next = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether replicas are configured."""
+        return bool(self.replicas)
+
+    def require(self, collection: str, lsn: int) -> None:
+        """
+        Record a write to a collection, replicas must replay it to serve reads.
+
+        Args:
+            collection (str): Name of the collection.
+            lsn (int): Position of the primary's write-ahead log after the write.
+        """
+        self._required_lsn[collection] = max(lsn, self._required_lsn.get(collection, 0))
+
+    def reader(self, collection: str) -> Optional[Replica]:
+        """
+        Pick a replica to read a collection from, round robin.
+
+        Args:
+            collection (str): Name of the collection.
+
+        Returns:
+            Optional[Replica]: The replica, or None to read from the primary.
+        """
+        required = self._required_lsn.get(collection, 0)
+        candidates = [
+            replica
+            for replica in self.replicas
+            if replica.replay_lsn is not None
+            and replica.replay_lsn >= required
+            and replica.lag <= self.max_lag
+        ]
+        if not candidates:
+            DB_READS.labels(target="primary").inc()
+            return None
+        DB_READS.labels(target="replica").inc()
+        return candidates[next(self._next) % len(candidates)]
+
+    async def poll(self) -> None:
+        """Update the replay position and lag of every replica."""
+        for replica in self.replicas:
+            try:
+                await replica.poll()
+            except Exception as e:
+                logger.warning(f"Replica {replica.name} is not reachable: {e}")
+                replica.replay_lsn = None
+                replica.lag = float("inf")
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await self.poll()
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float) -> None:
+        """Start polling the replicas in the background, if there are any."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def close(self) -> None:
+        """Stop polling and close the connections to the replicas."""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        for replica in self.replicas:
+            await replica.close()
+
+
+replica_router = ReplicaRouter(
+    settings.db_replica_urls,
+    settings.replica_pool_size,
+    settings.replica_max_lag,
+)
@@ -0,0 +1,69 @@
+import asyncio
+import json
+from typing import Optional
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+from yarl import URL
+
+from app.core.settings import settings
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Exchange vectors in the binary format and decode JSON columns."""
+    await register_vector(conn)
+    await conn.set_type_codec(
+        "json",
+        encoder=json.dumps,
+        decoder=json.loads,
+        schema="pg_catalog",
+    )
+
+
+class SearchPool:
+    """
+    asyncpg pool serving the search queries, without SQLAlchemy.
+
+    Its connections exchange vectors in the binary format, so they are
+    kept apart from the pool of the engine, whose connections use the text
+    format. asyncpg prepares every statement once per connection and reuses
+    it afterwards. The pool is created on first use, in the worker.
+    """
+
+    def __init__(self, size: int, url: Optional[URL] = None) -> None:
+        self.size = size
+        # Database served by the pool, the primary by default
+        self.url = url
+        self._pool: Optional[asyncpg.Pool] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def get(self) -> asyncpg.Pool:
+        """
+        Get the pool, creating it on first use.
+
+        Returns:
+            asyncpg.Pool: The pool.
+        """
+        if self._pool is not None:
+            return self._pool
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._pool is None:
+                url = self.url or settings.db_url
+                self._pool = await asyncpg.create_pool(
+                    str(url.with_scheme("postgresql")),
+                    min_size=self.size,
+                    max_size=self.size,
+                    init=_init_connection,
+                )
+        return self._pool
+
+    async def close(self) -> None:
+        """Close the connections of the pool, if it was created."""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+search_pool = SearchPool(settings.search_pool_size)
@@ -4,7 +4,7 @@ from sqlalchemy.orm import sessionmaker
 from app.core.settings import settings
 
 # Tạo engine
-engine = create_async_engine(str(settings.db_url), echo=True)
+engine = create_async_engine(str(settings.db_url), echo=settings.db_echo)
 
 # Tạo session factory
 SessionLocal = sessionmaker(
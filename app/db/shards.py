@@ -0,0 +1,112 @@
+import hashlib
+import uuid
+from typing import List, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from yarl import URL
+
+from app.core.settings import settings
+from app.db.search_pool import SearchPool
+
+
+def shard_hash(key: Union[str, uuid.UUID]) -> int:
+    """
+    Hash a collection name or a record id, the same in every process.
+
+    Args:
+        key (Union[str, uuid.UUID]): The collection or the id.
+
+    Returns:
+        int: The hash.
+    """
+    data = key.bytes if isinstance(key, uuid.UUID) else str(key).encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class Shard:
+    """A database storing part of the records, with its pools."""
+
+    def __init__(self, url: URL, pool_size: int) -> None:
+        self.url = url
+        self.name = f"{url.host}:{url.port}{url.path}"
+        self.pool = SearchPool(pool_size, url)
+        self.engine = create_async_engine(
+            str(url),
+            echo=settings.db_echo,
+            pool_size=pool_size,
+        )
+        self.Session = sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+        )
+
+    async def close(self) -> None:
+        """Close the connections to the shard."""
+        await self.pool.close()
+        await self.engine.dispose()
+
+
+class ShardRouter:
+    """
+    Places the records on the shards.
+
+    With ``collection`` placement, all records of a collection are stored
+    on one shard, picked by hash of its name. With ``id`` placement, each
+    record is stored on the shard picked by hash of its id, so a collection
+    is spread over all shards. The number of shards must not change once
+    records are stored, records are not moved between shards.
+    """
+
+    def __init__(self, urls: List[URL], pool_size: int, placement: str) -> None:
+        self.shards = [Shard(url, pool_size) for url in urls]
+        self.placement = placement
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the records are sharded."""
+        return bool(self.shards)
+
+    def for_record(self, record_id: Union[str, uuid.UUID], collection: str) -> Shard:
+        """
+        Get the shard storing a record.
+
+        Args:
+            record_id (Union[str, uuid.UUID]): Id of the record.
+            collection (str): Collection of the record.
+
+        Returns:
+            Shard: The shard.
+        """
+        if self.placement == "collection":
+            key: Union[str, uuid.UUID] = collection
+        else:
+            key = uuid.UUID(str(record_id))
+        return self.shards[shard_hash(key) % len(self.shards)]
+
+    def for_collection(self, collection: str) -> List[Shard]:
+        """
+        Get the shards storing the records of a collection.
+
+        Args:
+            collection (str): Name of the collection.
+
+        Returns:
+            List[Shard]: The shards.
+        """
+        if self.placement == "collection":
+            return [self.shards[shard_hash(collection) % len(self.shards)]]
+        return list(self.shards)
+
+    async def close(self) -> None:
+        """Close the connections to the shards."""
+        for shard in self.shards:
+            await shard.close()
+
+
+shard_router = ShardRouter(
+    settings.db_shard_urls,
+    settings.shard_pool_size,
+    settings.shard_placement,
+)
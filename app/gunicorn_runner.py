@@ -28,6 +28,52 @@ class UvicornWorker(BaseUvicornWorker):
     }
 
 
+def child_exit(server: Any, worker: Any) -> None:
+    """
+    Clean up metrics of a stopped worker.
+
+    Gunicorn calls this hook in the master process
+    after a worker has exited, so that live gauges
+    of the dead worker are not exported anymore.
+
+    :param server: gunicorn arbiter.
+    :param worker: the worker that exited.
+    """
+    # Imported lazily: prometheus-client must not be imported
+    # in the master before the multiprocess directory is set.
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_starting(server: Any) -> None:
+    """
+    Prepare the state shared by workers.
+
+    Gunicorn calls this hook in the master process
+    before any worker is forked. Read-only data is
+    written to memory-mapped files, so that workers
+    attach to it instead of loading their own copy.
+
+    :param server: gunicorn arbiter.
+    """
+    from app.services.shared_state import prepare_shared_state
+
+    prepare_shared_state()
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """
+    Record the start of a worker.
+
+    :param server: gunicorn arbiter.
+    :param worker: the forked worker.
+    """
+    from app.utils.process_stats import mark_worker_started
+
+    mark_worker_started()
+
+
 class GunicornApplication(BaseApplication):
     """
     Custom gunicorn application.
@@ -48,6 +94,9 @@ class GunicornApplication(BaseApplication):
             "bind": f"{host}:{port}",
             "workers": workers,
             "worker_class": "app.gunicorn_runner.UvicornWorker",
+            "child_exit": child_exit,
+            "on_starting": on_starting,
+            "post_fork": post_fork,
             **kwargs,
         }
         self.app = app
@@ -0,0 +1,294 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.settings import settings
+from app.services.metrics import ADMISSION_IN_FLIGHT, ADMISSION_SHED, ADMISSION_WAIT
+from app.services.resilience import remaining_time, request_deadline
+from app.utils.priority import Priority, current_priority
+
+logger = logging.getLogger(__name__)
+
+# Weight of the last request in the moving average of service times
+SERVICE_TIME_WEIGHT = 0.1
+
+
+class AdmissionRejectedError(Exception):
+    """The request cannot be admitted in time and is shed."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(f"Request shed: {reason}.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the requests an endpoint serves at once in this worker.
+
+    At most ``limit`` requests are served concurrently, up to
+    ``queue_size`` more wait for a slot, interactive ones ahead of batch
+    work and in arrival order within a priority. A request that cannot get
+    a slot within its deadline is shed, and so is the lowest priority
+    waiter when the queue is full, so overload produces fast rejections
+    instead of requests that all time out.
+
+    Batch endpoints defer to ``defer_to``, the controller of interactive
+    requests: while interactive requests wait for a slot, no batch request
+    is started, queued batch requests start once no interactive request
+    waits anymore.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        queue_size: int,
+        defer_to: Optional["AdmissionController"] = None,
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.defer_to = defer_to
+        self.active = 0
+        self.service_time = 1.0
+        self._order = itertools.count()
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        # Controllers deferring to this one
+        self.deferring: List[AdmissionController] = []
+        if defer_to is not None:
+            defer_to.deferring.append(self)
+
+    @property
+    def waiting(self) -> int:
+        """Number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        """Estimate the seconds until a new request could be served."""
+        backlog = self.waiting + 1
+        return max(1.0, math.ceil(self.service_time * backlog / self.limit))
+
+    def _shed(self, reason: str, priority: Priority) -> AdmissionRejectedError:
+        ADMISSION_SHED.labels(
+            endpoint=self.name,
+            priority=priority.name.lower(),
+            reason=reason,
+        ).inc()
+        return AdmissionRejectedError(reason, self.retry_after())
+
+    def _enqueue(self, priority: Priority) -> "asyncio.Future[None]":
+        """
+        Queue a request, shedding the lowest priority waiter if it is full.
+
+        Raises:
+            AdmissionRejectedError: If the queue is full of requests that
+                have the same or a higher priority.
+        """
+        if len(self._waiters) >= self.queue_size:
+            worst = max(self._waiters)
+            if worst[0] <= priority:
+                raise self._shed("queue_full", priority)
+            self._waiters.remove(worst)
+            heapq.heapify(self._waiters)
+            worst[2].set_exception(self._shed("preempted", Priority(worst[0])))
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        return future
+
+    def _dequeue(self, future: "asyncio.Future[None]") -> None:
+        self._waiters = [waiter for waiter in self._waiters if waiter[2] is not future]
+        heapq.heapify(self._waiters)
+        self._wake_deferred()
+
+    async def acquire(
+        self,
+        priority: Optional[Priority] = None,
+        timeout: Optional[float] = None,
+    ) -> float:
+        """
+        Wait for a slot.
+
+        Args:
+            priority (Optional[Priority]): Priority of the request, defaults
+                to the priority of the current request.
+            timeout (Optional[float]): Longest wait for a slot, bounded by
+                the request deadline.
+
+        Returns:
+            float: Time of admission, to pass to `release`.
+
+        Raises:
+            AdmissionRejectedError: If no slot is available in time.
+        """
+        if priority is None:
+            priority = current_priority()
+        remaining = remaining_time()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+
+        deferring = self.defer_to is not None and self.defer_to.waiting > 0
+        if self.active < self.limit and not self._waiters and not deferring:
+            self.active += 1
+            ADMISSION_IN_FLIGHT.labels(endpoint=self.name).inc()
+            return time.perf_counter()
+        if timeout is not None and timeout <= 0:
+            raise self._shed("deadline", priority)
+
+        future = self._enqueue(priority)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self._dequeue(future)
+                raise self._shed("deadline", priority) from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over as the request was cancelled.
+                self._hand_over()
+            else:
+                future.cancel()
+                self._dequeue(future)
+            raise
+        finally:
+            ADMISSION_WAIT.labels(endpoint=self.name).observe(
+                time.perf_counter() - start,
+            )
+        # Raises the rejection of a preempted waiter.
+        future.result()
+        return time.perf_counter()
+
+    def release(self, admitted_at: float) -> None:
+        """
+        Free the slot of a served request, or hand it to the first waiter.
+
+        Args:
+            admitted_at (float): Time of admission returned by `acquire`.
+        """
+        self.service_time += SERVICE_TIME_WEIGHT * (
+            time.perf_counter() - admitted_at - self.service_time
+        )
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        # Batch waiters are started by `_wake_deferred` once chat drains.
+        deferring = self.defer_to is not None and self.defer_to.waiting > 0
+        while self._waiters and not deferring:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self._wake_deferred()
+                return
+        self.active -= 1
+        ADMISSION_IN_FLIGHT.labels(endpoint=self.name).dec()
+        self._wake_deferred()
+
+    def _wake_deferred(self) -> None:
+        """Start the deferred requests once no request waits here anymore."""
+        if self._waiters:
+            return
+        for controller in self.deferring:
+            controller.admit_waiters()
+
+    def admit_waiters(self) -> None:
+        """Hand the free slots to the first waiters."""
+        while self.active < self.limit and self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self.active += 1
+                ADMISSION_IN_FLIGHT.labels(endpoint=self.name).inc()
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        priority: Optional[Priority] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[None]:
+        """
+        Hold a slot while the wrapped block runs, see `acquire`.
+
+        Raises:
+            AdmissionRejectedError: If no slot is available in time.
+        """
+        admitted_at = await self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+
+def admission(
+    controller: AdmissionController,
+    budget: Optional[float] = None,
+) -> Callable[[], AsyncIterator[None]]:
+    """
+    Make a dependency admitting the requests of an endpoint.
+
+    Requests that are not admitted in time get a 503 with ``Retry-After``.
+
+    Args:
+        controller (AdmissionController): Controller of the endpoint.
+        budget (Optional[float]): Time budget of the request in seconds.
+            It starts on arrival, so the wait for a slot counts.
+
+    Returns:
+        Callable[[], AsyncIterator[None]]: The dependency. It must come
+            after the dependencies setting the priority of the request.
+    """
+
+    async def dependency() -> AsyncIterator[None]:
+        with request_deadline(budget) if budget is not None else nullcontext():
+            try:
+                admitted_at = await controller.acquire(
+                    timeout=settings.admission_queue_timeout,
+                )
+            except AdmissionRejectedError as e:
+                logger.warning(f"{controller.name}: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="The server is overloaded, retry later.",
+                    headers={"Retry-After": str(math.ceil(e.retry_after))},
+                ) from e
+            try:
+                yield
+            finally:
+                controller.release(admitted_at)
+
+    return dependency
+
+
+# /gen_response, the interactive endpoint
+chat_admission = AdmissionController(
+    "gen_response",
+    settings.admission_limit,
+    settings.admission_queue_size,
+)
+# Batch endpoints, which defer to interactive requests
+eval_admission = AdmissionController(
+    "acc_eval",
+    settings.admission_batch_limit,
+    settings.admission_batch_queue_size,
+    defer_to=chat_admission,
+)
+upload_admission = AdmissionController(
+    "upload",
+    settings.admission_batch_limit,
+    settings.admission_batch_queue_size,
+    defer_to=chat_admission,
+)
+bulk_admission = AdmissionController(
+    "bulk_search",
+    settings.admission_batch_limit,
+    settings.admission_batch_queue_size,
+    defer_to=chat_admission,
+)
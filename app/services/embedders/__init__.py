@@ -0,0 +1,38 @@
+"""Embedding backends."""
+
+from functools import lru_cache
+
+from app.core.settings import settings
+from app.services.embedders.base import Embedder
+from app.services.embedders.hashing import HashingEmbedder
+from app.services.embedders.local import LocalEmbedder
+from app.services.embedders.openai_embedder import OpenAIEmbedder
+
+
+@lru_cache(maxsize=None)
+def get_embedder() -> Embedder:
+    """
+    Get the embedding backend selected in the settings.
+
+    :return: the embedder shared by the worker.
+    """
+    if settings.embedding_backend == "local":
+        return LocalEmbedder(
+            settings.local_embedding_model_path,
+            runtime=settings.local_embedding_runtime,
+            workers=settings.local_embedding_workers,
+            batch_size=settings.local_embedding_batch_size,
+            batch_wait=settings.local_embedding_batch_wait_ms / 1000,
+        )
+    if settings.embedding_backend == "hashing":
+        return HashingEmbedder(settings.embedding_dim)
+    return OpenAIEmbedder(settings.open_api_key, settings.embedding_model)
+
+
+__all__ = [
+    "Embedder",
+    "HashingEmbedder",
+    "LocalEmbedder",
+    "OpenAIEmbedder",
+    "get_embedder",
+]
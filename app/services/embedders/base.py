@@ -0,0 +1,46 @@
+import abc
+from typing import List, Optional
+
+
+class Embedder(abc.ABC):
+    """Turns texts into embedding vectors."""
+
+    @property
+    @abc.abstractmethod
+    def model_id(self) -> str:
+        """Identifier of the model, embeddings of different models differ."""
+
+    @abc.abstractmethod
+    async def embed(
+        self,
+        texts: List[str],
+        limit: Optional[float] = None,
+    ) -> List[List[float]]:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts (List[str]): The texts.
+            limit (Optional[float]): Upper bound of the call in seconds.
+
+        Returns:
+            List[List[float]]: One embedding per text, in order.
+        """
+
+    async def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single search query.
+
+        Args:
+            text (str): The query.
+
+        Returns:
+            List[float]: Its embedding.
+        """
+        return (await self.embed([text]))[0]
+
+    async def warm_up(self) -> None:  # noqa: B027
+        """Prepare the backend before the first request."""
+
+    async def aclose(self) -> None:  # noqa: B027
+        """Release the resources of the backend."""
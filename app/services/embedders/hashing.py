@@ -0,0 +1,49 @@
+import math
+import zlib
+from typing import List, Optional
+
+from app.services.embedders.base import Embedder
+
+
+class HashingEmbedder(Embedder):
+    """
+    Hashed character n-gram embeddings.
+
+    Each n-gram of the lowercased text is hashed to a dimension with a
+    sign, and the vector is L2 normalized. Texts sharing many n-grams get
+    close vectors. It needs no model nor network, which makes it suited to
+    tests and benchmarks, not to production search quality.
+    """
+
+    def __init__(self, dimension: int, ngram: int = 3) -> None:
+        self.dimension = dimension
+        self.ngram = ngram
+
+    @property
+    def model_id(self) -> str:  # noqa: D102
+        return f"hashing:{self.ngram}:{self.dimension}"
+
+    def embed_text(self, text: str) -> List[float]:
+        """
+        Embed a single text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            List[float]: Its normalized embedding.
+        """
+        vector = [0.0] * self.dimension
+        padded = f" {text.lower()} "
+        for start in range(max(len(padded) - self.ngram + 1, 1)):
+            digest = zlib.crc32(padded[start : start + self.ngram].encode())
+            vector[digest % self.dimension] += 1.0 if digest >> 31 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    async def embed(  # noqa: D102
+        self,
+        texts: List[str],
+        limit: Optional[float] = None,
+    ) -> List[List[float]]:
+        return [self.embed_text(text) for text in texts]
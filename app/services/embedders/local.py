@@ -0,0 +1,154 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.services.embedders.base import Embedder
+
+# Model loaded in each pool process by `_load_model`.
+_worker_state: Dict[str, Any] = {}
+
+
+def _load_model(model_path: str, runtime: str) -> None:
+    # sentence-transformers is only needed by the local backend.
+    from sentence_transformers import SentenceTransformer
+
+    _worker_state["model"] = SentenceTransformer(
+        model_path,
+        device="cpu",
+        backend=runtime,
+        local_files_only=True,
+    )
+
+
+def _encode(texts: List[str]) -> List[List[float]]:
+    embeddings = _worker_state["model"].encode(
+        texts,
+        batch_size=len(texts),
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+    )
+    return embeddings.tolist()
+
+
+class LocalEmbedder(Embedder):
+    """
+    Embeddings from a sentence-transformers model running on the CPU.
+
+    Weights are loaded from a local path, with the ONNX or torch runtime,
+    in a pool of processes so that inference never blocks the event loop.
+    Concurrent queries are grouped into one batch: a query waits at most
+    ``batch_wait`` seconds for others before its batch is sent to the pool.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        runtime: str,
+        workers: int,
+        batch_size: int,
+        batch_wait: float,
+    ) -> None:
+        self.model_path = model_path
+        self.runtime = runtime
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: List[Tuple[str, "asyncio.Future[List[float]]"]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches: Set["asyncio.Task[List[List[float]]]"] = set()
+
+    @property
+    def model_id(self) -> str:  # noqa: D102
+        return f"local:{self.model_path}"
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """Processes running the model, started on first use."""
+        if self._pool is None:
+            # Spawned processes do not inherit the event loop and sockets.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_model,
+                initargs=(self.model_path, self.runtime),
+            )
+        return self._pool
+
+    async def _encode(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, _encode, texts)
+
+    async def embed(  # noqa: D102
+        self,
+        texts: List[str],
+        limit: Optional[float] = None,
+    ) -> List[List[float]]:
+        batches = await asyncio.gather(
+            *(
+                self._encode(texts[start : start + self.batch_size])
+                for start in range(0, len(texts), self.batch_size)
+            ),
+        )
+        return [embedding for batch in batches for embedding in batch]
+
+    async def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single search query, batched with concurrent queries.
+
+        Args:
+            text (str): The query.
+
+        Returns:
+            List[float]: Its embedding.
+        """
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[List[float]]" = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Send the pending queries to the pool as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        # Referenced from self._batches until it is done.
+        batch = asyncio.ensure_future(  # noqa: RUF006
+            self._encode([text for text, _ in pending]),
+        )
+        self._batches.add(batch)
+
+        def resolve(task: "asyncio.Task[List[List[float]]]") -> None:
+            self._batches.discard(task)
+            error = None if task.cancelled() else task.exception()
+            for index, (_, future) in enumerate(pending):
+                if future.done():
+                    continue
+                if task.cancelled():
+                    future.cancel()
+                elif error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(task.result()[index])
+
+        batch.add_done_callback(resolve)
+
+    async def warm_up(self) -> None:
+        """Load the model in every process of the pool."""
+        await asyncio.gather(
+            *(self._encode(["warm up"]) for _ in range(self.workers)),
+        )
+
+    async def aclose(self) -> None:
+        """Stop the processes of the pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
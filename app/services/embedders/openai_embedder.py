@@ -0,0 +1,77 @@
+from typing import List, Optional
+
+from app.core.settings import settings
+from app.services.embedders.base import Embedder
+from app.services.metrics import record_tokens
+from app.services.openai_client import call_openai, get_openai
+from app.services.rate_limiter import estimate_tokens, openai_rate_limiter
+from app.services.resilience import (
+    call_provider,
+    embedding_breaker,
+    embedding_latency,
+    hedged,
+)
+
+
+class OpenAIEmbedder(Embedder):
+    """
+    Embeddings from the OpenAI API.
+
+    Calls wait for the shared quota, fail fast while the circuit of the
+    provider is open and are bounded by the request budget.
+    """
+
+    def __init__(self, api_key: str, model: str) -> None:
+        self.api_key = api_key
+        self.model = model
+
+    @property
+    def model_id(self) -> str:  # noqa: D102
+        return f"openai:{self.model}"
+
+    async def embed(  # noqa: D102
+        self,
+        texts: List[str],
+        limit: Optional[float] = None,
+    ) -> List[List[float]]:
+        embedding_breaker.fail_fast()
+        response = await openai_rate_limiter.call(
+            lambda: call_provider(
+                embedding_breaker,
+                lambda timeout: call_openai(
+                    get_openai().Embedding.acreate,
+                    input=texts,
+                    model=self.model,
+                    api_key=self.api_key,
+                    request_timeout=timeout,
+                ),
+                limit,
+            ),
+            estimate_tokens(texts),
+        )
+        record_tokens(self.model, response.get("usage", {}))
+        data = sorted(response["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+    async def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single search query.
+
+        Query embeddings are idempotent, a duplicate request is sent when
+        the first one is slower than the p95 of previous requests.
+        """
+        embeddings = await hedged(
+            lambda: self.embed([text], settings.embedding_timeout),
+            embedding_latency,
+        )
+        return embeddings[0]
+
+    async def warm_up(self) -> None:
+        """Open the connection to the OpenAI API."""
+        if not self.model:
+            return
+        await call_openai(
+            get_openai().Model.aretrieve,
+            id=self.model,
+            api_key=self.api_key,
+        )
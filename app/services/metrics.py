@@ -0,0 +1,179 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets tuned for the stages of a RAG request: from sub-millisecond
+# prompt building up to multi-second LLM completions.
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+REQUEST_DURATION = Histogram(
+    "app_request_duration_seconds",
+    "Time spent serving an HTTP request.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STAGE_DURATION = Histogram(
+    "app_stage_duration_seconds",
+    "Time spent in a single stage of request processing.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_TOKENS = Counter(
+    "app_llm_tokens_total",
+    "Tokens consumed by calls to the LLM provider.",
+    ["model", "kind"],
+)
+
+CACHE_LOOKUPS = Counter(
+    "app_cache_lookups_total",
+    "Cache lookups, labelled by cache name and result (hit or miss).",
+    ["cache", "result"],
+)
+
+PROVIDER_CONNECTIONS = Counter(
+    "app_provider_connections_total",
+    "HTTP connections used by provider calls, new or reused from the pool.",
+    ["kind"],
+)
+
+RATE_LIMIT_WAIT = Histogram(
+    "app_rate_limit_wait_seconds",
+    "Time spent waiting for the shared LLM provider quota.",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+
+RATE_LIMITED = Counter(
+    "app_rate_limited_total",
+    "Calls rejected by the LLM provider with 429 Too Many Requests.",
+)
+
+HEDGED_REQUESTS = Counter(
+    "app_hedged_requests_total",
+    "Duplicate requests sent to the LLM provider, and how many of them won.",
+    ["result"],
+)
+
+CIRCUIT_OPENED = Counter(
+    "app_circuit_opened_total",
+    "Times a circuit breaker opened, labelled by circuit.",
+    ["circuit"],
+)
+
+SINGLEFLIGHT_REQUESTS = Counter(
+    "app_singleflight_requests_total",
+    "Calls through a single-flight layer. Followers joined a call in flight.",
+    ["flight", "role"],
+)
+
+DB_READS = Counter(
+    "app_db_reads_total",
+    "Search reads, by the database serving them (primary or replica).",
+    ["target"],
+)
+
+REPLICA_LAG = Gauge(
+    "app_db_replica_lag_seconds",
+    "Replication lag of a read replica, as last polled.",
+    ["replica"],
+    multiprocess_mode="max",
+)
+
+SHARD_SEARCHES_SKIPPED = Counter(
+    "app_shard_searches_skipped_total",
+    "Shard searches left out of a search, by shard and reason (timeout, error).",
+    ["shard", "reason"],
+)
+
+CATALOG_INVALIDATION_DELAY = Histogram(
+    "app_catalog_invalidation_delay_seconds",
+    "Time from a catalog change to its caches being invalidated in a worker.",
+    buckets=LATENCY_BUCKETS,
+)
+
+LOOP_LAG = Histogram(
+    "app_event_loop_lag_seconds",
+    "Delay of the event loop in waking up a sleeping task.",
+    buckets=LATENCY_BUCKETS,
+)
+
+LOOP_STALLS = Counter(
+    "app_event_loop_stalls_total",
+    "Times the event loop was blocked longer than the stall threshold.",
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "app_admission_in_flight",
+    "Requests being served, per endpoint with admission control.",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_WAIT = Histogram(
+    "app_admission_wait_seconds",
+    "Time requests waited for a slot of their endpoint.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+
+ADMISSION_SHED = Counter(
+    "app_admission_shed_total",
+    "Requests rejected with 503 by admission control, by reason.",
+    ["endpoint", "priority", "reason"],
+)
+
+WORKER_STARTUP = Gauge(
+    "app_worker_startup_seconds",
+    "Time from the fork of a worker until it is ready.",
+    multiprocess_mode="liveall",
+)
+
+WORKER_MEMORY = Gauge(
+    "app_worker_memory_bytes",
+    "Memory of a worker once it is ready, by kind (rss or pss).",
+    ["kind"],
+    multiprocess_mode="liveall",
+)
+
+
+def record_tokens(model: str, usage: dict) -> None:
+    """
+    Record token usage reported by the LLM provider.
+
+    Args:
+        model (str): The model that served the call.
+        usage (dict): The ``usage`` section of the provider response.
+    """
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.labels(model=model, kind=kind.split("_")[0]).inc(usage[kind])
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """
+    Record a single cache lookup.
+
+    The hit ratio is derived at query time, e.g.
+    ``rate(app_cache_lookups_total{result="hit"}[5m])
+    / rate(app_cache_lookups_total[5m])``.
+
+    Args:
+        cache (str): Name of the cache.
+        hit (bool): Whether the lookup was a hit.
+    """
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
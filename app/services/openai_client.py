@@ -0,0 +1,126 @@
+from functools import lru_cache
+from types import ModuleType, SimpleNamespace
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+from app.core.settings import settings
+from app.services.metrics import PROVIDER_CONNECTIONS, record_cache_lookup
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+@lru_cache(maxsize=None)
+def get_openai() -> ModuleType:
+    """
+    Import and configure the OpenAI client on first use.
+
+    openai and its HTTP clients take a large share of the import time of
+    the application, so they are only imported once a provider call is made.
+
+    Returns:
+        ModuleType: The configured ``openai`` module.
+    """
+    import openai
+
+    openai.api_key = settings.open_api_key
+    return openai
+
+
+async def _count_new_connection(*_: Any) -> None:
+    PROVIDER_CONNECTIONS.labels(kind="new").inc()
+
+
+async def _count_reused_connection(*_: Any) -> None:
+    PROVIDER_CONNECTIONS.labels(kind="reused").inc()
+
+
+async def _count_dns_hit(*_: Any) -> None:
+    record_cache_lookup("dns", hit=True)
+
+
+async def _count_dns_miss(*_: Any) -> None:
+    record_cache_lookup("dns", hit=False)
+
+
+class ProviderSession:
+    """
+    HTTP session shared by all provider calls of the worker.
+
+    Connections are kept alive between calls and pooled up to the
+    configured limits, and DNS answers are cached, so a call only pays for
+    TCP and TLS setup when no idle connection is left. New and reused
+    connections and DNS cache lookups are exported as metrics.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        limit_per_host: int,
+        keepalive_timeout: float,
+        dns_ttl: int,
+    ) -> None:
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    def get(self) -> "aiohttp.ClientSession":
+        """
+        Get the session, creating it on first use in the running loop.
+
+        Returns:
+            aiohttp.ClientSession: The session.
+        """
+        if self._session is None or self._session.closed:
+            # aiohttp comes with openai, it's imported with it on first use.
+            import aiohttp
+
+            tracing = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+            tracing.on_connection_create_end.append(_count_new_connection)
+            tracing.on_connection_reuseconn.append(_count_reused_connection)
+            tracing.on_dns_cache_hit.append(_count_dns_hit)
+            tracing.on_dns_cache_miss.append(_count_dns_miss)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=self.dns_ttl,
+                ),
+                trace_configs=[tracing],
+            )
+        return self._session
+
+    async def aclose(self) -> None:
+        """Close the session and its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+provider_session = ProviderSession(
+    settings.provider_pool_limit,
+    settings.provider_pool_limit_per_host,
+    settings.provider_keepalive_timeout,
+    settings.provider_dns_ttl,
+)
+
+
+async def call_openai(method: Callable[..., Awaitable[Any]], **kwargs: Any) -> Any:
+    """
+    Make an async OpenAI call over the shared provider session.
+
+    openai reads its session from a context variable, so it is set in the
+    context of every call.
+
+    Args:
+        method (Callable[..., Awaitable[Any]]): Async method of the client,
+            e.g. ``openai.Embedding.acreate``.
+        kwargs (Any): Arguments of the method.
+
+    Returns:
+        Any: The response.
+    """
+    get_openai().aiosession.set(provider_session.get())
+    return await method(**kwargs)
@@ -1,12 +1,19 @@
 import logging
 from typing import Dict, List
 
-import openai
+from app.core.settings import settings
+from app.services.metrics import record_tokens
+from app.services.openai_client import call_openai, get_openai
+from app.services.rate_limiter import estimate_tokens, openai_rate_limiter
+from app.services.resilience import (
+    ProviderUnavailableError,
+    call_provider,
+    llm_breaker,
+)
+from app.utils.timing import stage_timer
 
-logging.basicConfig(level=logging.INFO)
 
-
-def get_completion_from_messages(
+async def get_completion_from_messages(
     messages: List[Dict[str, str]],
     model: str = "gpt-3.5-turbo",
     temperature: float = 0,
@@ -15,6 +22,10 @@ def get_completion_from_messages(
     """
     Sends a list of messages to OpenAI's GPT model and retrieves the completion.
 
+    The call shares the keep-alive connections of the worker, within the quota
+    shared by all workers and the time budget of the request. It fails fast
+    while the provider's circuit is open.
+
     Args:
     - messages: List of message objects for the conversation.
     - model: The model to use for completion (default is gpt-3.5-turbo).
@@ -23,24 +34,40 @@ def get_completion_from_messages(
 
     Returns:
     - str: The model's response content.
+
+    Raises:
+    - ProviderUnavailableError: If the completion cannot be made in time.
     """
+    openai = get_openai()
+    llm_breaker.fail_fast()
     try:
-        response = openai.ChatCompletion.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        return response.choices[0].message["content"]
+        with stage_timer("llm"):
+            response = await openai_rate_limiter.call(
+                lambda: call_provider(
+                    llm_breaker,
+                    lambda timeout: call_openai(
+                        openai.ChatCompletion.acreate,
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        request_timeout=timeout,
+                    ),
+                    settings.completion_timeout,
+                ),
+                estimate_tokens(
+                    [message["content"] for message in messages],
+                    completion_tokens=max_tokens,
+                ),
+            )
     except openai.error.OpenAIError as e:
         logging.error(f"OpenAI API error: {e}")
-        return "An error occurred while processing your request."
-    except Exception as e:
-        logging.error(f"Unexpected error: {e}")
-        return "An unexpected error occurred."
+        raise ProviderUnavailableError(f"OpenAI API error: {e}") from e
+    record_tokens(model, response.get("usage", {}))
+    return response.choices[0].message["content"]
 
 
-def get_chatbot_response(user_input: str, relevant_docs: str) -> str:
+async def get_chatbot_response(user_input: str, relevant_docs: str) -> str:
     """
     Generates a chatbot response based on user input and relevant documentation.
 
@@ -66,4 +93,4 @@ def get_chatbot_response(user_input: str, relevant_docs: str) -> str:
 
 
     # Return the chatbot response
-    return get_completion_from_messages(messages)
+    return await get_completion_from_messages(messages)
@@ -0,0 +1,250 @@
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterator, List, Optional, TypeVar
+
+from app.core.settings import settings
+from app.services.metrics import RATE_LIMIT_WAIT, RATE_LIMITED
+from app.services.resilience import DeadlineExceededError, remaining_time
+from app.utils.priority import Priority, current_priority
+
+if TYPE_CHECKING:
+    from openai.error import RateLimitError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Updated at, available requests, available tokens, rate scale, blocked until
+STATE = struct.Struct("<5d")
+# Buckets hold at most this many seconds of quota
+BURST_SECONDS = 10.0
+# AIMD: the rate is halved on 429 and grows back by this step per success
+ADDITIVE_STEP = 0.01
+MIN_SCALE = 0.05
+# Waiting callers re-check the bucket at least this often
+MAX_SLEEP = 1.0
+DEFAULT_RETRY_AFTER = 1.0
+
+
+def estimate_tokens(texts: List[str], completion_tokens: int = 0) -> int:
+    """
+    Roughly estimate the tokens a call will consume.
+
+    Vietnamese text is assumed to take a token per 3 characters. Estimates
+    are corrected with the usage reported by the provider.
+
+    Args:
+        texts (List[str]): Texts sent to the provider.
+        completion_tokens (int): Maximum number of generated tokens.
+
+    Returns:
+        int: Estimated number of tokens.
+    """
+    return sum(len(text) // 3 + 1 for text in texts) + completion_tokens
+
+
+def _retry_after(error: "RateLimitError") -> float:
+    try:
+        return float(error.headers.get("retry-after", DEFAULT_RETRY_AFTER))
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+class SharedRateLimiter:
+    """
+    Token buckets for requests and tokens per minute, shared by all workers.
+
+    The buckets live in a small file guarded by ``flock``, so every worker
+    of the host draws from the same quota. Updates take microseconds and are
+    done inline. The refill rate is scaled down by half on every 429 and
+    grows back additively on success (AIMD). Batch work, such as ingestion
+    and evaluation, cannot use the last ``interactive_reserve`` share of the
+    buckets, which keeps room for interactive requests.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        rpm: int,
+        tpm: int,
+        interactive_reserve: float,
+        retries: int,
+    ) -> None:
+        self.path = path
+        self.rpm = rpm
+        self.tpm = tpm
+        self.interactive_reserve = interactive_reserve
+        self.retries = retries
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+
+    def _open(self) -> int:
+        # Locks belong to the open file, forked workers must open their own.
+        if self._fd is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+    @contextmanager
+    def _state(self) -> Iterator[List[float]]:
+        """Lock the shared state, the yielded list is written back on exit."""
+        fd = self._open()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            data = os.pread(fd, STATE.size, 0)
+            if len(data) == STATE.size:
+                state = list(STATE.unpack(data))
+            else:
+                state = [time.time(), self.rpm, self.tpm, 1.0, 0.0]
+            yield state
+            os.pwrite(fd, STATE.pack(*state), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    @property
+    def scale(self) -> float:
+        """Share of the quota currently used as the refill rate."""
+        with self._state() as state:
+            return state[3]
+
+    def try_acquire(self, tokens: int, priority: Priority) -> float:
+        """
+        Take one request and the tokens from the buckets if available.
+
+        Returns:
+            float: 0 if acquired, else the seconds to wait before retrying.
+        """
+        with self._state() as state:
+            updated, requests, available_tokens, scale, blocked_until = state
+            now = time.time()
+            if now < blocked_until:
+                return blocked_until - now
+
+            request_rate = self.rpm * scale / 60
+            token_rate = self.tpm * scale / 60
+            request_capacity = request_rate * BURST_SECONDS
+            token_capacity = token_rate * BURST_SECONDS
+            elapsed = max(now - updated, 0.0)
+            requests = min(request_capacity, requests + elapsed * request_rate)
+            available_tokens = min(
+                token_capacity,
+                available_tokens + elapsed * token_rate,
+            )
+            state[:3] = [now, requests, available_tokens]
+
+            reserve = self.interactive_reserve if priority is Priority.BATCH else 0.0
+            # Calls larger than the bucket wait for a full bucket.
+            cost = min(tokens, token_capacity * (1 - reserve))
+            needed_requests = 1 + reserve * request_capacity
+            needed_tokens = cost + reserve * token_capacity
+            if requests >= needed_requests and available_tokens >= needed_tokens:
+                state[1] = requests - 1
+                state[2] = available_tokens - cost
+                return 0.0
+            return max(
+                (needed_requests - requests) / request_rate,
+                (needed_tokens - available_tokens) / token_rate,
+            )
+
+    async def acquire(self, tokens: int, priority: Optional[Priority] = None) -> None:
+        """
+        Wait until the shared quota allows a call.
+
+        Args:
+            tokens (int): Estimated tokens of the call.
+            priority (Optional[Priority]): Priority of the call, defaults to
+                the priority of the current request.
+
+        Raises:
+            DeadlineExceededError: If the quota is not available within the
+                request budget.
+        """
+        if priority is None:
+            priority = current_priority()
+        start = time.perf_counter()
+        while (wait := self.try_acquire(tokens, priority)) > 0:
+            remaining = remaining_time()
+            if remaining is not None and wait > remaining:
+                raise DeadlineExceededError(
+                    "The provider quota is not available within the request budget.",
+                )
+            await asyncio.sleep(min(wait, MAX_SLEEP))
+        RATE_LIMIT_WAIT.labels(priority=priority.name.lower()).observe(
+            time.perf_counter() - start,
+        )
+
+    def on_success(self, estimated_tokens: int, used_tokens: int) -> None:
+        """Return unused estimated tokens and increase the rate additively."""
+        with self._state() as state:
+            state[2] += estimated_tokens - used_tokens
+            state[3] = min(1.0, state[3] + ADDITIVE_STEP)
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        """Halve the rate and pause all workers for ``retry_after`` seconds."""
+        RATE_LIMITED.inc()
+        with self._state() as state:
+            state[1] = 0.0
+            state[3] = max(MIN_SCALE, state[3] / 2)
+            state[4] = max(state[4], time.time() + retry_after)
+            scale = state[3]
+        logger.warning(
+            f"Rate limited by the provider, pausing for {retry_after:.1f}s "
+            f"at {scale:.0%} of the quota.",
+        )
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        estimated_tokens: int,
+    ) -> T:
+        """
+        Call the provider within the shared quota.
+
+        Calls rejected with 429 are retried once the quota allows it.
+
+        Args:
+            request (Callable[[], Awaitable[T]]): Makes the call.
+            estimated_tokens (int): Estimated tokens of the call.
+
+        Returns:
+            T: The provider response.
+
+        Raises:
+            openai.error.RateLimitError: If the call is still rejected after
+                ``retries`` retries.
+        """
+        from openai.error import RateLimitError
+
+        attempt = 0
+        while True:
+            await self.acquire(estimated_tokens)
+            try:
+                response = await request()
+            except RateLimitError as e:
+                self.on_rate_limited(_retry_after(e))
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                continue
+            usage = response.get("usage", {})
+            self.on_success(
+                estimated_tokens,
+                usage.get("total_tokens", estimated_tokens),
+            )
+            return response
+
+
+openai_rate_limiter = SharedRateLimiter(
+    settings.openai_rate_limit_path,
+    rpm=settings.openai_rpm_limit,
+    tpm=settings.openai_tpm_limit,
+    interactive_reserve=settings.openai_interactive_reserve,
+    retries=settings.openai_rate_limit_retries,
+)
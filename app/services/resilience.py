@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Awaitable, Callable, Deque, Iterator, Optional, Tuple, TypeVar
+
+from app.core.settings import settings
+from app.services.metrics import CIRCUIT_OPENED, HEDGED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Monotonic time at which the request being served must be answered.
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+@lru_cache(maxsize=None)
+def provider_errors() -> Tuple[type, ...]:
+    """
+    Get the errors showing that the provider is unhealthy.
+
+    Rejected requests and rate limits are handled by the caller and the
+    rate limiter instead. openai is imported on the first call.
+    """
+    from openai import error
+
+    return (
+        asyncio.TimeoutError,
+        error.APIError,
+        error.APIConnectionError,
+        error.ServiceUnavailableError,
+        error.Timeout,
+        error.TryAgain,
+    )
+
+
+class ProviderUnavailableError(Exception):
+    """The LLM provider cannot serve the call in time."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(ProviderUnavailableError):
+    """The time budget of the request is spent."""
+
+
+class CircuitOpenError(ProviderUnavailableError):
+    """The circuit of the provider is open, calls fail fast."""
+
+
+@contextmanager
+def request_deadline(budget: float) -> Iterator[None]:
+    """
+    Give the calls made within the block a shared time budget.
+
+    Args:
+        budget (float): The budget in seconds.
+    """
+    token = _deadline.set(time.monotonic() + budget)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Get the seconds left of the request budget, None without a budget."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def call_timeout(limit: Optional[float]) -> Optional[float]:
+    """
+    Get the timeout of a single call within the request budget.
+
+    Args:
+        limit (Optional[float]): Upper bound of the call duration.
+
+    Returns:
+        Optional[float]: The timeout, None without a limit or a budget.
+
+    Raises:
+        DeadlineExceededError: If the budget is already spent.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return limit
+    if remaining <= 0:
+        raise DeadlineExceededError("The request time budget is spent.")
+    return remaining if limit is None else min(remaining, limit)
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while a dependency is unhealthy.
+
+    The circuit opens after ``failure_threshold`` consecutive failures.
+    Once ``reset_timeout`` seconds passed, a single trial call is let
+    through: its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently rejected."""
+        if self.opened_at is None:
+            return False
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return True
+        return self._trial_running
+
+    def fail_fast(self) -> None:
+        """
+        Fail fast while the circuit is open, without taking the trial call.
+
+        Callers use it before waiting for the rate limiter, the call itself
+        goes through `check`.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        if self.is_open:
+            retry_after = self.reset_timeout - (time.monotonic() - self.opened_at)
+            raise CircuitOpenError(
+                f"The {self.name} provider is unavailable.",
+                retry_after=max(retry_after, 1.0),
+            )
+
+    def check(self) -> None:
+        """
+        Let a call through, or fail fast.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        self.fail_fast()
+        if self.opened_at is not None:
+            self._trial_running = True
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        if self.opened_at is not None:
+            logger.info(f"Circuit {self.name} closed.")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def cancel_trial(self) -> None:
+        """Let another trial call through, the running one was cancelled."""
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit past the threshold."""
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(
+                    f"Circuit {self.name} opened after {self.failures} failures.",
+                )
+                CIRCUIT_OPENED.labels(circuit=self.name).inc()
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of call durations."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, duration: float) -> None:
+        """Add the duration of a call in seconds."""
+        self._samples.append(duration)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """Get a percentile of the window, None until it has enough samples."""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(quantile * len(ordered)) - 1)]
+
+
+async def call_provider(
+    breaker: CircuitBreaker,
+    request: Callable[[Optional[float]], Awaitable[T]],
+    limit: Optional[float],
+) -> T:
+    """
+    Call the provider within the request budget, through a circuit breaker.
+
+    Args:
+        breaker (CircuitBreaker): Breaker of the provider.
+        request (Callable[[Optional[float]], Awaitable[T]]): Makes the call,
+            it gets the timeout to pass to the client.
+        limit (Optional[float]): Upper bound of the call duration.
+
+    Returns:
+        T: The provider response.
+
+    Raises:
+        CircuitOpenError: If the circuit is open.
+        DeadlineExceededError: If the call does not finish within the budget.
+    """
+    from openai.error import OpenAIError
+
+    timeout = call_timeout(limit)
+    breaker.check()
+    try:
+        response = await asyncio.wait_for(request(timeout), timeout)
+    except asyncio.TimeoutError as e:
+        breaker.record_failure()
+        raise DeadlineExceededError(
+            f"The {breaker.name} call did not finish within {timeout:.1f}s.",
+        ) from e
+    except provider_errors():
+        breaker.record_failure()
+        raise
+    except OpenAIError:
+        # The provider answered, the request itself was rejected.
+        breaker.record_success()
+        raise
+    except BaseException:
+        # Cancelled or failed before reaching the provider.
+        breaker.cancel_trial()
+        raise
+    breaker.record_success()
+    return response
+
+
+async def hedged(request: Callable[[], Awaitable[T]], latency: LatencyTracker) -> T:
+    """
+    Send a duplicate request once the first one is slower than the p95.
+
+    The first successful response wins and the other request is cancelled.
+    Only idempotent calls may be hedged.
+
+    Args:
+        request (Callable[[], Awaitable[T]]): Makes the call.
+        latency (LatencyTracker): Durations of previous calls.
+
+    Returns:
+        T: The first successful response.
+    """
+
+    async def timed() -> T:
+        start = time.perf_counter()
+        response = await request()
+        latency.observe(time.perf_counter() - start)
+        return response
+
+    hedge_delay = latency.percentile(0.95)
+    first = asyncio.ensure_future(timed())
+    pending = {first}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=hedge_delay,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                # The first request is slower than the p95, send a duplicate.
+                HEDGED_REQUESTS.labels(result="sent").inc()
+                pending.add(asyncio.ensure_future(timed()))
+                hedge_delay = None
+                continue
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        HEDGED_REQUESTS.labels(result="won").inc()
+                    return task.result()
+            error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+embedding_breaker = CircuitBreaker(
+    "embedding",
+    settings.circuit_failure_threshold,
+    settings.circuit_reset_seconds,
+)
+llm_breaker = CircuitBreaker(
+    "llm",
+    settings.circuit_failure_threshold,
+    settings.circuit_reset_seconds,
+)
+embedding_latency = LatencyTracker()
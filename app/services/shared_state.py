@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.settings import settings
+from app.db.models.category_centroid import CategoryCentroid
+
+logger = logging.getLogger(__name__)
+
+
+class CentroidSnapshot:
+    """Category centroids of a collection, memory-mapped from a snapshot."""
+
+    def __init__(self, vectors: np.ndarray, manifest: dict) -> None:
+        self.vectors = vectors
+        self.levels = np.asarray(manifest["level"])
+        self.category_1 = np.asarray(manifest["category_1"], dtype=object)
+        self.category_2 = manifest["category_2"]
+
+    def route(
+        self,
+        query_embedding: List[float],
+        level_1_categories: int,
+        level_2_categories: int,
+    ) -> List[Tuple[str, str]]:
+        """
+        Pick the categories closest to a query by cosine similarity.
+
+        Args:
+            query_embedding (List[float]): Embedding of the query.
+            level_1_categories (int): Number of level-1 categories to pick.
+            level_2_categories (int): Number of level-2 categories to pick
+                within them.
+
+        Returns:
+            List[Tuple[str, str]]: Level-1 and level-2 category of each pick.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        # Centroids are stored normalized.
+        similarities = self.vectors @ (query / (np.linalg.norm(query) or 1.0))
+
+        level_1 = np.flatnonzero(self.levels == 1)
+        picked = level_1[np.argsort(-similarities[level_1])[:level_1_categories]]
+        level_2 = np.flatnonzero(
+            (self.levels == 2)
+            & np.isin(self.category_1, self.category_1[picked].tolist()),
+        )
+        picked = level_2[np.argsort(-similarities[level_2])[:level_2_categories]]
+        return [(self.category_1[index], self.category_2[index]) for index in picked]
+
+
+class CentroidIndex:
+    """
+    Category centroids shared by all workers through memory-mapped files.
+
+    Each collection has a manifest pointing to a float32 ``.npy`` matrix of
+    normalized centroids. Manifests are replaced atomically when centroids
+    change, workers notice it by the manifest's mtime and map the new
+    matrix. Mapped pages live in the page cache, so the matrices are held
+    once per host, however many workers use them.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self._snapshots: Dict[str, Tuple[int, CentroidSnapshot]] = {}
+
+    def _manifest_path(self, collection: str) -> Path:
+        return self.directory / f"centroids-{collection}.json"
+
+    def get(self, collection: str) -> Optional[CentroidSnapshot]:
+        """
+        Get the centroids of a collection, None without a snapshot.
+
+        Args:
+            collection (str): Name of the collection.
+
+        Returns:
+            Optional[CentroidSnapshot]: The mapped centroids.
+        """
+        manifest_path = self._manifest_path(collection)
+        try:
+            mtime = manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._snapshots.pop(collection, None)
+            return None
+        cached = self._snapshots.get(collection)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            vectors = np.load(self.directory / manifest["vectors"], mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not map the centroids of '{collection}': {e}")
+            return None
+        snapshot = CentroidSnapshot(vectors, manifest)
+        self._snapshots[collection] = (mtime, snapshot)
+        return snapshot
+
+    def write(self, collection: str, rows: Sequence[Row]) -> None:
+        """
+        Replace the snapshot of a collection.
+
+        Args:
+            collection (str): Name of the collection.
+            rows (Sequence[Row]): Rows of the centroids table, none removes
+                the snapshot.
+        """
+        manifest_path = self._manifest_path(collection)
+        prefix = f"centroids-{collection}-"
+        if rows:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            vectors = np.stack(
+                [np.asarray(row.centroid, dtype=np.float32) for row in rows],
+            )
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors_name = f"{prefix}{uuid.uuid4().hex}.npy"
+            np.save(self.directory / vectors_name, vectors / np.where(norms, norms, 1))
+            manifest = {
+                "vectors": vectors_name,
+                "level": [row.level for row in rows],
+                "category_1": [row.category_1 for row in rows],
+                "category_2": [row.category_2 for row in rows],
+            }
+            tmp_manifest = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_manifest.write_text(
+                json.dumps(manifest, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            tmp_manifest.replace(manifest_path)
+        else:
+            vectors_name = None
+            manifest_path.unlink(missing_ok=True)
+
+        # Workers keep mapping removed files until they notice the change.
+        for path in self.directory.glob(f"{prefix}*.npy"):
+            if path.name != vectors_name:
+                path.unlink(missing_ok=True)
+
+    async def export(self, engine: AsyncEngine, collection: str) -> None:
+        """
+        Write the snapshot of a collection from the centroids table.
+
+        Args:
+            engine (AsyncEngine): Engine of the database.
+            collection (str): Name of the collection.
+        """
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(CategoryCentroid).where(
+                    CategoryCentroid.collection == collection,
+                ),
+            )
+            rows = result.all()
+        await asyncio.to_thread(self.write, collection, rows)
+
+
+centroid_index = CentroidIndex(settings.shared_state_dir)
+
+
+async def _export_all() -> int:
+    engine = create_async_engine(str(settings.db_url), poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            collections = (
+                await conn.execute(select(CategoryCentroid.collection).distinct())
+            ).scalars()
+            collections = collections.all()
+        for collection in collections:
+            await centroid_index.export(engine, collection)
+    finally:
+        await engine.dispose()
+    return len(collections)
+
+
+def prepare_shared_state() -> None:
+    """
+    Export the shared read-only state before workers are forked.
+
+    It runs in the gunicorn master, with an engine that is disposed of
+    before forking, so workers never inherit database connections.
+    """
+    try:
+        exported = asyncio.run(_export_all())
+    except Exception as e:
+        logger.warning(f"Could not export the shared state: {e}")
+        return
+    logger.info(f"Exported the centroids of {exported} collections.")
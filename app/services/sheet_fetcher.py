@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SheetFetcher:
+    """
+    Downloads exported sheets into a local content-addressed cache.
+
+    Every download is stored as ``<sha256>.csv``. The validators returned by
+    the server (ETag, Last-Modified) are kept per URL, so that a sheet which
+    did not change is answered with 304 Not Modified and never downloaded
+    again. Concurrent fetches of the same URL are serialized, so the sheet
+    is downloaded once and the other fetches only revalidate it.
+    """
+
+    def __init__(self, cache_dir: Path, timeout: float) -> None:
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        # Locks of the URLs being fetched, with their number of fetches
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._fetches: "Counter[str]" = Counter()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """HTTP client used for downloads, created on first use."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _index_path(self, url: str) -> Path:
+        url_hash = hashlib.sha256(url.encode()).hexdigest()
+        return self.cache_dir / "index" / f"{url_hash}.json"
+
+    def _load_index(self, url: str) -> dict:
+        index_path = self._index_path(url)
+        if not index_path.exists():
+            return {}
+        entry = json.loads(index_path.read_text(encoding="utf-8"))
+        if not (self.cache_dir / f"{entry['digest']}.csv").exists():
+            return {}
+        return entry
+
+    def _save_index(self, url: str, entry: dict) -> None:
+        index_path = self._index_path(url)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = index_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+        tmp_path.replace(index_path)
+
+    def _remove_unreferenced(self, digest: str) -> None:
+        """Remove a cached file once no URL points to it anymore."""
+        for index_path in (self.cache_dir / "index").glob("*.json"):
+            if json.loads(index_path.read_text(encoding="utf-8"))["digest"] == digest:
+                return
+        (self.cache_dir / f"{digest}.csv").unlink(missing_ok=True)
+
+    async def fetch(self, url: str) -> Path:
+        """
+        Get the local copy of a sheet, downloading it only if it changed.
+
+        Args:
+            url (str): Export URL of the sheet.
+
+        Returns:
+            Path: Path to the cached file. Its name is the sha256 of its content.
+
+        Raises:
+            httpx.HTTPError: If the sheet cannot be downloaded.
+        """
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        self._fetches[url] += 1
+        try:
+            async with lock:
+                return await self._fetch(url)
+        finally:
+            self._fetches[url] -= 1
+            if not self._fetches[url]:
+                del self._fetches[url]
+                del self._locks[url]
+
+    async def _fetch(self, url: str) -> Path:
+        entry = self._load_index(url)
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_dir / f"download-{uuid.uuid4().hex}.tmp"
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == httpx.codes.NOT_MODIFIED and entry:
+                logger.info(f"Sheet {url} is not modified, using the cached copy.")
+                return self.cache_dir / f"{entry['digest']}.csv"
+            response.raise_for_status()
+
+            sha256 = hashlib.sha256()
+            try:
+                # Chunks are small writes to the page cache, they do not
+                # block the event loop noticeably.
+                with tmp_path.open("wb") as f:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        sha256.update(chunk)
+                        f.write(chunk)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+
+        digest = sha256.hexdigest()
+        path = self.cache_dir / f"{digest}.csv"
+        tmp_path.replace(path)
+        self._save_index(url, {"digest": digest, **validators})
+        if entry and entry["digest"] != digest:
+            self._remove_unreferenced(entry["digest"])
+        logger.info(f"Downloaded sheet {url} ({digest[:12]}).")
+        return path
+
+
+sheet_fetcher = SheetFetcher(settings.sheet_cache_dir, settings.sheet_fetch_timeout)
@@ -0,0 +1,99 @@
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+SUPPORTED_FORMATS = ("csv", "xlsx", "parquet")
+
+
+def file_format(filename: Optional[str]) -> str:
+    """
+    Get the format of an uploaded file from its name.
+
+    Args:
+        filename (Optional[str]): Name of the uploaded file.
+
+    Returns:
+        str: One of the supported formats.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    suffix = (filename or "").rsplit(".", 1)[-1].lower()
+    if suffix not in SUPPORTED_FORMATS:
+        raise ValueError(
+            f"Unsupported file format '{suffix}'. "
+            f"Supported formats: {', '.join(SUPPORTED_FORMATS)}.",
+        )
+    return suffix
+
+
+def _csv_batches(source: BinaryIO, batch_size: int) -> Iterator["pa.RecordBatch"]:
+    # pyarrow is imported on first use, serving queries does not need it.
+    from pyarrow import csv
+
+    reader = csv.open_csv(
+        source,
+        convert_options=csv.ConvertOptions(strings_can_be_null=True),
+    )
+    # Blocks are decoded by size in bytes, they are sliced to batch_size rows.
+    for block in reader:
+        for start in range(0, block.num_rows, batch_size):
+            yield block.slice(start, batch_size)
+
+
+def _parquet_batches(source: BinaryIO, batch_size: int) -> Iterator["pa.RecordBatch"]:
+    from pyarrow import parquet
+
+    yield from parquet.ParquetFile(source).iter_batches(batch_size=batch_size)
+
+
+def _xlsx_batches(source: BinaryIO, batch_size: int) -> Iterator["pa.RecordBatch"]:
+    import pyarrow as pa
+
+    # openpyxl is only needed for excel files.
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(name) for name in next(rows, ())]
+        columns: Dict[str, List[Optional[str]]] = {name: [] for name in header}
+        for row in rows:
+            for name, value in zip(header, row):
+                columns[name].append(None if value is None else str(value))
+            if len(columns[header[0]]) >= batch_size:
+                yield pa.RecordBatch.from_pydict(columns)
+                columns = {name: [] for name in header}
+        if header and columns[header[0]]:
+            yield pa.RecordBatch.from_pydict(columns)
+    finally:
+        workbook.close()
+
+
+def iter_record_batches(
+    source: BinaryIO,
+    fmt: str,
+    batch_size: int,
+) -> Iterator["pa.RecordBatch"]:
+    """
+    Read a CSV, XLSX or Parquet file as a stream of Arrow record batches.
+
+    The file is never loaded as a whole: CSV and Parquet are decoded block
+    by block, XLSX rows are streamed in read-only mode.
+
+    Args:
+        source (BinaryIO): The file, opened in binary mode.
+        fmt (str): Format of the file, see ``SUPPORTED_FORMATS``.
+        batch_size (int): Maximum number of rows per batch.
+
+    Returns:
+        Iterator[pa.RecordBatch]: The record batches of the file.
+    """
+    if fmt == "csv":
+        return _csv_batches(source, batch_size)
+    if fmt == "parquet":
+        return _parquet_batches(source, batch_size)
+    if fmt == "xlsx":
+        return _xlsx_batches(source, batch_size)
+    raise ValueError(f"Unsupported file format '{fmt}'.")
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, List, Optional, Tuple
+
+from app.core.settings import settings
+from app.utils.log_utils import SampledLogger
+from app.utils.vector_store import VectorStore, validate_search
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Column with the product names of a supplier price list
+QUERY_COLUMN = "Tên SP"
+
+# Rows of the input with their number, and the embeddings of the non-empty ones
+EmbeddedBatch = Tuple[List[Tuple[int, Optional[str]]], Optional[List[List[float]]]]
+
+
+def iter_queries(
+    batches: Iterator["pa.RecordBatch"],
+    column: str,
+    batch_size: int,
+) -> Iterator[List[Tuple[int, Optional[str]]]]:
+    """
+    Read the queries of a file as numbered rows, in batches.
+
+    Args:
+        batches (Iterator[pa.RecordBatch]): Rows of the file.
+        column (str): Column with the queries.
+        batch_size (int): Maximum number of rows per batch.
+
+    Yields:
+        List[Tuple[int, Optional[str]]]: Row number, from 1, and the trimmed
+            query of each row, None when it is empty.
+
+    Raises:
+        ValueError: If the file misses the column.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    row_number = 0
+    for batch in batches:
+        if column not in batch.schema.names:
+            raise ValueError(f"Input data must contain the column '{column}'.")
+        queries = pc.utf8_trim_whitespace(pc.cast(batch.column(column), pa.string()))
+        values = queries.to_pylist()
+        for start in range(0, len(values), batch_size):
+            rows = []
+            for query in values[start : start + batch_size]:
+                row_number += 1
+                rows.append((row_number, query or None))
+            yield rows
+
+
+async def _embed_batches(
+    batches: Iterator[List[Tuple[int, Optional[str]]]],
+    vector_store: VectorStore,
+    embedded: "asyncio.Queue[Optional[EmbeddedBatch]]",
+) -> None:
+    """
+    Read and embed batches ahead of the searches, up to the queue size.
+
+    The end marker is also put when reading fails, the error is raised by
+    the task.
+    """
+    failed_batches = SampledLogger(logger)
+    try:
+        while (rows := await asyncio.to_thread(next, batches, None)) is not None:
+            queries = [query for _, query in rows if query is not None]
+            embeddings: Optional[List[List[float]]] = []
+            if queries:
+                try:
+                    embeddings = await vector_store.get_embeddings(queries)
+                except Exception as e:
+                    failed_batches.event(
+                        logging.ERROR,
+                        "Error embedding a batch of %s queries: %s",
+                        len(queries),
+                        e,
+                    )
+                    embeddings = None
+            await embedded.put((rows, embeddings))
+    except Exception:
+        await embedded.put(None)
+        raise
+    await embedded.put(None)
+
+
+async def bulk_search(
+    batches: Iterator[List[Tuple[int, Optional[str]]]],
+    vector_store: VectorStore,
+    collection: str,
+    mode: str = "flat",
+    limit: int = 5,
+) -> AsyncIterator[dict]:
+    """
+    Search every query of a file, yielding the results row by row.
+
+    Reading and embedding run ahead of the searches by at most
+    ``settings.bulk_search_prefetch`` batches, and the searches of a batch
+    run ``settings.bulk_search_concurrency`` at a time. Only a few batches
+    are held at once, whatever the size of the file. Rows are yielded in
+    the order of the file as soon as their batch is searched.
+
+    Args:
+        batches (Iterator[List[Tuple[int, Optional[str]]]]): Numbered
+            queries, see `iter_queries`. They are read in a worker thread.
+        vector_store (VectorStore): The vector store.
+        collection (str): Collection to search.
+        mode (str): Search mode, see `VectorStore.search`.
+        limit (int): Results per query.
+
+    Yields:
+        dict: The row number, the query and either its results or an error,
+            then a summary of the job.
+
+    Raises:
+        ValueError: If the search mode or the collection is invalid.
+    """
+    validate_search(mode, collection)
+    embedded: "asyncio.Queue[Optional[EmbeddedBatch]]" = asyncio.Queue(
+        maxsize=settings.bulk_search_prefetch,
+    )
+    producer = asyncio.create_task(_embed_batches(batches, vector_store, embedded))
+    searches = asyncio.Semaphore(settings.bulk_search_concurrency)
+
+    async def search(embedding: List[float]) -> List[dict]:
+        async with searches:
+            return await vector_store.search_by_embedding(
+                embedding,
+                limit=limit,
+                collection=collection,
+                mode=mode,
+            )
+
+    rows_count = failed = 0
+    try:
+        while (item := await embedded.get()) is not None:
+            rows, embeddings = item
+            results: List[object] = []
+            if embeddings:
+                results = await asyncio.gather(
+                    *(search(embedding) for embedding in embeddings),
+                    return_exceptions=True,
+                )
+            found = iter(results)
+            for row_number, query in rows:
+                rows_count += 1
+                if query is None:
+                    yield {"row": row_number, "query": None, "results": []}
+                    continue
+                result = next(found, None) if embeddings is not None else None
+                if isinstance(result, list):
+                    yield {"row": row_number, "query": query, "results": result}
+                    continue
+                failed += 1
+                error = "embedding failed" if result is None else str(result)
+                yield {"row": row_number, "query": query, "error": error}
+        # Raises the error that stopped reading the file, if any.
+        await producer
+    finally:
+        producer.cancel()
+    yield {"summary": {"rows": rows_count, "failed": failed}}
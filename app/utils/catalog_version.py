@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CatalogChange:
+    """A committed change of a collection."""
+
+    collection: str
+    version: int
+    # Position of the primary's write-ahead log after the change, when read
+    # replicas are used
+    lsn: Optional[int] = None
+    # Host of the writer
+    host: str = ""
+    # Time of the change, as seconds since the epoch
+    published_at: float = 0.0
+
+
+class CatalogVersions:
+    """
+    Version of each collection, bumped whenever its records change.
+
+    Results computed for a version must not be reused once the collection
+    changed. Versions are stored in the database and broadcast to all
+    workers, see `CatalogBus`, so each worker sees the writes of the others.
+    Subscribers are called once per change, to drop or refresh their caches.
+    """
+
+    def __init__(self) -> None:
+        self._versions: Dict[str, int] = {}
+        self._subscribers: List[Callable[[CatalogChange], Awaitable[None]]] = []
+
+    def get(self, collection: str) -> int:
+        """
+        Get the current version of a collection.
+
+        Args:
+            collection (str): Name of the collection.
+
+        Returns:
+            int: The version.
+        """
+        return self._versions.get(collection, 0)
+
+    def subscribe(self, callback: Callable[[CatalogChange], Awaitable[None]]) -> None:
+        """
+        Call a function on every change seen by this worker.
+
+        Args:
+            callback (Callable[[CatalogChange], Awaitable[None]]): The
+                function, its errors are logged.
+        """
+        self._subscribers.append(callback)
+
+    async def apply(self, change: CatalogChange, notify: bool = True) -> bool:
+        """
+        Record a change of a collection, if it is newer than the version known.
+
+        Changes can be seen twice, once when made by this worker and once
+        broadcast, or out of order after a reconnection. Only the first
+        sighting of a newer version counts.
+
+        Args:
+            change (CatalogChange): The change.
+            notify (bool): Whether to call the subscribers, not when loading
+                the versions on startup.
+
+        Returns:
+            bool: Whether the change was new.
+        """
+        if change.version <= self.get(change.collection):
+            return False
+        self._versions[change.collection] = change.version
+        if not notify:
+            return True
+        results = await asyncio.gather(
+            *(callback(change) for callback in self._subscribers),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(
+                    f"Failed to handle the change of '{change.collection}': {result}",
+                )
+        return True
+
+
+catalog_versions = CatalogVersions()
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.text_utils import fold_accents
+
+# Metadata keys of a kept row: rows merged into it, and how many there were
+SOURCES_KEY = "sources"
+MERGED_KEY = "merged"
+
+
+class Deduplicator:
+    """
+    Merges the duplicate catalog rows of one ingestion.
+
+    Rows are exact duplicates when their contents are equal once case,
+    whitespace and diacritics are ignored. They are merged by hash of the
+    normalized contents before embedding, across all batches of the
+    ingestion. Near duplicates, rows whose embeddings have a cosine
+    similarity of at least ``similarity``, are merged within a batch.
+
+    Only the first row of a group is stored, the contents and metadata of
+    the others are listed in its metadata, up to ``max_sources`` of them.
+    The id of a stored row is its hash, salted per ingestion, so the
+    duplicates of an already inserted row can be recorded on it without
+    keeping ids around; see `pending_updates`. About 100 bytes are kept
+    per distinct row.
+
+    The rows of a batch are only merged into each other until the batch is
+    stored, see `commit`; if storing it fails, `rollback` forgets them, so
+    later duplicates are not merged into rows that do not exist.
+    """
+
+    def __init__(
+        self,
+        similarity: Optional[float] = None,
+        max_sources: int = 20,
+    ) -> None:
+        self.similarity = similarity
+        self.max_sources = max_sources
+        self.merged_rows = 0
+        self._salt = os.urandom(16)
+        # Hash of every row stored, or merged into a stored row, to the hash
+        # of the row it was merged into, itself for stored rows.
+        self._seen: Dict[bytes, bytes] = {}
+        # The same for the rows of the batch being stored
+        self._batch: Dict[bytes, bytes] = {}
+        self._counts: "Counter[bytes]" = Counter()
+        # Merges not recorded on the stored row yet
+        self._pending: Dict[bytes, dict] = {}
+
+    def _digest(self, content: str) -> bytes:
+        return hashlib.blake2b(
+            fold_accents(content).encode(),
+            digest_size=16,
+            key=self._salt,
+        ).digest()
+
+    def _kept(self, digest: bytes) -> Optional[bytes]:
+        for seen in (self._seen, self._batch):
+            kept = seen.get(digest)
+            if kept is not None:
+                # Rows merged as near duplicates point to a row that is kept.
+                return seen[kept]
+        return None
+
+    def _merge(self, kept: bytes, merged: int, sources: List[dict]) -> None:
+        self.merged_rows += merged
+        room = self.max_sources - self._counts[kept]
+        self._counts[kept] += merged
+        pending = self._pending.setdefault(kept, {MERGED_KEY: 0, SOURCES_KEY: []})
+        pending[MERGED_KEY] += merged
+        pending[SOURCES_KEY].extend(sources[: max(room, 0)])
+
+    def _merge_row(
+        self,
+        digest: bytes,
+        kept: bytes,
+        content: str,
+        row_metadata: dict,
+    ) -> None:
+        """Merge a new row, and the rows already merged into it, into another."""
+        self._batch[digest] = kept
+        self._counts.pop(digest, None)
+        pending = self._pending.pop(digest, {MERGED_KEY: 0, SOURCES_KEY: []})
+        self.merged_rows -= pending[MERGED_KEY]
+        self._merge(
+            kept,
+            1 + pending[MERGED_KEY],
+            [{"contents": content, **row_metadata}, *pending[SOURCES_KEY]],
+        )
+
+    def exact(
+        self,
+        contents: List[str],
+        metadata: List[dict],
+    ) -> Tuple[List[str], List[dict], List[bytes]]:
+        """
+        Drop the rows of a batch already seen in this ingestion.
+
+        Args:
+            contents (List[str]): Contents of the rows.
+            metadata (List[dict]): Category metadata of the rows.
+
+        Returns:
+            Tuple[List[str], List[dict], List[bytes]]: Contents, metadata and
+                hashes of the new rows.
+        """
+        new_contents, new_metadata, digests = [], [], []
+        for content, row_metadata in zip(contents, metadata):
+            digest = self._digest(content)
+            kept = self._kept(digest)
+            if kept is not None:
+                self._merge(kept, 1, [{"contents": content, **row_metadata}])
+                continue
+            self._batch[digest] = digest
+            new_contents.append(content)
+            new_metadata.append(row_metadata)
+            digests.append(digest)
+        return new_contents, new_metadata, digests
+
+    def near(
+        self,
+        contents: List[str],
+        metadata: List[dict],
+        digests: List[bytes],
+        embeddings: List[List[float]],
+    ) -> List[int]:
+        """
+        Merge the near duplicates of a batch into the first row of their group.
+
+        Args:
+            contents (List[str]): Contents of the new rows, see `exact`.
+            metadata (List[dict]): Category metadata of the new rows.
+            digests (List[bytes]): Hashes of the new rows.
+            embeddings (List[List[float]]): Embeddings of the new rows.
+
+        Returns:
+            List[int]: Indexes of the rows to store.
+        """
+        if self.similarity is None or len(embeddings) < 2:
+            return list(range(len(embeddings)))
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        similarities = vectors @ vectors.T
+
+        kept: List[int] = []
+        for index, digest in enumerate(digests):
+            if kept:
+                closest = kept[int(np.argmax(similarities[index, kept]))]
+                if similarities[index, closest] >= self.similarity:
+                    self._merge_row(
+                        digest,
+                        digests[closest],
+                        contents[index],
+                        metadata[index],
+                    )
+                    continue
+            kept.append(index)
+        return kept
+
+    def record_id(self, digest: bytes) -> uuid.UUID:
+        """Get the id of the stored row with a hash."""
+        return uuid.UUID(bytes=digest)
+
+    def annotate(self, digest: bytes, row_metadata: dict) -> dict:
+        """
+        Record the rows merged so far into a row about to be stored.
+
+        Args:
+            digest (bytes): Hash of the row.
+            row_metadata (dict): Category metadata of the row.
+
+        Returns:
+            dict: The metadata, with the merged rows if there are any.
+        """
+        pending = self._pending.get(digest)
+        if pending is None:
+            return row_metadata
+        return {**row_metadata, **pending}
+
+    def commit(self) -> None:
+        """Record the rows of the batch as stored, with their merged rows."""
+        for digest, kept in self._batch.items():
+            self._seen[digest] = kept
+            if digest == kept:
+                # Already recorded on the row by `annotate`.
+                self._pending.pop(digest, None)
+        self._batch.clear()
+
+    def rollback(self) -> None:
+        """Forget the rows of a batch that could not be stored."""
+        for digest in self._batch:
+            self._counts.pop(digest, None)
+            pending = self._pending.pop(digest, None)
+            if pending is not None:
+                self.merged_rows -= pending[MERGED_KEY]
+        self._batch.clear()
+
+    def pending_updates(self) -> List[dict]:
+        """
+        Get the merges into rows that are already stored, and forget them.
+
+        Returns:
+            List[dict]: "id", "merged" and "sources" of every updated row.
+        """
+        updates = [
+            {"id": str(self.record_id(digest)), **pending}
+            for digest, pending in self._pending.items()
+        ]
+        self._pending.clear()
+        return updates
@@ -1,15 +1,47 @@
+import asyncio
 import logging
 import re
 import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 
-import pandas as pd
+from sqlalchemy import Table
 
-from app.utils.vector_store import VectorStore
+from app.core.settings import settings
+from app.services.sheet_fetcher import sheet_fetcher
+from app.utils.dedup import Deduplicator
+from app.utils.log_utils import SampledLogger
+from app.utils.timing import stage_timer
+from app.utils.vector_store import DEFAULT_COLLECTION, VectorStore
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Columns with the category tree of a catalog row
+METADATA_COLUMNS = ("Danh mục cấp 1", "Danh mục cấp 2", "Danh mục cấp 3")
+CONTENT_COLUMN = "Danh mục cấp 4"
+
+# Parsed sheets by content hash, so an unchanged sheet is never parsed twice.
+_parsed_sheets: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+
+
+@dataclass
+class IngestResult:
+    """Counts of the rows of an ingestion."""
+
+    rows: int = 0
+    inserted: int = 0
+    merged: int = 0
+    failed_batches: int = 0
+    failed_rows: int = 0
+
 # Generate a fommatted String for related docs
+@stage_timer("prompt_build")
 def relevant_doc(related_docs: list) -> str:  # noqa: D103
     relevant_docs = ""
     for doc in related_docs:
@@ -26,7 +58,173 @@ def relevant_doc(related_docs: list) -> str:  # noqa: D103
     return relevant_docs
 
 
-async def prepare_data(data_excel: pd.DataFrame, vector_store: VectorStore) -> None:
+def retrieval_only_answer(related_docs: list, limit: int = 5) -> str:
+    """
+    Answer with the closest catalog rows when no completion can be made.
+
+    Args:
+        related_docs (list): Search results, closest first.
+        limit (int): Maximum number of listed rows.
+
+    Returns:
+        str: The answer.
+    """
+    lines = ["Hiện không thể tạo câu trả lời. Các sản phẩm liên quan nhất:"]
+    for doc in related_docs[:limit]:
+        metadata = doc["metadata"] or {}
+        categories = " > ".join(
+            metadata[column] for column in METADATA_COLUMNS if metadata.get(column)
+        )
+        lines.append(f"- {doc['contents']} ({categories})")
+    return "\n".join(lines)
+
+
+def clean_batch(batch: "pa.RecordBatch") -> Tuple[List[str], List[dict]]:
+    """
+    Extract contents and category metadata from a batch of catalog rows.
+
+    Cleaning runs as vectorized Arrow column operations: contents are cast
+    to text and trimmed, rows with empty contents are dropped and the
+    category columns are filtered alongside.
+
+    Args:
+        batch (pa.RecordBatch): Catalog rows.
+
+    Returns:
+        Tuple[List[str], List[dict]]: Contents of the kept rows and their metadata.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    contents = pc.utf8_trim_whitespace(
+        pc.cast(batch.column(CONTENT_COLUMN), pa.string()),
+    )
+    keep = pc.fill_null(pc.not_equal(contents, ""), False)
+
+    metadata_columns = {
+        column: pc.filter(
+            pc.cast(batch.column(column), pa.string()),
+            keep,
+        ).to_pylist()
+        for column in METADATA_COLUMNS
+        if column in batch.schema.names
+    }
+    kept_contents = pc.filter(contents, keep).to_pylist()
+    metadata = [
+        {
+            column: values[index]
+            for column, values in metadata_columns.items()
+            if values[index] is not None
+        }
+        for index in range(len(kept_contents))
+    ]
+    return kept_contents, metadata
+
+
+async def ingest_batches(
+    batches: Iterator["pa.RecordBatch"],
+    vector_store: VectorStore,
+    collection: str = DEFAULT_COLLECTION,
+    table: Optional[Table] = None,
+) -> IngestResult:
+    """
+    Embed catalog rows batch by batch and insert them into the vector store.
+
+    Batches are pulled from the iterator in a worker thread, so reading
+    and decoding files never blocks the event loop. Duplicate rows are
+    merged before embedding, see `Deduplicator`. Each batch is embedded
+    with batched embedding requests and inserted in one statement. A batch
+    that cannot be embedded or inserted is logged and skipped, callers
+    check the failed counts of the result.
+
+    Args:
+        batches (Iterator[pa.RecordBatch]): Catalog rows.
+        vector_store (VectorStore): The vector store to generate embeddings
+                                    and insert data.
+        collection (str): The collection of the rows.
+        table (Optional[Table]): Table to insert into, e.g. the staging table
+            of `VectorStore.replace_collection`.
+
+    Returns:
+        IngestResult: Counts of the rows.
+
+    Raises:
+        ValueError: If a batch misses the content column.
+    """
+    result = IngestResult()
+    failed_batches = SampledLogger(logger)
+    dedup = Deduplicator(
+        settings.ingest_near_duplicate_similarity,
+        settings.ingest_dedup_max_sources,
+    )
+    while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+        if CONTENT_COLUMN not in batch.schema.names:
+            raise ValueError(f"Input data must contain the column '{CONTENT_COLUMN}'.")
+        result.rows += batch.num_rows
+        contents, metadata = clean_batch(batch)
+        if settings.ingest_dedup:
+            contents, metadata, digests = dedup.exact(contents, metadata)
+        if not contents:
+            continue
+        try:
+            embeddings = await vector_store.get_embeddings(contents)
+            if settings.ingest_dedup:
+                kept = dedup.near(contents, metadata, digests, embeddings)
+                records = [
+                    {
+                        "id": dedup.record_id(digests[index]),
+                        "metadata": dedup.annotate(digests[index], metadata[index]),
+                        "contents": contents[index],
+                        "embedding": embeddings[index],
+                    }
+                    for index in kept
+                ]
+            else:
+                records = [
+                    {
+                        "id": uuid.uuid4(),
+                        "metadata": row_metadata,
+                        "contents": content,
+                        "embedding": embedding,
+                    }
+                    for content, row_metadata, embedding in zip(
+                        contents, metadata, embeddings,
+                    )
+                ]
+            await vector_store.insert(records, collection=collection, table=table)
+        except Exception as e:
+            dedup.rollback()
+            failed_batches.event(
+                logging.ERROR,
+                "Error processing a batch of %s rows: %s",
+                len(contents),
+                e,
+            )
+            result.failed_rows += len(contents)
+            continue
+        dedup.commit()
+        result.inserted += len(records)
+
+    if updates := dedup.pending_updates():
+        await vector_store.merge_sources(updates, collection=collection, table=table)
+    result.merged = dedup.merged_rows
+    result.failed_batches = failed_batches.count
+    logger.info(
+        f"Inserted {result.inserted} of {result.rows} rows, "
+        f"{result.merged} duplicates merged, "
+        f"{result.failed_batches} batches failed.",
+    )
+    if not result.inserted:
+        logger.warning("No valid data to upsert.")
+    return result
+
+
+async def prepare_data(
+    data_excel: "pd.DataFrame",
+    vector_store: VectorStore,
+    collection: str = DEFAULT_COLLECTION,
+    table: Optional[Table] = None,
+) -> IngestResult:
     """
     Prepare data from Excel and upsert it into the vector store.
 
@@ -34,68 +232,74 @@ async def prepare_data(data_excel: pd.DataFrame, vector_store: VectorStore) -> N
         data_excel (pd.DataFrame): The input DataFrame containing the data.
         vector_store (VectorStore): The vector store togenerate embeddings
                                     and upsert data.
+        collection (str): The collection of the data.
+        table (Optional[Table]): Table to insert into, e.g. the staging table
+            of `VectorStore.replace_collection`.
+
+    Returns:
+        IngestResult: Counts of the rows, see `ingest_batches`.
 
     Raises:
         ValueError: If the required column is missing in the input DataFrame.
     """
+    # Validate input DataFrame
+    if CONTENT_COLUMN not in data_excel.columns:
+        raise ValueError(f"Input DataFrame must contain the column '{CONTENT_COLUMN}'.")
 
-    # Define columns to combine for metadata
-    metadata_columns = ["Danh mục cấp 1", "Danh mục cấp 2", "Danh mục cấp 3"]
-    content_column = "Danh mục cấp 4"
+    import pyarrow as pa
 
-    # Validate input DataFrame
-    if content_column not in data_excel.columns:
-        raise ValueError(f"Input DataFrame must contain the column '{content_column}'.")
+    # Convert to Arrow batches, so cleaning runs on whole columns
+    data = pa.Table.from_pandas(data_excel.astype("string"), preserve_index=False)
+    return await ingest_batches(
+        iter(data.to_batches(max_chunksize=settings.ingest_batch_size)),
+        vector_store,
+        collection=collection,
+        table=table,
+    )
 
-    # Prepare data for upsertion
-    prepared_data = []
-    for index, row in data_excel.iterrows():
-        try:
-            # Extract and validate content
-            content = str(row[content_column]).strip()
-            if not content or  pd.isna(content):
-                logger.info(f"Skipping row {index} due to empty content.")
-                continue
-
-            # Extract metadata
-            metadata = {
-                col: row[col] for col in metadata_columns
-                if col in row and pd.notna(row[col])
-            }
-
-            # Generate embedding
-            embedding = await vector_store.get_embedding(content)
-
-            # Create entry
-            entry = {
-                "id": str(uuid.uuid4()),
-                "metadata": metadata,
-                "contents": content,
-                "embedding": embedding,
-            }
-            prepared_data.append(entry)
-        except Exception as e:
-            logger.error(f"Error processing row {index}: {e}")
-            continue
 
-    # Convert to DataFrame and upsert into the vector store
-    if prepared_data:
-        data = pd.DataFrame(prepared_data)
-        await vector_store.upsert(data)
-    else:
-        logger.warning("No valid data to upsert.")
+async def _parse_sheet(path: Path) -> "pd.DataFrame":
+    """
+    Parse a downloaded sheet in a worker thread.
+
+    The cached file is named after the hash of its content, so the parsed
+    DataFrame is cached by file name.
 
+    Args:
+        path (Path): Path to the downloaded CSV file.
+
+    Returns:
+        pd.DataFrame: The parsed sheet. It is shared and must not be modified.
+    """
+    digest = path.stem
+    if digest in _parsed_sheets:
+        _parsed_sheets.move_to_end(digest)
+        return _parsed_sheets[digest]
 
+    # pandas is imported on first use, serving queries does not need it.
+    import pandas as pd
 
-def load_excel_url(file_path: str) -> pd.DataFrame:
+    data = await asyncio.to_thread(pd.read_csv, path)
+    _parsed_sheets[digest] = data
+    while len(_parsed_sheets) > settings.sheet_parse_cache_size:
+        _parsed_sheets.popitem(last=False)
+    return data
+
+
+async def load_excel_url(file_path: str) -> "pd.DataFrame":
     """
     Load data from a Google Sheets URL into a Pandas DataFrame.
 
+    The sheet is downloaded without blocking the event loop and only when
+    it changed since the last download, an unchanged sheet is not parsed
+    again either.
+
     Args:
         file_path (str): The Google Sheets URL.
 
     Returns:
         pd.DataFrame: A DataFrame containing the data from the Google Sheets.
+            It is shared between callers and must not be modified.
 
     Raises:
         ValueError: If the URL is invalid or the file cannot be loaded.
@@ -124,9 +328,9 @@ def load_excel_url(file_path: str) -> pd.DataFrame:
         # Create export URL
         export_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
 
-        # Read the CSV data from the export URL into a DataFrame
-    
-        return pd.read_csv(export_url)
+        # Download the CSV data from the export URL and read it into a DataFrame
+        sheet_path = await sheet_fetcher.fetch(export_url)
+        return await _parse_sheet(sheet_path)
 
 
     except ValueError as ve:
@@ -0,0 +1,211 @@
+import fcntl
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.settings import settings
+from app.services.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "embedding_cache.json"
+# Held by the worker writing the snapshot
+LOCK_NAME = "embedding_cache.lock"
+
+
+@contextmanager
+def _snapshot_lock(directory: Path) -> Iterator[None]:
+    """Let one worker at a time write the snapshot of a directory."""
+    fd = os.open(directory / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _read_snapshot(directory: Path, model: str) -> Optional[Tuple[dict, np.ndarray]]:
+    """
+    Read the manifest of a snapshot and map its embeddings.
+
+    Args:
+        directory (Path): The snapshot directory.
+        model (str): Current embedding model.
+
+    Returns:
+        Optional[Tuple[dict, np.ndarray]]: The manifest and the embeddings,
+            None without a snapshot of the model.
+    """
+    manifest_path = directory / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest["model"] != model:
+            return None
+        vectors = np.load(directory / manifest["vectors"], mmap_mode="r")
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not load the embedding cache snapshot: {e}")
+        return None
+    return manifest, vectors
+
+
+class EmbeddingCache:
+    """
+    In-process LRU cache of query embeddings.
+
+    Embeddings are kept as float32 arrays together with their hit counts,
+    so that the most frequent queries can be persisted in a snapshot and
+    preloaded by the next worker.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """
+        Get the cached embedding of a text.
+
+        Args:
+            text (str): The embedded text.
+
+        Returns:
+            Optional[List[float]]: The embedding, or None on a cache miss.
+        """
+        entry = self._entries.get(text)
+        record_cache_lookup("embedding", hit=entry is not None)
+        if entry is None:
+            return None
+        vector, hits = entry
+        self._entries[text] = (vector, hits + 1)
+        self._entries.move_to_end(text)
+        return vector.tolist()
+
+    def put(self, text: str, embedding: List[float], hits: int = 0) -> None:
+        """
+        Store the embedding of a text, evicting the least recently used entry.
+
+        Args:
+            text (str): The embedded text.
+            embedding (List[float]): Its embedding.
+            hits (int): Initial hit count of the entry.
+        """
+        if self.max_size <= 0:
+            return
+        self._entries[text] = (np.asarray(embedding, dtype=np.float32), hits)
+        self._entries.move_to_end(text)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def most_frequent(self, limit: int) -> List[Tuple[str, np.ndarray, int]]:
+        """
+        Get the most frequently hit entries.
+
+        Args:
+            limit (int): Maximum number of entries.
+
+        Returns:
+            List[Tuple[str, np.ndarray, int]]: Text, embedding and hit count.
+        """
+        entries = sorted(
+            self._entries.items(),
+            key=lambda item: item[1][1],
+            reverse=True,
+        )
+        return [(text, vector, hits) for text, (vector, hits) in entries[:limit]]
+
+    def save_snapshot(self, directory: Path, model: str) -> None:
+        """
+        Persist the most frequent entries to a snapshot directory.
+
+        Workers of a host share the directory and save at shutdown, one at a
+        time under a lock file. Each one merges its entries into the current
+        snapshot, keeping the highest hit count of a text, rather than
+        replacing the entries of the others. The embeddings are written to a
+        new float32 ``.npy`` file first and the manifest pointing to it is
+        replaced atomically, so concurrent readers always see a complete
+        snapshot.
+
+        Args:
+            directory (Path): The snapshot directory.
+            model (str): Embedding model the vectors were produced with.
+        """
+        if not self._entries:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        with _snapshot_lock(directory):
+            merged: Dict[str, Tuple[np.ndarray, int]] = {}
+            snapshot = _read_snapshot(directory, model)
+            if snapshot is not None:
+                manifest, vectors = snapshot
+                for index, (text, hits) in enumerate(
+                    zip(manifest["keys"], manifest["hits"]),
+                ):
+                    merged[text] = (vectors[index], hits)
+            for text, vector, hits in self.most_frequent(self.max_size):
+                if text not in merged or merged[text][1] <= hits:
+                    merged[text] = (vector, hits)
+            entries = sorted(merged.items(), key=lambda item: item[1][1], reverse=True)
+            entries = entries[: self.max_size]
+
+            vectors_name = f"vectors-{uuid.uuid4().hex}.npy"
+            np.save(
+                directory / vectors_name,
+                np.stack([vector for _, (vector, _) in entries]),
+            )
+            manifest = {
+                "model": model,
+                "vectors": vectors_name,
+                "keys": [text for text, _ in entries],
+                "hits": [hits for _, (_, hits) in entries],
+            }
+            tmp_manifest = directory / f"{MANIFEST_NAME}.{os.getpid()}.tmp"
+            tmp_manifest.write_text(
+                json.dumps(manifest, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            tmp_manifest.replace(directory / MANIFEST_NAME)
+
+            # Remove vectors of previous snapshots, no other writer runs.
+            for path in directory.glob("vectors-*.npy"):
+                if path.name != vectors_name:
+                    path.unlink(missing_ok=True)
+        logger.info(f"Saved {len(entries)} embeddings to the cache snapshot.")
+
+    def load_snapshot(self, directory: Path, model: str, limit: int) -> int:
+        """
+        Preload the most frequent entries of a snapshot.
+
+        Args:
+            directory (Path): The snapshot directory.
+            model (str): Current embedding model, snapshots of other
+                models are ignored.
+            limit (int): Maximum number of entries to load.
+
+        Returns:
+            int: Number of loaded entries.
+        """
+        snapshot = _read_snapshot(directory, model)
+        if snapshot is None:
+            return 0
+        manifest, vectors = snapshot
+        count = min(limit, len(manifest["keys"]), self.max_size)
+        # Snapshots are ordered by frequency, insert the least frequent first
+        # so the most frequent entries are the last to be evicted.
+        for index in reversed(range(count)):
+            self.put(manifest["keys"][index], vectors[index], manifest["hits"][index])
+        return count
+
+
+embedding_cache = EmbeddingCache(settings.embedding_cache_size)
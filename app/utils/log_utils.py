@@ -1,6 +1,6 @@
 import logging
 import sys
-from typing import Union
+from typing import Any, Union
 
 from loguru import logger
 
@@ -29,16 +29,57 @@ class InterceptHandler(logging.Handler):
         except ValueError:
             level = record.levelno
 
-        # Find caller from where originated the logged message
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:
-            frame = frame.f_back  # type: ignore
-            depth += 1
+        # The caller is already known from the record, so there is
+        # no need to walk the stack frames to find it.
+        logger.patch(
+            lambda loguru_record: loguru_record.update(
+                name=record.name,
+                function=record.funcName,
+                line=record.lineno,
+            ),
+        ).opt(exception=record.exc_info).log(level, record.getMessage())
 
-        logger.opt(depth=depth, exception=record.exc_info).log(
-            level,
-            record.getMessage(),
-        )
+
+class SampledLogger:
+    """
+    Logger for events repeated once per row.
+
+    The first ``burst`` events are logged, after that only the events whose
+    count is a power of ten. Processing n rows therefore produces
+    O(burst + log10(n)) lines. Messages use lazy %-formatting, so
+    suppressed events are never formatted.
+    """
+
+    def __init__(self, log: logging.Logger, burst: int = 5) -> None:
+        self.log = log
+        self.burst = burst
+        self.count = 0
+        self.logged = 0
+
+    @property
+    def suppressed(self) -> int:
+        """Number of events that were not logged."""
+        return self.count - self.logged
+
+    def _should_log(self) -> bool:
+        if self.count <= self.burst:
+            return True
+        return self.count == 10 ** (len(str(self.count)) - 1)
+
+    def event(self, level: int, msg: str, *args: Any) -> None:
+        """
+        Count an event and log it if it is sampled.
+
+        :param level: logging level.
+        :param msg: message with %-style placeholders.
+        :param args: arguments of the message.
+        """
+        self.count += 1
+        if self._should_log() and self.log.isEnabledFor(level):
+            self.logged += 1
+            if self.count > self.burst:
+                msg = f"{msg} (occurrence #{self.count})"
+            self.log.log(level, msg, *args)
 
 
 def configure_logging() -> None:  # pragma: no cover
@@ -55,9 +96,12 @@ def configure_logging() -> None:  # pragma: no cover
     logging.getLogger("uvicorn").handlers = [intercept_handler]
     logging.getLogger("uvicorn.access").handlers = [intercept_handler]
 
-    # set logs output, level and format
+    # set logs output, level and format. Messages are put on a queue
+    # and written by a background thread, so logging never blocks
+    # the event loop on stdout.
     logger.remove()
     logger.add(
         sys.stdout,
         level=settings.log_level.value,
+        enqueue=True,
     )
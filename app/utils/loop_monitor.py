@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.settings import settings
+from app.services.metrics import LOOP_LAG, LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoopStall:
+    """The event loop was blocked for longer than the stall threshold."""
+
+    # Duration so far when the stack was captured, then the full duration
+    duration_ms: float
+    # Stack of the code blocking the loop, outermost frame first
+    stack: List[str]
+    timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished: bool = False
+
+
+def format_frame_stack(frame: Any) -> List[str]:
+    """
+    Format a stack as one ``file:line in function`` entry per frame.
+
+    Args:
+        frame (Any): Innermost frame of the stack.
+
+    Returns:
+        List[str]: The frames, outermost first.
+    """
+    return [
+        f"{entry.filename}:{entry.lineno} in {entry.name}"
+        for entry in traceback.extract_stack(frame)
+    ]
+
+
+class LoopMonitor:
+    """
+    Detects the calls that block the event loop of the worker.
+
+    A heartbeat task wakes up every ``interval`` seconds and exports how
+    late it woke up as the loop lag. A watchdog thread checks the heartbeat;
+    once it is late by more than ``threshold`` seconds, the loop is stuck in
+    a blocking call, so the watchdog records the stack of the loop thread.
+    Stalls are kept in a ring buffer, see the admin API.
+    """
+
+    def __init__(self, interval: float, threshold: float, size: int) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._stalls: Deque[LoopStall] = deque(maxlen=size)
+        self._beat = time.monotonic()
+        self._stall: Optional[LoopStall] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start monitoring the running loop."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch,
+            name="loop-watchdog",
+            daemon=True,
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stop monitoring."""
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        await asyncio.to_thread(self._watchdog.join)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._beat - self.interval)
+            LOOP_LAG.observe(lag)
+            stall, self._stall = self._stall, None
+            if stall is not None:
+                stall.duration_ms = lag * 1000
+                stall.finished = True
+                logger.warning(
+                    f"Event loop blocked for {stall.duration_ms:.0f} ms "
+                    f"in {stall.stack[-1] if stall.stack else 'unknown code'}",
+                )
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            late = time.monotonic() - beat - self.interval
+            if late < self.threshold or self._stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)  # noqa: SLF001
+            if frame is None or self._beat != beat:
+                continue
+            stall = LoopStall(duration_ms=late * 1000, stack=format_frame_stack(frame))
+            del frame
+            self._stall = stall
+            self._stalls.append(stall)
+            LOOP_STALLS.inc()
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """
+        Get the recorded stalls, newest first.
+
+        Returns:
+            List[Dict[str, Any]]: The stalls with their stacks.
+        """
+        return [asdict(stall) for stall in reversed(self._stalls)]
+
+
+loop_monitor = LoopMonitor(
+    settings.loop_monitor_interval,
+    settings.loop_stall_threshold_ms / 1000,
+    settings.loop_stall_log_size,
+)
@@ -0,0 +1,32 @@
+import enum
+from contextvars import ContextVar
+
+
+class Priority(enum.IntEnum):
+    """Priority of the work done for a request, lower values go first."""
+
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+# Priority of the request being served. Interactive unless an endpoint
+# declares itself as batch work, e.g. ingestion or evaluation.
+_request_priority: ContextVar[Priority] = ContextVar(
+    "request_priority",
+    default=Priority.INTERACTIVE,
+)
+
+
+def current_priority() -> Priority:
+    """Get the priority of the request being served."""
+    return _request_priority.get()
+
+
+async def batch_priority() -> None:
+    """
+    Mark the request as batch work.
+
+    It's a dependency for ingestion and evaluation endpoints. It must stay
+    async, so it runs in the request's context instead of a thread.
+    """
+    _request_priority.set(Priority.BATCH)
@@ -0,0 +1,42 @@
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Wall-clock time at which the worker process was forked.
+_worker_started: Optional[float] = None
+
+
+def mark_worker_started() -> None:
+    """Record that the worker process was just forked."""
+    global _worker_started  # noqa: PLW0603
+    _worker_started = time.time()
+
+
+def worker_uptime() -> Optional[float]:
+    """Get the seconds since the worker was forked, None outside gunicorn."""
+    if _worker_started is None:
+        return None
+    return time.time() - _worker_started
+
+
+def memory_usage() -> Dict[str, int]:
+    """
+    Get the memory usage of the current process.
+
+    RSS counts shared pages fully in every process sharing them, PSS
+    splits them between those processes, so PSS shows what sharing saves.
+    Both are read from procfs and are missing on other platforms.
+
+    Returns:
+        Dict[str, int]: Usage in bytes by kind, "rss" and "pss".
+    """
+    try:
+        rollup = Path("/proc/self/smaps_rollup").read_text()
+    except OSError:
+        return {}
+    usage = {}
+    for line in rollup.splitlines():
+        name, _, value = line.partition(":")
+        if name in ("Rss", "Pss"):
+            usage[name.lower()] = int(value.split()[0]) * 1024
+    return usage
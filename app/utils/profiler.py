@@ -0,0 +1,174 @@
+import asyncio
+import sys
+import threading
+from collections import Counter
+from typing import Any, NamedTuple, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class ProfilerBusyError(Exception):
+    """A profile is already being recorded."""
+
+
+def fold_stack(frame: Any) -> str:
+    """
+    Format a stack as a line of the folded format of flamegraph.pl.
+
+    Args:
+        frame (Any): Innermost frame of the stack.
+
+    Returns:
+        str: ``module:function`` of every frame, outermost first, joined
+            with semicolons.
+    """
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profile(NamedTuple):
+    """A recorded profile."""
+
+    # Folded stacks, one "stack count" line per distinct stack
+    folded: str
+    requests: int
+    samples: int
+
+
+class _Session:
+    """Profile of the next ``requests`` requests."""
+
+    def __init__(self, requests: int, interval: float) -> None:
+        self.requests = requests
+        self.interval = interval
+        self.claimed = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.samples: "Counter[str]" = Counter()
+        self.done = asyncio.Event()
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the event loop while profiled requests are served.
+
+    Profiling is off until `profile` is called, for a given number of
+    requests. Meanwhile a thread samples the stack of the loop thread every
+    interval, whenever one of those requests is in flight, so the profile
+    also shows the time the loop spent on other work or idle. Samples are
+    aggregated into folded stacks, the input of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self) -> None:
+        self._session: Optional[_Session] = None
+
+    def claim(self) -> Optional[_Session]:
+        """
+        Count a starting request in the profile, if one is being recorded.
+
+        Returns:
+            Optional[_Session]: The session, to pass to `finish`, or None if
+                the request is not profiled.
+        """
+        session = self._session
+        if session is None or session.claimed >= session.requests:
+            return None
+        session.claimed += 1
+        session.in_flight += 1
+        return session
+
+    def finish(self, session: _Session) -> None:
+        """Count a profiled request as done."""
+        session.in_flight -= 1
+        session.completed += 1
+        if session.completed >= session.requests:
+            session.done.set()
+
+    def _sample(
+        self,
+        session: _Session,
+        loop_thread: int,
+        stop: threading.Event,
+    ) -> None:
+        while not stop.wait(session.interval):
+            if session.in_flight == 0:
+                continue
+            frame = sys._current_frames().get(loop_thread)  # noqa: SLF001
+            if frame is not None:
+                session.samples[fold_stack(frame)] += 1
+            del frame
+
+    async def profile(self, requests: int, interval: float, timeout: float) -> Profile:
+        """
+        Profile the next requests of this worker.
+
+        Args:
+            requests (int): Number of requests to profile.
+            interval (float): Seconds between samples.
+            timeout (float): Longest time to wait for the requests, the
+                profile of the requests served so far is returned after it.
+
+        Returns:
+            Profile: The profile.
+
+        Raises:
+            ProfilerBusyError: If a profile is already being recorded.
+        """
+        if self._session is not None:
+            raise ProfilerBusyError("A profile is already being recorded.")
+        session = _Session(requests, interval)
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample,
+            args=(session, threading.get_ident(), stop),
+            name="profiler",
+            daemon=True,
+        )
+        self._session = session
+        sampler.start()
+        try:
+            await asyncio.wait_for(session.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._session = None
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+        return Profile(
+            folded="".join(
+                f"{stack} {count}\n" for stack, count in session.samples.most_common()
+            ),
+            requests=session.completed,
+            samples=sum(session.samples.values()),
+        )
+
+
+class ProfilerMiddleware:
+    """Marks the requests counted in the profile being recorded."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Serve the request, counting it in the profile being recorded.
+
+        :param scope: ASGI scope.
+        :param receive: ASGI receive callable.
+        :param send: ASGI send callable.
+        """
+        session = profiler.claim() if scope["type"] == "http" else None
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.finish(session)
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+)
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.elements import ClauseElement
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# pgvector distance operators: l2, inner product and cosine.
+VECTOR_OPERATORS = ("<->", "<#>", "<=>")
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN construct wrapping any SQLAlchemy statement."""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Executable, options: str) -> None:
+        self.statement = statement
+        self.options = options
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler: SQLCompiler, **kw: Any) -> str:
+    return f"EXPLAIN ({element.options}) " + compiler.process(element.statement, **kw)
+
+
+@dataclass
+class SlowQuery:
+    """A query that went over the latency threshold."""
+
+    operation: str
+    statement: str
+    duration_ms: float
+    timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    plan: Optional[List[Dict[str, Any]]] = None
+    uses_vector_index: Optional[bool] = None
+
+
+class SlowQueryLog:
+    """Ring buffer with the last slow queries of this worker."""
+
+    def __init__(self, size: int) -> None:
+        self._entries: Deque[SlowQuery] = deque(maxlen=size)
+
+    def record(self, entry: SlowQuery) -> None:
+        """Add a slow query, evicting the oldest one when the buffer is full."""
+        self._entries.append(entry)
+
+    def entries(self, missing_vector_index: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get the recorded slow queries, newest first.
+
+        Args:
+            missing_vector_index (bool): Only return queries whose captured
+                plan did not use a vector index.
+
+        Returns:
+            List[Dict[str, Any]]: The slow queries.
+        """
+        return [
+            asdict(entry)
+            for entry in reversed(self._entries)
+            if not missing_vector_index or entry.uses_vector_index is False
+        ]
+
+
+slow_query_log = SlowQueryLog(settings.slow_query_log_size)
+
+# Keeps references to running EXPLAIN tasks so they are not garbage collected.
+_explain_tasks: Set[asyncio.Task] = set()
+
+
+def plan_uses_vector_index(node: Dict[str, Any]) -> bool:
+    """
+    Check if a plan node, or any of its children, is a vector index scan.
+
+    A vector index scan is an index scan ordered by a pgvector
+    distance operator.
+
+    Args:
+        node (Dict[str, Any]): A node of an EXPLAIN (FORMAT JSON) plan.
+
+    Returns:
+        bool: True if a vector index is used.
+    """
+    order_by = node.get("Order By", "")
+    if "Index" in node.get("Node Type", "") and any(
+        operator in order_by for operator in VECTOR_OPERATORS
+    ):
+        return True
+    return any(plan_uses_vector_index(child) for child in node.get("Plans", []))
+
+
+def explain_options(analyze: bool) -> str:
+    """
+    Get the EXPLAIN options of a slow query.
+
+    Only SELECTs are analyzed: EXPLAIN ANALYZE runs the statement, a
+    write has already changed the rows it would report on.
+
+    Args:
+        analyze (bool): Whether the query is a SELECT.
+
+    Returns:
+        str: The options.
+    """
+    return "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+
+
+async def _explain(
+    statement: Executable,
+    session_factory: Any,
+) -> Any:
+    """Run EXPLAIN for a statement in a rolled back session."""
+    analyze = bool(getattr(statement, "is_select", False))
+    async with session_factory() as session:
+        result = await session.execute(
+            Explain(statement, explain_options(analyze)),
+        )
+        plan = result.scalar()
+        # EXPLAIN ANALYZE executes the statement, never keep its changes.
+        await session.rollback()
+    return plan
+
+
+async def _capture_plan(
+    entry: SlowQuery,
+    explain: Callable[[], Awaitable[Any]],
+    vector_query: bool,
+) -> None:
+    """Run EXPLAIN for a slow query and attach the plan to its entry."""
+    try:
+        plan = await explain()
+    except Exception as e:
+        logger.warning(f"Could not capture plan of slow {entry.operation}: {e}")
+        return
+
+    entry.plan = json.loads(plan) if isinstance(plan, str) else plan
+    if vector_query and entry.plan:
+        entry.uses_vector_index = plan_uses_vector_index(entry.plan[0]["Plan"])
+        if not entry.uses_vector_index:
+            logger.warning(f"Slow {entry.operation} did not use the vector index")
+
+
+def _record_slow_query(
+    operation: str,
+    statement: str,
+    duration_ms: float,
+    explain: Callable[[], Awaitable[Any]],
+    vector_query: bool,
+) -> None:
+    entry = SlowQuery(
+        operation=operation,
+        statement=statement,
+        duration_ms=round(duration_ms, 3),
+    )
+    slow_query_log.record(entry)
+    logger.warning(f"Slow {operation} query took {duration_ms:.1f} ms")
+
+    if random.random() < settings.slow_query_explain_sample_rate:  # noqa: S311
+        task = asyncio.create_task(_capture_plan(entry, explain, vector_query))
+        _explain_tasks.add(task)
+        task.add_done_callback(_explain_tasks.discard)
+
+
+@asynccontextmanager
+async def track_query(
+    operation: str,
+    statement: Executable,
+    session_factory: Any,
+    vector_query: bool = False,
+) -> AsyncIterator[None]:
+    """
+    Record the wrapped query in the slow query log if it is too slow.
+
+    For a sampled share of slow queries the plan is captured
+    in the background with EXPLAIN, see `explain_options`.
+
+    Args:
+        operation (str): Name of the operation, e.g. "search".
+        statement (Executable): The statement being executed.
+        session_factory (Any): Factory of sessions used to run EXPLAIN.
+        vector_query (bool): Whether the statement is a nearest-neighbour
+            search which is expected to use the vector index.
+    """
+    start = time.perf_counter()
+    yield
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms < settings.slow_query_threshold_ms:
+        return
+    _record_slow_query(
+        operation,
+        str(statement.compile(dialect=postgresql.dialect())),
+        duration_ms,
+        lambda: _explain(statement, session_factory),
+        vector_query,
+    )
+
+
+@asynccontextmanager
+async def track_raw_query(
+    operation: str,
+    sql: str,
+    args: Sequence[Any],
+    pool: Any,
+    vector_query: bool = False,
+) -> AsyncIterator[None]:
+    """
+    Record the wrapped asyncpg query in the slow query log if it is too slow.
+
+    Args:
+        operation (str): Name of the operation, e.g. "search".
+        sql (str): The query, with positional parameters.
+        args (Sequence[Any]): Values of the parameters.
+        pool (Any): asyncpg pool used to run EXPLAIN.
+        vector_query (bool): Whether the query is a nearest-neighbour
+            search which is expected to use the vector index.
+    """
+    start = time.perf_counter()
+    yield
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms < settings.slow_query_threshold_ms:
+        return
+
+    analyze = sql.lstrip().upper().startswith("SELECT")
+
+    async def explain() -> Any:
+        async with pool.acquire() as conn:
+            return await conn.fetchval(
+                f"EXPLAIN ({explain_options(analyze)}) {sql}",
+                *args,
+            )
+
+    _record_slow_query(operation, sql, duration_ms, explain, vector_query)
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.services.metrics import SINGLEFLIGHT_REQUESTS
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one.
+
+    The first caller of a key starts the call, callers arriving while it
+    is in flight wait for the same result instead of starting their own.
+    The call is shielded, so it keeps running for the other callers when
+    the first one is cancelled. Nothing is cached once the call finished.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: Dict[Hashable, "asyncio.Future[T]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a call, or join the identical call in flight.
+
+        Args:
+            key (Hashable): Identifies identical calls.
+            call (Callable[[], Awaitable[T]]): Makes the call.
+
+        Returns:
+            T: The result of the call, shared by all callers of the key.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            SINGLEFLIGHT_REQUESTS.labels(flight=self.name, role="follower").inc()
+            return await asyncio.shield(future)
+
+        SINGLEFLIGHT_REQUESTS.labels(flight=self.name, role="leader").inc()
+        future = asyncio.ensure_future(call())
+        self._calls[key] = future
+
+        def forget(done: "asyncio.Future[T]") -> None:
+            if self._calls.get(key) is done:
+                del self._calls[key]
+            # Mark the error as retrieved, even if every caller is gone.
+            if not done.cancelled():
+                done.exception()
+
+        future.add_done_callback(forget)
+        return await asyncio.shield(future)
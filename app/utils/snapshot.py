@@ -0,0 +1,348 @@
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from app.core.settings import settings
+from app.utils.vector_store import VectorStore, partition_name, validate_collection
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_VERSION = 1
+# Rows fetched from the database per round trip when exporting
+EXPORT_PREFETCH = 5000
+
+
+def _records_schema() -> "pa.Schema":
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("metadata", pa.string()),
+            ("contents", pa.string()),
+        ],
+    )
+
+
+class SnapshotWriter:
+    """
+    Writes the records of a collection to snapshot files.
+
+    Embeddings go to a contiguous float32 ``.npy`` matrix, which can be
+    memory-mapped on restore. Ids, contents and metadata, as JSON text, go
+    to a Parquet file in the same order.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        collection: str,
+        count: int,
+        dimension: int,
+        batch_size: int,
+    ) -> None:
+        from pyarrow import parquet
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self.embeddings_name = f"{collection}.embeddings.npy"
+        self.records_name = f"{collection}.records.parquet"
+        self.count = count
+        self.batch_size = batch_size
+        self.written = 0
+        self._embeddings = open_memmap(
+            directory / self.embeddings_name,
+            mode="w+",
+            dtype=np.float32,
+            shape=(count, dimension),
+        )
+        self._records = parquet.ParquetWriter(
+            directory / self.records_name,
+            _records_schema(),
+        )
+        self._batch: List[tuple] = []
+
+    def write(
+        self,
+        record_id: uuid.UUID,
+        metadata: Optional[str],
+        contents: str,
+        embedding: np.ndarray,
+    ) -> None:
+        """
+        Add a record to the snapshot.
+
+        Args:
+            record_id (uuid.UUID): Id of the record.
+            metadata (Optional[str]): Metadata as JSON text.
+            contents (str): Contents of the record.
+            embedding (np.ndarray): Embedding of the record.
+        """
+        self._embeddings[self.written] = embedding
+        self._batch.append((str(record_id), metadata, contents))
+        self.written += 1
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        import pyarrow as pa
+
+        if not self._batch:
+            return
+        ids, metadata, contents = zip(*self._batch)
+        self._records.write_batch(
+            pa.record_batch(
+                [pa.array(ids), pa.array(metadata), pa.array(contents)],
+                schema=_records_schema(),
+            ),
+        )
+        self._batch = []
+
+    def close(self) -> Dict[str, object]:
+        """
+        Finish the files of the collection.
+
+        Returns:
+            Dict[str, object]: Entry of the collection in the manifest.
+
+        Raises:
+            ValueError: If fewer records were written than announced.
+        """
+        self._flush()
+        self._records.close()
+        self._embeddings.flush()
+        del self._embeddings
+        if self.written != self.count:
+            raise ValueError(
+                f"Expected {self.count} records, {self.written} were written.",
+            )
+        return {
+            "records": self.count,
+            "embeddings": self.embeddings_name,
+            "rows": self.records_name,
+        }
+
+
+def write_manifest(
+    directory: Path,
+    model_id: str,
+    dimension: int,
+    collections: Dict[str, Dict[str, object]],
+) -> None:
+    """
+    Write the manifest of a snapshot, once all its files are complete.
+
+    Args:
+        directory (Path): Directory of the snapshot.
+        model_id (str): Embedding model of the snapshot.
+        dimension (int): Dimension of the embeddings.
+        collections (Dict[str, Dict[str, object]]): Entries of the collections.
+    """
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "model": model_id,
+        "dimension": dimension,
+        "collections": collections,
+    }
+    tmp_manifest = directory / f"{MANIFEST_NAME}.tmp"
+    tmp_manifest.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    tmp_manifest.replace(directory / MANIFEST_NAME)
+
+
+def read_manifest(directory: Path, model_id: str, dimension: int) -> dict:
+    """
+    Read the manifest of a snapshot and check that it can be restored.
+
+    Args:
+        directory (Path): Directory of the snapshot.
+        model_id (str): Embedding model in use.
+        dimension (int): Dimension of the embeddings column.
+
+    Returns:
+        dict: The manifest.
+
+    Raises:
+        ValueError: If the snapshot was made with another model or dimension.
+    """
+    manifest = json.loads((directory / MANIFEST_NAME).read_text(encoding="utf-8"))
+    if manifest["version"] != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest['version']}.")
+    if manifest["model"] != model_id or manifest["dimension"] != dimension:
+        raise ValueError(
+            f"The snapshot was made with {manifest['model']} "
+            f"({manifest['dimension']} dimensions), the vector store uses "
+            f"{model_id} ({dimension} dimensions).",
+        )
+    return manifest
+
+
+def iter_snapshot_records(
+    directory: Path,
+    collection: str,
+    entry: Dict[str, object],
+    batch_size: int,
+) -> Iterator[tuple]:
+    """
+    Read the records of a collection from a snapshot.
+
+    Args:
+        directory (Path): Directory of the snapshot.
+        collection (str): Name of the collection.
+        entry (Dict[str, object]): Entry of the collection in the manifest.
+        batch_size (int): Rows read from the Parquet file at once.
+
+    Yields:
+        tuple: Values of ``COPY_COLUMNS``.
+    """
+    from pyarrow import parquet
+
+    embeddings = np.load(directory / str(entry["embeddings"]), mmap_mode="r")
+    rows = parquet.ParquetFile(directory / str(entry["rows"]))
+    offset = 0
+    for batch in rows.iter_batches(batch_size=batch_size):
+        columns = batch.to_pydict()
+        for index, (record_id, metadata, contents) in enumerate(
+            zip(columns["id"], columns["metadata"], columns["contents"]),
+        ):
+            yield (
+                uuid.UUID(record_id),
+                collection,
+                metadata,
+                contents,
+                embeddings[offset + index],
+            )
+        offset += batch.num_rows
+    if offset != len(embeddings):
+        raise ValueError(
+            f"The snapshot of '{collection}' has {offset} rows "
+            f"and {len(embeddings)} embeddings.",
+        )
+
+
+async def export_snapshot(
+    directory: Path,
+    collections: Optional[Sequence[str]] = None,
+) -> Dict[str, int]:
+    """
+    Export collections of the vector store to a snapshot.
+
+    Each collection is read in a single repeatable-read transaction, so its
+    files are consistent even while it is being replaced.
+
+    Args:
+        directory (Path): Directory of the snapshot.
+        collections (Optional[Sequence[str]]): Collections to export,
+            defaults to all of them.
+
+    Returns:
+        Dict[str, int]: Number of exported records by collection.
+
+    Raises:
+        ValueError: If a collection is spread over several shards.
+    """
+    vector_store = VectorStore()
+    if collections is None:
+        collections = await vector_store.list_collections()
+    # Store of the database of each collection
+    sources = {}
+    for collection in collections:
+        stores = vector_store.shard_stores(collection) or [vector_store]
+        if len(stores) > 1:
+            raise ValueError(
+                f"Collection '{collection}' is spread over shards, "
+                "only collections stored on one database can be exported.",
+            )
+        sources[collection] = stores[0]
+    # Files are rewritten in place, the manifest only exists once they are done.
+    (directory / MANIFEST_NAME).unlink(missing_ok=True)
+    entries: Dict[str, Dict[str, object]] = {}
+    for collection in collections:
+        partition = partition_name(collection)
+        async with sources[collection].raw_connection() as conn, conn.transaction(
+            isolation="repeatable_read",
+            readonly=True,
+        ):
+            count = await conn.fetchval(f"SELECT count(*) FROM {partition}")  # noqa: S608
+            writer = SnapshotWriter(
+                directory,
+                collection,
+                count,
+                settings.embedding_dim,
+                settings.ingest_batch_size,
+            )
+            rows = conn.cursor(
+                "SELECT id, record_metadata::text, contents, embedding "  # noqa: S608
+                f"FROM {partition}",
+                prefetch=EXPORT_PREFETCH,
+            )
+            async for row in rows:
+                writer.write(*row)
+            entries[collection] = writer.close()
+        logger.info(f"Exported {count} records of '{collection}'.")
+    write_manifest(
+        directory,
+        vector_store.embedder.model_id,
+        settings.embedding_dim,
+        entries,
+    )
+    return {name: int(entry["records"]) for name, entry in entries.items()}
+
+
+async def restore_snapshot(
+    directory: Path,
+    collections: Optional[Sequence[str]] = None,
+) -> Dict[str, int]:
+    """
+    Restore collections of the vector store from a snapshot.
+
+    Records are bulk-loaded with COPY into the staging table of
+    `VectorStore.replace_collection`, which builds the indexes once loaded
+    and swaps the collection in. Nothing is embedded.
+
+    Args:
+        directory (Path): Directory of the snapshot.
+        collections (Optional[Sequence[str]]): Collections to restore,
+            defaults to all collections of the snapshot.
+
+    Returns:
+        Dict[str, int]: Number of restored records by collection.
+
+    Raises:
+        ValueError: If the snapshot does not match the vector store or
+            misses a collection.
+    """
+    vector_store = VectorStore()
+    manifest = read_manifest(
+        directory,
+        vector_store.embedder.model_id,
+        settings.embedding_dim,
+    )
+    if collections is None:
+        collections = list(manifest["collections"])
+    restored = {}
+    for collection in collections:
+        entry = manifest["collections"].get(validate_collection(collection))
+        if entry is None:
+            raise ValueError(f"The snapshot has no collection '{collection}'.")
+        async with vector_store.replace_collection(collection) as staging:
+            restored[collection] = await vector_store.copy_records(
+                staging,
+                iter_snapshot_records(
+                    directory,
+                    collection,
+                    entry,
+                    settings.ingest_batch_size,
+                ),
+            )
+        logger.info(f"Restored {restored[collection]} records of '{collection}'.")
+    return restored
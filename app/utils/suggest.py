@@ -0,0 +1,372 @@
+import asyncio
+import bisect
+import logging
+import math
+import time
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import asyncpg
+
+from app.core.settings import settings
+from app.db.search_pool import search_pool
+from app.db.shards import shard_router
+from app.utils.catalog_version import CatalogChange, catalog_versions
+from app.utils.doc_util import METADATA_COLUMNS
+from app.utils.text_utils import fold_accents
+from app.utils.vector_store import partition_name
+
+logger = logging.getLogger(__name__)
+
+# Prefix matches ranked per query and key list, the first ones in key order
+PREFIX_SCAN_LIMIT = 200
+# Share of the trigrams of a misspelled word its correction must contain
+FUZZY_THRESHOLD = 0.6
+# Shortest word corrected, shorter ones only match prefixes
+FUZZY_MIN_LENGTH = 3
+
+
+class Suggestion(NamedTuple):
+    """A suggested product or category, with its level in the category tree."""
+
+    text: str
+    level: int
+
+
+def trigrams(folded: str, partial_last_word: bool = False) -> FrozenSet[str]:
+    """
+    Get the trigrams of a folded text, the way pg_trgm does.
+
+    Each word is padded with two spaces in front and one behind, so that
+    word starts weigh more.
+
+    Args:
+        folded (str): Text folded with `fold_accents`.
+        partial_last_word (bool): Whether the last word is still being
+            typed, so its end is not padded.
+
+    Returns:
+        FrozenSet[str]: The trigrams.
+    """
+    words = folded.split()
+    grams = set()
+    for index, word in enumerate(words):
+        last = index == len(words) - 1
+        padded = f"  {word}" if partial_last_word and last else f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class SuggestIndex:
+    """
+    In-memory typeahead index over the products and categories of a collection.
+
+    Matching is case and accent insensitive. Prefix matches use sorted lists
+    of the texts and of their suffixes starting at a word, so typing the
+    start of any word of a product finds it with a binary search. Typos are
+    corrected word by word against the vocabulary of the collection, by
+    trigram similarity, before matching prefixes again.
+    """
+
+    def __init__(self, suggestions: Iterable[Suggestion]) -> None:
+        self.suggestions = list(dict.fromkeys(suggestions))
+        words: Set[str] = set()
+        texts: Dict[int, List[Tuple[str, int]]] = {}
+        suffixes: List[Tuple[str, int]] = []
+        for index, suggestion in enumerate(self.suggestions):
+            folded = fold_accents(suggestion.text)
+            words.update(folded.split())
+            texts.setdefault(suggestion.level, []).append((folded, index))
+            start = len(folded.split(" ", 1)[0]) + 1
+            for word in folded.split(" ")[1:]:
+                suffixes.append((folded[start:], index))
+                start += len(word) + 1
+        # Texts are searched level by level, broader categories first.
+        self._keys = [_SortedKeys(texts[level]) for level in sorted(texts)]
+        self._keys.append(_SortedKeys(suffixes))
+
+        self._vocabulary = sorted(words)
+        self._word_grams = [trigrams(word) for word in self._vocabulary]
+        self._postings: Dict[str, List[int]] = {}
+        for index, grams in enumerate(self._word_grams):
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(index)
+
+    def __len__(self) -> int:
+        return len(self.suggestions)
+
+    def _rank(self, index: int) -> Tuple[int, int]:
+        suggestion = self.suggestions[index]
+        return (suggestion.level, len(suggestion.text))
+
+    def prefix_matches(self, folded: str, limit: int) -> List[int]:
+        """
+        Find the texts starting with the query, then with a word starting with it.
+
+        Texts starting with the query are found level by level.
+
+        Args:
+            folded (str): Query folded with `fold_accents`.
+            limit (int): Maximum number of matches.
+
+        Returns:
+            List[int]: Indexes of the matches, shorter texts first within
+                each level.
+        """
+        matches: List[int] = []
+        for keys in self._keys:
+            found = [
+                index
+                for index in dict.fromkeys(keys.prefixed(folded))
+                if index not in matches
+            ]
+            matches.extend(sorted(found, key=self._rank))
+            if len(matches) >= limit:
+                break
+        return matches[:limit]
+
+    def correct_word(self, word: str, partial: bool) -> Optional[str]:
+        """
+        Find the word of the vocabulary closest to a possibly misspelled one.
+
+        Args:
+            word (str): Folded word of the query.
+            partial (bool): Whether the word is still being typed, so it
+                only needs to be the prefix of a word of the vocabulary.
+
+        Returns:
+            Optional[str]: The word itself if it is known, its correction,
+                or None if no word shares `FUZZY_THRESHOLD` of its trigrams.
+        """
+        position = bisect.bisect_left(self._vocabulary, word)
+        if position < len(self._vocabulary):
+            known = self._vocabulary[position]
+            if known == word or (partial and known.startswith(word)):
+                return word
+        grams = trigrams(word, partial_last_word=partial)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for index in self._postings.get(gram, ()):
+                shared[index] = shared.get(index, 0) + 1
+        required = math.ceil(FUZZY_THRESHOLD * len(grams))
+        candidates = [
+            (-count, abs(len(self._vocabulary[index]) - len(word)), index)
+            for index, count in shared.items()
+            if count >= required
+        ]
+        if not candidates:
+            return None
+        return self._vocabulary[min(candidates)[2]]
+
+    def correct(self, folded: str) -> Optional[str]:
+        """
+        Correct the misspelled words of a query, see `correct_word`.
+
+        Args:
+            folded (str): Query folded with `fold_accents`.
+
+        Returns:
+            Optional[str]: The corrected query, None if a word is unknown
+                and has no close word.
+        """
+        words = folded.split(" ")
+        corrected = []
+        for position, word in enumerate(words):
+            if len(word) < FUZZY_MIN_LENGTH:
+                corrected.append(word)
+                continue
+            correction = self.correct_word(word, partial=position == len(words) - 1)
+            if correction is None:
+                return None
+            corrected.append(correction)
+        return " ".join(corrected)
+
+    def search(self, query: str, limit: int) -> List[Suggestion]:
+        """
+        Suggest products and categories for a partial query.
+
+        Args:
+            query (str): The text typed so far.
+            limit (int): Maximum number of suggestions.
+
+        Returns:
+            List[Suggestion]: Matches of the query, then of its correction.
+        """
+        folded = fold_accents(query)
+        if not folded:
+            return []
+        matches = self.prefix_matches(folded, limit)
+        if len(matches) < limit and len(folded) >= FUZZY_MIN_LENGTH:
+            corrected = self.correct(folded)
+            if corrected is not None and corrected != folded:
+                for index in self.prefix_matches(corrected, limit):
+                    if len(matches) == limit:
+                        break
+                    if index not in matches:
+                        matches.append(index)
+        return [self.suggestions[index] for index in matches]
+
+
+class _SortedKeys:
+    """Sorted keys pointing to suggestions, searched by prefix."""
+
+    def __init__(self, keys: List[Tuple[str, int]]) -> None:
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.ids = [index for _, index in keys]
+
+    def prefixed(self, prefix: str) -> List[int]:
+        """Get the suggestions of the first `PREFIX_SCAN_LIMIT` keys with a prefix."""
+        position = bisect.bisect_left(self.keys, prefix)
+        end = min(len(self.keys), position + PREFIX_SCAN_LIMIT)
+        matches = []
+        while position < end and self.keys[position].startswith(prefix):
+            matches.append(self.ids[position])
+            position += 1
+        return matches
+
+
+async def load_suggestions(collection: str) -> List[Suggestion]:
+    """
+    Load the distinct products and categories of a collection.
+
+    Args:
+        collection (str): Name of the collection.
+
+    Returns:
+        List[Suggestion]: The products and categories.
+
+    Raises:
+        asyncpg.UndefinedTableError: If the collection does not exist.
+    """
+    partition = partition_name(collection)
+    pools = [search_pool]
+    if shard_router.enabled:
+        pools = [shard.pool for shard in shard_router.for_collection(collection)]
+    suggestions = []
+    for source in pools:
+        pool = await source.get()
+        async with pool.acquire() as conn:
+            for level, key in enumerate(METADATA_COLUMNS, start=1):
+                rows = await conn.fetch(
+                    f"SELECT DISTINCT record_metadata ->> $1::text FROM {partition} "  # noqa: S608
+                    "WHERE record_metadata ->> $1::text <> ''",
+                    key,
+                )
+                suggestions.extend(Suggestion(row[0], level) for row in rows)
+            rows = await conn.fetch(f"SELECT DISTINCT contents FROM {partition}")  # noqa: S608
+            # Contents are the last level of the category tree.
+            level = len(METADATA_COLUMNS) + 1
+            suggestions.extend(Suggestion(row[0], level) for row in rows)
+    # Shards of a collection share its categories.
+    return list(dict.fromkeys(suggestions))
+
+
+class _Entry(NamedTuple):
+    index: SuggestIndex
+    version: int
+    built_at: float
+
+
+class Suggester:
+    """
+    Typeahead indexes of the collections, built on first use.
+
+    An index is rebuilt as soon as its collection changes, in any worker,
+    and once it is older than ``max_age`` seconds. The previous index keeps
+    serving while the new one is built, so requests never wait on a rebuild
+    once the collection was indexed.
+    """
+
+    def __init__(self, max_age: float) -> None:
+        self.max_age = max_age
+        self._entries: Dict[str, _Entry] = {}
+        self._builds: Dict[str, "asyncio.Task[Optional[SuggestIndex]]"] = {}
+
+    async def _build(self, collection: str, version: int) -> Optional[SuggestIndex]:
+        try:
+            suggestions = await load_suggestions(collection)
+        except asyncpg.UndefinedTableError:
+            self._entries.pop(collection, None)
+            return None
+        start = time.perf_counter()
+        # Building takes a while on large catalogs, keep the loop serving.
+        index = await asyncio.to_thread(SuggestIndex, suggestions)
+        self._entries[collection] = _Entry(index, version, time.monotonic())
+        logger.info(
+            f"Built the suggest index of '{collection}' with {len(index)} "
+            f"entries in {time.perf_counter() - start:.2f}s.",
+        )
+        return index
+
+    async def get(self, collection: str) -> Optional[SuggestIndex]:
+        """
+        Get the index of a collection, building it if needed.
+
+        Args:
+            collection (str): Name of the collection.
+
+        Returns:
+            Optional[SuggestIndex]: The index, None if the collection does
+                not exist.
+        """
+        version = catalog_versions.get(collection)
+        entry = self._entries.get(collection)
+        if (
+            entry is not None
+            and entry.version == version
+            and time.monotonic() - entry.built_at < self.max_age
+        ):
+            return entry.index
+
+        build = self._builds.get(collection)
+        if build is None:
+            build = asyncio.create_task(self._build(collection, version))
+            self._builds[collection] = build
+
+            def forget(done: "asyncio.Task[Optional[SuggestIndex]]") -> None:
+                self._builds.pop(collection, None)
+                if not done.cancelled() and done.exception() is not None:
+                    logger.error(
+                        f"Failed to build the suggest index of '{collection}': "
+                        f"{done.exception()}",
+                    )
+
+            build.add_done_callback(forget)
+        if entry is not None:
+            return entry.index
+        return await asyncio.shield(build)
+
+    async def catalog_changed(self, change: CatalogChange) -> None:
+        """
+        Start rebuilding the index of a changed collection, if it has one.
+
+        Args:
+            change (CatalogChange): The change.
+        """
+        if change.collection in self._entries:
+            await self.get(change.collection)
+
+    async def suggest(
+        self,
+        query: str,
+        collection: str,
+        limit: int,
+    ) -> List[Suggestion]:
+        """
+        Suggest products and categories of a collection for a partial query.
+
+        Args:
+            query (str): The text typed so far.
+            collection (str): Name of the collection.
+            limit (int): Maximum number of suggestions.
+
+        Returns:
+            List[Suggestion]: The suggestions, empty for unknown collections.
+        """
+        index = await self.get(collection)
+        if index is None:
+            return []
+        return index.search(query, limit)
+
+
+suggester = Suggester(settings.suggest_max_age)
@@ -0,0 +1,39 @@
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a user query, so that equivalent queries compare equal.
+
+    Vietnamese diacritics can be typed precomposed or combining, so the
+    text is NFC normalized, then case folded and its whitespace collapsed.
+
+    Args:
+        text (str): The query.
+
+    Returns:
+        str: The normalized query.
+    """
+    text = unicodedata.normalize("NFC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def fold_accents(text: str) -> str:
+    """
+    Normalize a text and strip its diacritics, for accent-insensitive matching.
+
+    Users often type Vietnamese without diacritics, e.g. "ma phanh" for
+    "má phanh". "đ" is not a combining form, so it is replaced explicitly.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str: The normalized text without diacritics.
+    """
+    decomposed = unicodedata.normalize("NFD", normalize_query(text))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return stripped.replace("đ", "d")
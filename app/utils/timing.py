@@ -0,0 +1,106 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import REQUEST_DURATION, STAGE_DURATION
+
+# Stage durations (in seconds) of the request being served. The dict is
+# created by the middleware, so tasks spawned by a handler share it.
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_stages",
+    default=None,
+)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Measure the time spent in a stage of request processing.
+
+    The duration is exported to the stage histogram and, when called
+    inside an HTTP request, added to the request's Server-Timing header.
+    Repeated stages within one request are summed.
+
+    Args:
+        stage (str): Name of the stage, e.g. "embedding" or "llm".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.labels(stage=stage).observe(elapsed)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+
+
+def format_server_timing(stages: Dict[str, float], total: float) -> str:
+    """
+    Format stage durations as a Server-Timing header value.
+
+    Args:
+        stages (Dict[str, float]): Stage durations in seconds.
+        total (float): Total request duration in seconds.
+
+    Returns:
+        str: Header value, e.g. ``embedding;dur=120.5, total;dur=130.1``.
+    """
+    metrics = [f"{name};dur={value * 1000:.1f}" for name, value in stages.items()]
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """
+    Collects per-stage timings of a request.
+
+    The timings are reported in the ``Server-Timing`` response header
+    and the total request duration is exported to Prometheus.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Serve the request, tracking its stage timings.
+
+        :param scope: ASGI scope.
+        :param receive: ASGI receive callable.
+        :param send: ASGI send callable.
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: Dict[str, float] = {}
+        token = _request_stages.set(stages)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    format_server_timing(stages, time.perf_counter() - start),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stages.reset(token)
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code),
+            ).observe(time.perf_counter() - start)
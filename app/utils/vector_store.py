@@ -1,38 +1,692 @@
+import asyncio
+import heapq
+import itertools
+import json
 import logging
-from typing import List, Optional
+import re
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
-import openai
-import pandas as pd
-from sqlalchemy import inspect, select
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+from pgvector.sqlalchemy import avg
+from sqlalchemy import (
+    MetaData,
+    Table,
+    and_,
+    delete,
+    func,
+    insert,
+    inspect,
+    literal_column,
+    or_,
+    select,
+    text,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection
 
 from app.core.settings import settings
 from app.db.base import Base
-from app.db.models.record import Record
+from app.db.catalog_bus import HOST, catalog_bus, publish_change
+from app.db.migrate import create_schema
+from app.db.models.category_centroid import CategoryCentroid
+from app.db.models.record import Record, category_expression
+from app.db.replicas import PRIMARY_LSN_QUERY, Replica, replica_router
+from app.db.search_pool import search_pool
 from app.db.session import SessionLocal, engine
+from app.db.shards import Shard, shard_router
+from app.services.embedders import get_embedder
+from app.services.metrics import SHARD_SEARCHES_SKIPPED
+from app.services.resilience import remaining_time
+from app.services.shared_state import centroid_index
+from app.utils.catalog_version import CatalogChange
+from app.utils.embedding_cache import embedding_cache
+from app.utils.log_utils import SampledLogger
+from app.utils.query_log import track_query, track_raw_query
+from app.utils.timing import stage_timer
+
+if TYPE_CHECKING:
+    import pandas as pd
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_COLLECTION = "default"
+# Collection names are used in partition names, keep them short identifiers.
+COLLECTION_PATTERN = re.compile(r"^[a-z0-9_]{1,40}$")
+STAGING_PREFIX = "records_staging_"
+# "flat" searches the whole collection, "hierarchical" first routes the
+# query to the closest categories by their centroids.
+SEARCH_MODES = ("flat", "hierarchical")
+
+PARTITIONS_QUERY = text(
+    "SELECT c.relname FROM pg_inherits AS i "
+    "JOIN pg_class AS c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = 'records'::regclass ORDER BY c.relname",
+)
+PARENT_INDEXES_QUERY = text(
+    "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+    "WHERE indrelid = 'records'::regclass AND NOT indisprimary",
+)
+INDEX_TARGET_PATTERN = re.compile(r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+ ")
+# Search hits farther than this L2 distance have no positive score
+MAX_DISTANCE = 1.0
+# Columns of the rows given to `VectorStore.copy_records`
+COPY_COLUMNS = ("id", "collection", "record_metadata", "contents", "embedding")
+
+
+def validate_collection(collection: str) -> str:
+    """
+    Check that a collection name can be used as a partition name.
+
+    Args:
+        collection (str): Name of the collection.
+
+    Returns:
+        str: The collection name.
+
+    Raises:
+        ValueError: If the name is not 1-40 lowercase letters, digits or "_".
+    """
+    if not COLLECTION_PATTERN.match(collection):
+        raise ValueError(
+            f"Invalid collection name '{collection}'. Use 1-40 lowercase "
+            "letters, digits or underscores.",
+        )
+    return collection
+
+
+def validate_search(mode: str, collection: str) -> None:
+    """
+    Check the search mode and the collection of a search.
+
+    Args:
+        mode (str): Search mode, see `VectorStore.search`.
+        collection (str): Name of the collection.
+
+    Raises:
+        ValueError: If the mode is unknown or the collection name is invalid.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(
+            f"Unknown search mode '{mode}'. "
+            f"Supported modes: {', '.join(SEARCH_MODES)}.",
+        )
+    validate_collection(collection)
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Split items into lists of at most ``size`` items."""
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def partition_name(collection: str) -> str:
+    """Get the name of the partition storing a collection."""
+    return f"records_{validate_collection(collection)}"
+
+
+def split_categories(
+    categories: List[Tuple[str, str]],
+) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    Split routed categories by whether both levels are set.
+
+    Records without a level-1 or level-2 category are routed to with an
+    empty category, see `VectorStore._compute_centroids`.
+
+    Args:
+        categories (List[Tuple[str, str]]): Level-1 and level-2 categories.
+
+    Returns:
+        Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]: Categories with
+            both levels, matched by the category index, and the others.
+    """
+    complete = [pair for pair in categories if all(pair)]
+    partial = [pair for pair in categories if not all(pair)]
+    return complete, partial
+
+
+def group_by_shard(
+    items: Iterable[Any],
+    record_id: Any,
+    collection: str,
+) -> Dict[Shard, List[Any]]:
+    """
+    Group records, or updates of records, by the shard storing them.
+
+    Args:
+        items (Iterable[Any]): The records.
+        record_id (Any): Function getting the id of a record.
+        collection (str): Collection of the records.
+
+    Returns:
+        Dict[Shard, List[Any]]: The records of each shard.
+    """
+    groups: Dict[Shard, List[Any]] = defaultdict(list)
+    for item in items:
+        groups[shard_router.for_record(record_id(item), collection)].append(item)
+    return groups
+
 
 class VectorStore:  # noqa: D101
-    def __init__(self) -> None:
-        self.engine = engine
-        self.Session = SessionLocal
-        self.openai_api_key = settings.open_api_key
-        self.embedding_model = settings.embedding_model
-        openai.api_key = self.openai_api_key
+    def __init__(self, shard: Optional[Shard] = None) -> None:
+        # Without a shard, the store of the primary, which fans out to the
+        # shards when records are sharded
+        self.shard = shard
+        self.url = settings.db_url if shard is None else shard.url
+        self.engine = engine if shard is None else shard.engine
+        self.Session = SessionLocal if shard is None else shard.Session
+        self.pool = search_pool if shard is None else shard.pool
+        self.embedder = get_embedder()
+
+    def shard_stores(self, collection: Optional[str] = None) -> List["VectorStore"]:
+        """
+        Get the stores of the shards holding a collection, or of all shards.
+
+        Args:
+            collection (Optional[str]): Name of the collection.
 
+        Returns:
+            List[VectorStore]: The stores, none if the records are not
+                sharded or this store is a shard's.
+        """
+        if self.shard is not None or not shard_router.enabled:
+            return []
+        shards = (
+            shard_router.shards
+            if collection is None
+            else shard_router.for_collection(collection)
+        )
+        return [VectorStore(shard) for shard in shards]
 
-    async def get_embedding(self, text: str) -> List[float]:
-        """Generate embedding for the given text using OpenAI API."""
+    async def get_embedding(self, text: str, use_cache: bool = True) -> List[float]:
+        """
+        Generate embedding for the given text with the configured backend.
+
+        Query embeddings are cached, ingestion should pass ``use_cache=False``
+        so that catalog rows do not evict frequent queries.
+        """
         text = text.replace("\n", " ")
-        response = openai.Embedding.create(input=[text], model=self.embedding_model)
-        return response["data"][0]["embedding"]
+        if not use_cache:
+            return await self._create_embedding(text)
+        cached = embedding_cache.get(text)
+        if cached is not None:
+            return cached
+        embedding = await self._create_embedding(text)
+        embedding_cache.put(text, embedding)
+        return embedding
+
+    async def _create_embedding(self, text: str) -> List[float]:
+        """Embed a search query."""
+        with stage_timer("embedding"):
+            return await self.embedder.embed_query(text)
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for a batch of texts with the configured backend.
+
+        Texts are embedded in chunks of ``settings.embedding_batch_size``.
+        Batch embeddings are not cached.
+        """
+        texts = [text.replace("\n", " ") for text in texts]
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), settings.embedding_batch_size):
+            chunk = texts[start : start + settings.embedding_batch_size]
+            with stage_timer("embedding"):
+                embeddings.extend(await self.embedder.embed(chunk))
+        return embeddings
 
     async def create_tables(self) -> None:
         """Create necessary tables and indexes in the database."""
         async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+            await create_schema(conn)
+        for store in self.shard_stores():
+            await store.create_tables()
+
+    async def list_collections(self) -> List[str]:
+        """
+        List the collections stored in the database.
+
+        Returns:
+            List[str]: Names of the collections.
+        """
+        if shards := self.shard_stores():
+            names = await asyncio.gather(
+                *(store.list_collections() for store in shards),
+            )
+            return sorted(set().union(*names))
+        async with self.engine.connect() as conn:
+            partitions = (await conn.execute(PARTITIONS_QUERY)).scalars()
+            return [name.removeprefix("records_") for name in partitions]
+
+    @asynccontextmanager
+    async def replace_collection(
+        self,
+        collection: str,
+        staging: Optional[str] = None,
+    ) -> AsyncIterator[Table]:
+        """
+        Load a new version of a collection and swap it in atomically.
+
+        Records are inserted into a standalone staging table, which is
+        indexed once loaded and then attached as the collection's partition
+        in the same transaction that detaches and drops the previous one.
+        Readers see either the old or the new collection, never a partly
+        loaded one, and other collections are not touched.
+
+        When records are sharded, every shard of the collection gets a
+        staging table of the same name and `insert` routes the records to
+        them. The staging tables of all shards are indexed before the first
+        swap, then the shards swap back to back, each in its own
+        transaction. The swap is not atomic across shards: if a shard fails
+        to swap, the shards swapped before it keep the new version, they
+        are logged with the error.
+
+        Args:
+            collection (str): Name of the collection.
+            staging (Optional[str]): Name of the staging table, generated by
+                default.
+
+        Yields:
+            Table: The staging table to insert the records into.
+        """
+        staging = staging or f"{STAGING_PREFIX}{uuid.uuid4().hex[:12]}"
+        stores = self.shard_stores(collection) or [self]
+        for store in stores:
+            await store._create_staging(collection, staging)  # noqa: SLF001
+        swapped: List[VectorStore] = []
+        try:
+            yield Record.__table__.to_metadata(MetaData(), name=staging)
+            centroids = [
+                await store._prepare_staging(collection, staging)  # noqa: SLF001
+                for store in stores
+            ]
+            for store, store_centroids in zip(stores, centroids):
+                await store._swap_partition(  # noqa: SLF001
+                    collection,
+                    staging,
+                    store_centroids,
+                )
+                swapped.append(store)
+        except BaseException:
+            if swapped:
+                logger.error(
+                    f"Collection '{collection}' is partly replaced, only the "
+                    f"shards {[store.shard.name for store in swapped]} swapped.",
+                )
+            for store in stores:
+                async with store.engine.begin() as conn:
+                    await conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+            raise
+        for store in stores:
+            async with store.engine.begin() as conn:
+                await conn.execute(text(f"ANALYZE {partition_name(collection)}"))
+        await self._catalog_changed(collection)
+        await self._export_centroids(collection)
+        logger.info(f"Collection '{collection}' replaced.")
+
+    async def _create_staging(self, collection: str, staging: str) -> None:
+        """Create an empty staging table for the records of a collection."""
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(
+                    f"CREATE TABLE {staging} "
+                    "(LIKE records INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+                ),
+            )
+            # Lets ATTACH PARTITION skip the scan validating the partition bound.
+            await conn.execute(
+                text(
+                    f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_collection "
+                    f"CHECK (collection = '{collection}')",
+                ),
+            )
+
+    async def _prepare_staging(self, collection: str, staging: str) -> List[dict]:
+        """Index a loaded staging table and compute its centroids."""
+        await self._build_staging_indexes(staging)
+        # Computed before the swap, which locks the records table.
+        table = Record.__table__.to_metadata(MetaData(), name=staging)
+        async with self.engine.connect() as conn:
+            return await self._compute_centroids(conn, collection, table)
+
+    async def _swap_partition(
+        self,
+        collection: str,
+        staging: str,
+        centroids: List[dict],
+    ) -> None:
+        """Replace the partition of a collection with a prepared staging table."""
+        partition = partition_name(collection)
+        async with self.engine.begin() as conn:
+            exists = await conn.scalar(
+                text(f"SELECT to_regclass('{partition}') IS NOT NULL"),
+            )
+            if exists:
+                await conn.execute(
+                    text(f"ALTER TABLE records DETACH PARTITION {partition}"),
+                )
+                await conn.execute(text(f"DROP TABLE {partition}"))
+            await conn.execute(text(f"ALTER TABLE {staging} RENAME TO {partition}"))
+            await conn.execute(
+                text(
+                    f"ALTER TABLE records ATTACH PARTITION {partition} "
+                    f"FOR VALUES IN ('{collection}')",
+                ),
+            )
+            await self._store_centroids(conn, collection, centroids)
+
+    async def _catalog_changed(self, collection: str) -> None:
+        """
+        Record a committed write to a collection, and notify every worker.
+
+        Reads of the collection go to the primary until the replicas replayed
+        the write, then results computed for the previous version are stale.
+        Versions are kept by the primary, shards leave it to the store fanning
+        out to them.
+        """
+        if self.shard is not None:
+            return
+        async with self.engine.begin() as conn:
+            lsn = None
+            if replica_router.enabled:
+                lsn = await conn.scalar(text(PRIMARY_LSN_QUERY))
+            change = await publish_change(conn, collection, lsn)
+        await catalog_bus.apply(change)
+
+    async def sync_centroids(self, change: CatalogChange) -> None:
+        """
+        Export the centroids of a collection changed on another host.
+
+        Snapshots are shared by the workers of a host, the writer exports
+        them for its own host.
+
+        Args:
+            change (CatalogChange): The change.
+        """
+        if change.host != HOST:
+            await self._export_centroids(change.collection)
+
+    @asynccontextmanager
+    async def raw_connection(self) -> AsyncIterator[asyncpg.Connection]:
+        """
+        Open a dedicated asyncpg connection for bulk transfers.
+
+        Vectors are exchanged in the binary format on this connection. It is
+        not taken from the pool, whose connections use the text format.
+
+        Yields:
+            asyncpg.Connection: The connection, closed on exit.
+        """
+        conn = await asyncpg.connect(str(self.url.with_scheme("postgresql")))
+        try:
+            await register_vector(conn)
+            yield conn
+        finally:
+            await conn.close()
+
+    async def copy_records(self, table: Table, records: Iterable[tuple]) -> int:
+        """
+        Bulk-load records into a table with COPY.
+
+        Records are streamed in the binary format, nothing is embedded.
+
+        Args:
+            table (Table): Table to load, e.g. the staging table of
+                `replace_collection`.
+            records (Iterable[tuple]): Values of ``COPY_COLUMNS``, with the
+                metadata as JSON text and the embedding as a float32 array.
+
+        Returns:
+            int: Number of copied records.
+        """
+        if self.shard is None and shard_router.enabled:
+            copied = 0
+            for chunk in _chunks(records, settings.ingest_batch_size):
+                groups = group_by_shard(chunk, lambda row: row[0], chunk[0][1])
+                counts = await asyncio.gather(
+                    *(
+                        VectorStore(shard).copy_records(table, rows)
+                        for shard, rows in groups.items()
+                    ),
+                )
+                copied += sum(counts)
+            return copied
+        async with self.raw_connection() as conn:
+            status = await conn.copy_records_to_table(
+                table.name,
+                records=records,
+                columns=COPY_COLUMNS,
+            )
+        return int(status.split()[-1])
+
+    async def _build_staging_indexes(self, staging: str) -> None:
+        """Create the indexes of the records table on a loaded staging table."""
+        async with self.engine.begin() as conn:
+            # HNSW builds are much faster when the graph fits in memory.
+            await conn.execute(
+                text(
+                    "SELECT set_config('maintenance_work_mem', :memory, true)",
+                ),
+                {"memory": settings.index_build_memory},
+            )
+            await conn.execute(
+                text(f"ALTER TABLE {staging} ADD PRIMARY KEY (id, collection)"),
+            )
+            index_definitions = (await conn.execute(PARENT_INDEXES_QUERY)).scalars()
+            for definition in index_definitions.all():
+                await conn.execute(
+                    text(
+                        INDEX_TARGET_PATTERN.sub(
+                            rf"CREATE \1INDEX ON {staging} ",
+                            definition,
+                        ),
+                    ),
+                )
+
+    async def drop_collection(self, collection: str) -> None:
+        """
+        Drop a collection with all its records.
+
+        Args:
+            collection (str): Name of the collection.
+        """
+        partition = partition_name(collection)
+        if shards := self.shard_stores(collection):
+            await asyncio.gather(
+                *(store.drop_collection(collection) for store in shards),
+            )
+            await self._catalog_changed(collection)
+            await self._export_centroids(collection)
+            return
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(f"ALTER TABLE records DETACH PARTITION {partition}"),
+            )
+            await conn.execute(text(f"DROP TABLE {partition}"))
+            await conn.execute(
+                delete(CategoryCentroid).where(
+                    CategoryCentroid.collection == collection,
+                ),
+            )
+        await self._catalog_changed(collection)
+        await self._export_centroids(collection)
+
+    async def refresh_centroids(self, collection: str = DEFAULT_COLLECTION) -> None:
+        """
+        Recompute the category centroids of a collection.
+
+        Collections loaded with `replace_collection` are refreshed on swap,
+        records inserted into the records table directly need a refresh.
+
+        Args:
+            collection (str): Name of the collection.
+        """
+        if shards := self.shard_stores(validate_collection(collection)):
+            await asyncio.gather(
+                *(store.refresh_centroids(collection) for store in shards),
+            )
+            await self._catalog_changed(collection)
+            await self._export_centroids(collection)
+            return
+        async with self.engine.begin() as conn:
+            await self._refresh_centroids(conn, validate_collection(collection))
+        await self._catalog_changed(collection)
+        await self._export_centroids(collection)
+
+    async def _export_centroids(self, collection: str) -> None:
+        """Share the new centroids of a collection with the other workers."""
+        if self.shard is not None:
+            return
+        source = self.engine
+        if shard_router.enabled:
+            shards = shard_router.for_collection(collection)
+            if len(shards) > 1:
+                # Each shard only has the centroids of its records, searches
+                # route with them on the shard instead.
+                await asyncio.to_thread(centroid_index.write, collection, [])
+                return
+            source = shards[0].engine
+        try:
+            await centroid_index.export(source, collection)
+        except Exception as e:
+            # A stale snapshot would misroute searches, fall back to SQL.
+            logger.warning(f"Could not export the centroids of '{collection}': {e}")
+            await asyncio.to_thread(centroid_index.write, collection, [])
+
+    async def _refresh_centroids(self, conn: AsyncConnection, collection: str) -> None:
+        """Replace the level-1 and level-2 centroids of a collection."""
+        centroids = await self._compute_centroids(conn, collection, Record.__table__)
+        await self._store_centroids(conn, collection, centroids)
+
+    async def _compute_centroids(
+        self,
+        conn: AsyncConnection,
+        collection: str,
+        table: Table,
+    ) -> List[dict]:
+        """
+        Compute the level-1 and level-2 centroids of the records of a table.
+
+        Missing categories are grouped under an empty category, so records
+        without a level-2 category, or any category, are still routed to.
+
+        Args:
+            conn (AsyncConnection): The connection.
+            collection (str): Name of the collection.
+            table (Table): The records table, or a staging table.
+
+        Returns:
+            List[dict]: Rows of the centroids table.
+        """
+        # Inlined, so the grouped expressions are the selected ones.
+        empty = literal_column("''")
+        category_1 = func.coalesce(category_expression(1, table.name), empty)
+        category_2 = func.coalesce(category_expression(2, table.name), empty)
+        level_1 = (
+            select(
+                literal_column("1").label("level"),
+                category_1.label("category_1"),
+                empty.label("category_2"),
+                avg(table.c.embedding).label("centroid"),
+                func.count().label("record_count"),
+            )
+            .where(table.c.collection == collection)
+            .group_by(category_1)
+        )
+        level_2 = (
+            select(
+                literal_column("2"),
+                category_1,
+                category_2,
+                avg(table.c.embedding),
+                func.count(),
+            )
+            .where(table.c.collection == collection)
+            .group_by(category_1, category_2)
+        )
+        rows = await conn.execute(union_all(level_1, level_2))
+        return [{"collection": collection, **row} for row in rows.mappings()]
+
+    async def _store_centroids(
+        self,
+        conn: AsyncConnection,
+        collection: str,
+        centroids: List[dict],
+    ) -> None:
+        """Replace the centroids of a collection, see `_compute_centroids`."""
+        await conn.execute(
+            delete(CategoryCentroid).where(CategoryCentroid.collection == collection),
+        )
+        if centroids:
+            await conn.execute(insert(CategoryCentroid), centroids)
+
+    async def _route_categories(
+        self,
+        query_embedding: List[float],
+        collection: str,
+        replica: Optional[Replica] = None,
+    ) -> List[Tuple[str, str]]:
+        """
+        Pick the categories closest to a query by their centroids.
+
+        The closest level-1 categories are picked first, then the closest
+        level-2 categories within them. The shared snapshot of the centroids
+        is used when it exists, the centroids table otherwise.
+
+        Returns:
+            List[Tuple[str, str]]: Level-1 and level-2 category of each pick.
+        """
+        snapshot = centroid_index.get(collection)
+        if snapshot is not None:
+            return snapshot.route(
+                query_embedding,
+                settings.routing_level_1_categories,
+                settings.routing_level_2_categories,
+            )
+
+        distance = CategoryCentroid.centroid.cosine_distance(query_embedding)
+        level_1 = (
+            select(CategoryCentroid.category_1)
+            .where(
+                CategoryCentroid.collection == collection,
+                CategoryCentroid.level == 1,
+            )
+            .order_by(distance)
+            .limit(settings.routing_level_1_categories)
+            .correlate(None)
+        )
+        query = (
+            select(CategoryCentroid.category_1, CategoryCentroid.category_2)
+            .where(
+                CategoryCentroid.collection == collection,
+                CategoryCentroid.level == 2,
+                CategoryCentroid.category_1.in_(level_1.scalar_subquery()),
+            )
+            .order_by(distance)
+            .limit(settings.routing_level_2_categories)
+        )
+        sessions = self.Session if replica is None else replica.Session
+        async with track_query("route", query, sessions):  # noqa: SIM117
+            async with sessions() as session:
+                rows = await session.execute(query)
+        return [tuple(row) for row in rows]
 
     async def table_exists(self) -> bool:
         """
@@ -41,6 +695,10 @@ class VectorStore:  # noqa: D101
         Returns:
             bool: True if the table exists, False otherwise.
         """
+        if shards := self.shard_stores():
+            return any(
+                await asyncio.gather(*(store.table_exists() for store in shards)),
+            )
         async with self.engine.connect() as conn:
             # Sử dụng `run_sync` để chạy các hàm đồng bộ trong một môi trường bất đồng bộ
             return await conn.run_sync(
@@ -51,15 +709,15 @@ class VectorStore:  # noqa: D101
         """Drop the necessary tables from the database."""
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.drop_all)
+        for store in self.shard_stores():
+            await store.drop_tables()
 
-    async def upsert(self, records: pd.DataFrame) -> None:
+    async def upsert(self, records: "pd.DataFrame") -> None:
         """Insert or update records in the database from a pandas DataFrame."""
+        failed_rows = SampledLogger(logger)
         async with self.Session() as session, session.begin():
             for _, row in records.iterrows():
                 try:
-                    logger.info(
-                        f"Processing row {row['id']} with metadata {row['metadata']}",
-                    )
                     record = await session.merge(
                         Record(
                             id=row["id"],
@@ -70,31 +728,357 @@ class VectorStore:  # noqa: D101
                     )
                     session.add(record)
                 except Exception as e:
-                    logger.error(f"Error processing row {row['id']}: {e}")
+                    failed_rows.event(
+                        logging.ERROR, "Error processing row %s: %s", row["id"], e,
+                    )
             await session.commit()
+        await self._catalog_changed(DEFAULT_COLLECTION)
+        logger.info(
+            f"Upserted {len(records) - failed_rows.count} records, "
+            f"{failed_rows.count} failed.",
+        )
+
+    async def insert(
+        self,
+        records: List[dict],
+        collection: str = DEFAULT_COLLECTION,
+        table: Optional[Table] = None,
+    ) -> None:
+        """
+        Insert new records in the database with a single statement.
+
+        Args:
+            records (List[dict]): Records with "id", "metadata", "contents"
+                and "embedding" keys.
+            collection (str): The collection of the records.
+            table (Optional[Table]): Table to insert into, e.g. the staging
+                table of `replace_collection`. Defaults to the records table.
+        """
+        if self.shard is None and shard_router.enabled:
+            groups = group_by_shard(records, lambda record: record["id"], collection)
+            await asyncio.gather(
+                *(
+                    VectorStore(shard).insert(group, collection, table)
+                    for shard, group in groups.items()
+                ),
+            )
+            if table is None:
+                await self._catalog_changed(collection)
+            return
+        async with self.Session() as session, session.begin():
+            await session.execute(
+                insert(Record.__table__ if table is None else table),
+                [
+                    {
+                        "id": record["id"],
+                        "collection": collection,
+                        "record_metadata": record["metadata"],
+                        "contents": record["contents"],
+                        "embedding": record["embedding"],
+                    }
+                    for record in records
+                ],
+            )
+        if table is None:
+            await self._catalog_changed(collection)
+
+    async def merge_sources(
+        self,
+        updates: List[dict],
+        collection: str = DEFAULT_COLLECTION,
+        table: Optional[Table] = None,
+    ) -> None:
+        """
+        Record duplicate rows merged into stored records, in one statement.
+
+        Args:
+            updates (List[dict]): "id" of a record, "merged" the number of
+                rows merged into it and "sources" their contents and metadata.
+            collection (str): The collection of the records.
+            table (Optional[Table]): Table of the records, e.g. the staging
+                table of `replace_collection`. Defaults to the records table.
+        """
+        if self.shard is None and shard_router.enabled:
+            groups = group_by_shard(updates, lambda update: update["id"], collection)
+            await asyncio.gather(
+                *(
+                    VectorStore(shard).merge_sources(group, collection, table)
+                    for shard, group in groups.items()
+                ),
+            )
+            if table is None:
+                await self._catalog_changed(collection)
+            return
+        name = Record.__tablename__ if table is None else table.name
+        query = text(
+            f"UPDATE {name} AS r SET record_metadata = ("  # noqa: S608
+            "r.record_metadata::jsonb || jsonb_build_object("
+            "'sources', coalesce(r.record_metadata::jsonb -> 'sources', "
+            "'[]'::jsonb) || u.sources, "
+            "'merged', coalesce((r.record_metadata::jsonb ->> 'merged')::int, 0) "
+            "+ u.merged))::json "
+            "FROM jsonb_to_recordset(CAST(:updates AS jsonb)) "
+            "AS u(id uuid, merged int, sources jsonb) "
+            "WHERE r.collection = :collection AND r.id = u.id",
+        )
+        async with self.Session() as session, session.begin():
+            await session.execute(
+                query,
+                {
+                    "updates": json.dumps(updates, ensure_ascii=False),
+                    "collection": validate_collection(collection),
+                },
+            )
+        if table is None:
+            await self._catalog_changed(collection)
 
     async def search(
-        self, query_text: str, limit: int = 10, metadata_filter: Optional[dict] = None,
+        self,
+        query_text: str,
+        limit: int = 10,
+        metadata_filter: Optional[dict] = None,
+        collection: str = DEFAULT_COLLECTION,
+        mode: str = "flat",
     ) -> List[dict]:
-        """Query the vector database for similar embeddings based on input text."""
+        """
+        Query the vector database for similar embeddings based on input text.
+
+        The query is embedded, then searched with `search_by_embedding`.
+        """
+        validate_search(mode, collection)
         query_embedding = await self.get_embedding(query_text)
-        async with self.Session() as session:
-            query = (
-                select(
-                    Record,
-                    Record.embedding.l2_distance(query_embedding).label("distance"),
+        return await self.search_by_embedding(
+            query_embedding,
+            limit=limit,
+            metadata_filter=metadata_filter,
+            collection=collection,
+            mode=mode,
+        )
+
+    async def search_by_embedding(
+        self,
+        query_embedding: List[float],
+        limit: int = 10,
+        metadata_filter: Optional[dict] = None,
+        collection: str = DEFAULT_COLLECTION,
+        mode: str = "flat",
+    ) -> List[dict]:
+        """
+        Query the vector database for the records closest to an embedding.
+
+        Only the partition of the given collection, and its index, is searched.
+        In "hierarchical" mode only the records of the categories closest to
+        the query are searched, collections without category centroids fall
+        back to a flat search. Searches are served by a read replica when one
+        is in sync with the collection, by the primary otherwise. Sharded
+        records are searched on every shard of the collection, see
+        `_scatter_search`.
+        """
+        validate_search(mode, collection)
+        if shards := self.shard_stores(collection):
+            return await self._scatter_search(
+                shards, query_embedding, limit, metadata_filter, collection, mode,
+            )
+        with stage_timer("vector_search"):
+            # Replicas are replicas of the primary, shards are read directly.
+            replica = None
+            if self.shard is None:
+                replica = replica_router.reader(collection)
+            categories = None
+            if mode == "hierarchical":
+                categories = await self._route_categories(
+                    query_embedding, collection, replica,
+                )
+            if settings.search_fast_path:
+                return await self._search_fast(
+                    query_embedding, limit, metadata_filter, collection, categories,
+                    replica,
                 )
-                .order_by("distance")
-                .limit(limit)
+            return await self._search_orm(
+                query_embedding, limit, metadata_filter, collection, categories,
+                replica,
             )
-            if metadata_filter:
-                for key, value in metadata_filter.items():
-                    query = query.filter(
-                        Record.record_metadata[key].astext == str(value),
-                    )
 
-            results = await session.execute(query)
-        fetched_results = results.fetchall()
+    async def _scatter_search(
+        self,
+        shards: List["VectorStore"],
+        query_embedding: List[float],
+        limit: int,
+        metadata_filter: Optional[dict],
+        collection: str,
+        mode: str,
+    ) -> List[dict]:
+        """
+        Search the shards concurrently and merge their hits into the top-k.
+
+        Each shard returns its own top-k, so the global top-k is among them.
+        Shards get ``settings.shard_search_timeout`` seconds, within the
+        request budget; the hits of slower or failing shards are left out.
+
+        Raises:
+            Exception: The error of the first shard, if no shard answered.
+        """
+        timeout = settings.shard_search_timeout
+        remaining = remaining_time()
+        if remaining is not None:
+            timeout = max(0.0, min(timeout, remaining))
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(
+                    store.search_by_embedding(
+                        query_embedding,
+                        limit=limit,
+                        metadata_filter=metadata_filter,
+                        collection=collection,
+                        mode=mode,
+                    ),
+                    timeout,
+                )
+                for store in shards
+            ),
+            return_exceptions=True,
+        )
+        hits: List[dict] = []
+        errors = []
+        for store, result in zip(shards, results):
+            if isinstance(result, Exception):
+                timed_out = isinstance(result, asyncio.TimeoutError)
+                reason = "timeout" if timed_out else "error"
+                name = store.shard.name
+                SHARD_SEARCHES_SKIPPED.labels(shard=name, reason=reason).inc()
+                logger.warning(f"Shard {name} left out of a search, {reason}: {result}")
+                errors.append(result)
+                continue
+            hits.extend(result)
+        if len(errors) == len(shards):
+            raise errors[0]
+        return heapq.nlargest(limit, hits, key=lambda hit: hit["score"])
+
+    async def _search_fast(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        metadata_filter: Optional[dict],
+        collection: str,
+        categories: Optional[List[Tuple[str, str]]],
+        replica: Optional[Replica] = None,
+    ) -> List[dict]:
+        """
+        Search with a prepared asyncpg statement.
+
+        Only the returned columns are selected, records are not hydrated into
+        ORM objects and the query vector is sent in the binary format. Hits
+        without a positive score are filtered out by the database. A
+        collection without a partition has no records, like with the ORM.
+        """
+        partition = partition_name(collection)
+        args: List[Any] = [np.asarray(query_embedding, dtype=np.float32), MAX_DISTANCE]
+        conditions = ["embedding <-> $1 < $2"]
+        for key, value in (metadata_filter or {}).items():
+            args.extend((key, str(value)))
+            conditions.append(
+                f"record_metadata ->> ${len(args) - 1}::text = ${len(args)}",
+            )
+        if categories:
+            complete, partial = split_categories(categories)
+            routes = []
+            if complete:
+                args.extend(map(list, zip(*complete)))
+                routed = f"unnest(${len(args) - 1}::text[], ${len(args)}::text[])"
+                routes.append(
+                    f"({category_expression(1, partition)}, "  # noqa: S608
+                    f"{category_expression(2, partition)}) "
+                    f"IN (SELECT * FROM {routed})",
+                )
+            for pair in partial:
+                levels = []
+                for level, category in enumerate(pair, start=1):
+                    expression = category_expression(level, partition)
+                    if category:
+                        args.append(category)
+                        levels.append(f"{expression} = ${len(args)}")
+                    else:
+                        levels.append(f"coalesce({expression}, '') = ''")
+                routes.append(f"({' AND '.join(levels)})")
+            conditions.append(f"({' OR '.join(routes)})")
+        args.append(limit)
+        sql = (
+            "SELECT id, contents, record_metadata, embedding <-> $1 AS distance "  # noqa: S608
+            f"FROM {partition} WHERE {' AND '.join(conditions)} "
+            f"ORDER BY distance LIMIT ${len(args)}"
+        )
+
+        pool = await (self.pool if replica is None else replica.pool).get()
+        try:
+            async with track_raw_query(  # noqa: SIM117
+                "search", sql, args, pool, vector_query=True,
+            ):
+                async with pool.acquire() as conn:
+                    rows = await conn.fetch(sql, *args)
+        except asyncpg.UndefinedTableError:
+            return []
+        return [
+            {
+                "id": row["id"],
+                "contents": row["contents"],
+                "metadata": row["record_metadata"],
+                "score": 1 - row["distance"],
+            }
+            for row in rows
+        ]
+
+    async def _search_orm(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        metadata_filter: Optional[dict],
+        collection: str,
+        categories: Optional[List[Tuple[str, str]]],
+        replica: Optional[Replica] = None,
+    ) -> List[dict]:
+        """Search through the ORM, with ``settings.search_fast_path`` disabled."""
+        sessions = self.Session if replica is None else replica.Session
+        query = (
+            select(
+                Record,
+                Record.embedding.l2_distance(query_embedding).label("distance"),
+            )
+            .where(Record.collection == collection)
+            .order_by("distance")
+            .limit(limit)
+        )
+        if metadata_filter:
+            for key, value in metadata_filter.items():
+                query = query.filter(
+                    Record.record_metadata[key].as_string() == str(value),
+                )
+        if categories:
+            complete, partial = split_categories(categories)
+            routes = [
+                and_(
+                    *(
+                        category_expression(level) == category
+                        if category
+                        else func.coalesce(category_expression(level), "") == ""
+                        for level, category in enumerate(pair, start=1)
+                    ),
+                )
+                for pair in partial
+            ]
+            if complete:
+                routes.insert(
+                    0,
+                    tuple_(
+                        category_expression(1),
+                        category_expression(2),
+                    ).in_(complete),
+                )
+            query = query.where(or_(*routes))
+        async with track_query(  # noqa: SIM117
+            "search", query, sessions, vector_query=True,
+        ):
+            async with sessions() as session:
+                results = await session.execute(query)
         return [
             {
                 "id": record.id,
@@ -102,7 +1086,7 @@ class VectorStore:  # noqa: D101
                 "metadata": record.record_metadata,
                 "score": 1 - distance,
             }
-            for record, distance in fetched_results
+            for record, distance in results.fetchall()
             if (1 - distance) > 0
         ]
 
@@ -111,26 +1095,47 @@ class VectorStore:  # noqa: D101
         ids: Optional[List[str]] = None,
         metadata_filter: Optional[dict] = None,
         delete_all: bool = False,
+        collection: str = DEFAULT_COLLECTION,
     ) -> None:
-        """Delete records from the database based on specified criteria."""
+        """Delete records of a collection based on specified criteria."""
         if sum(bool(x) for x in (ids, metadata_filter, delete_all)) != 1:
             raise ValueError(
                 "Provide exactly one of: ids, metadata_filter, or delete_all",
             )
+        if shards := self.shard_stores(validate_collection(collection)):
+            if ids:
+                # Only the shards storing the records.
+                deletes = [
+                    VectorStore(shard).delete(group, collection=collection)
+                    for shard, group in group_by_shard(
+                        ids,
+                        lambda record_id: record_id,
+                        collection,
+                    ).items()
+                ]
+            else:
+                deletes = [
+                    store.delete(None, metadata_filter, delete_all, collection)
+                    for store in shards
+                ]
+            await asyncio.gather(*deletes)
+            await self._catalog_changed(collection)
+            return
+
+        query = Record.__table__.delete().where(
+            Record.collection == validate_collection(collection),
+        )
+        if ids:
+            query = query.where(Record.id.in_(ids))
+        elif metadata_filter:
+            for key, value in metadata_filter.items():
+                query = query.where(
+                    Record.record_metadata[key].as_string() == str(value),
+                )
 
         async with self.Session() as session:  # noqa: SIM117
             async with session.begin():
-                if delete_all:
-                    await session.execute(Record.__table__.delete())
-                elif ids:
-                    await session.execute(
-                        Record.__table__.delete().where(Record.id.in_(ids)),
-                    )
-                elif metadata_filter:
-                    query = Record.__table__.delete()
-                    for key, value in metadata_filter.items():
-                        query = query.where(
-                            Record.record_metadata[key].astext == str(value),
-                        )
+                async with track_query("delete", query, self.Session):
                     await session.execute(query)
                 await session.commit()
+        await self._catalog_changed(collection)
@@ -0,0 +1,5 @@
+"""Admin API."""
+
+from app.web.api.admin.views import router
+
+__all__ = ["router"]
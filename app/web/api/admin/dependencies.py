@@ -0,0 +1,30 @@
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+from app.core.settings import settings
+
+
+def verify_admin_token(
+    x_admin_token: Optional[str] = Header(default=None),
+) -> None:
+    """
+    Allow only requests carrying the configured admin token.
+
+    :param x_admin_token: value of the X-Admin-Token header.
+    :raises HTTPException: if admin endpoints are disabled or the token is wrong.
+    """
+    if not settings.admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled.",
+        )
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token,
+        settings.admin_token,
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token.",
+        )
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class SlowQueryEntry(BaseModel):
+    """A query that went over the slow query threshold."""
+
+    operation: str
+    statement: str
+    duration_ms: float
+    timestamp: datetime
+    plan: Optional[List[Dict[str, Any]]] = None
+    uses_vector_index: Optional[bool] = None
+
+
+class LoopStallEntry(BaseModel):
+    """A call that blocked the event loop longer than the stall threshold."""
+
+    duration_ms: float
+    stack: List[str]
+    timestamp: datetime
+    finished: bool
@@ -0,0 +1,74 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.utils.loop_monitor import loop_monitor
+from app.utils.profiler import ProfilerBusyError, profiler
+from app.utils.query_log import slow_query_log
+from app.web.api.admin.schemas import LoopStallEntry, SlowQueryEntry
+
+router = APIRouter()
+
+
+@router.get("/slow_queries", response_model=List[SlowQueryEntry])
+async def get_slow_queries(missing_vector_index: bool = False) -> List[dict]:
+    """
+    List the slow vector queries recorded by this worker, newest first.
+
+    Args:
+        missing_vector_index (bool): Only list queries whose captured plan
+            did not use the vector index, e.g. fell back to a sequential scan.
+
+    Returns:
+        List[dict]: The slow queries with their captured plans.
+    """
+    return slow_query_log.entries(missing_vector_index=missing_vector_index)
+
+
+@router.get("/loop_stalls", response_model=List[LoopStallEntry])
+async def get_loop_stalls() -> List[dict]:
+    """
+    List the calls that blocked the event loop of this worker, newest first.
+
+    Returns:
+        List[dict]: The stalls with the stack of the blocking code.
+    """
+    return loop_monitor.entries()
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_requests(
+    requests: int = Query(20, ge=1, le=10000),
+    interval_ms: float = Query(5.0, ge=1.0, le=1000.0),
+    timeout: float = Query(60.0, gt=0, le=600.0),
+) -> PlainTextResponse:
+    """
+    Profile the next requests served by this worker.
+
+    The response is sent once the requests are served, or after the timeout
+    with the requests served so far. It lists folded stacks, which
+    flamegraph.pl and speedscope render as a flamegraph.
+
+    Args:
+        requests (int): Number of requests to profile.
+        interval_ms (float): Milliseconds between stack samples.
+        timeout (float): Longest time to wait for the requests in seconds.
+
+    Returns:
+        PlainTextResponse: The folded stacks.
+
+    Raises:
+        HTTPException: If a profile is already being recorded.
+    """
+    try:
+        profile = await profiler.profile(requests, interval_ms / 1000, timeout)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+    return PlainTextResponse(
+        profile.folded,
+        headers={
+            "X-Profile-Requests": str(profile.requests),
+            "X-Profile-Samples": str(profile.samples),
+        },
+    )
@@ -0,0 +1,5 @@
+"""Bulk search API."""
+
+from app.web.api.bulk_search.views import router
+
+__all__ = ["router"]
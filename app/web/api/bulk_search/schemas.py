@@ -0,0 +1,18 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from app.utils.bulk_search import QUERY_COLUMN
+from app.utils.vector_store import COLLECTION_PATTERN, DEFAULT_COLLECTION
+
+
+class BulkSearchRequest(BaseModel):
+    """request file url for searching every row of a sheet."""
+
+    path_url: str
+    collection: str = Field(DEFAULT_COLLECTION, pattern=COLLECTION_PATTERN.pattern)
+    search_mode: Literal["flat", "hierarchical"] = "flat"
+    # Column with the queries, one per row
+    column: str = QUERY_COLUMN
+    # Results per query
+    limit: int = Field(5, ge=1, le=50)
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import math
+import shutil
+import tempfile
+from typing import AsyncIterator, BinaryIO, Callable, Literal
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.core.settings import settings
+from app.services.admission import AdmissionRejectedError, bulk_admission
+from app.services.sheet_fetcher import sheet_fetcher
+from app.utils.arrow_reader import file_format, iter_record_batches
+from app.utils.bulk_search import QUERY_COLUMN, bulk_search, iter_queries
+from app.utils.priority import batch_priority
+from app.utils.vector_store import (
+    COLLECTION_PATTERN,
+    DEFAULT_COLLECTION,
+    VectorStore,
+)
+from app.web.api.bulk_search.schemas import BulkSearchRequest
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+NDJSON = "application/x-ndjson"
+
+
+async def _admit() -> Callable[[], None]:
+    """
+    Take a bulk search slot for the whole response.
+
+    Dependencies with yield exit before a streamed body is sent, so the
+    slot is taken here and released once the stream ends.
+
+    Returns:
+        Callable[[], None]: Releases the slot, only the first call counts.
+
+    Raises:
+        HTTPException: If no slot is available in time.
+    """
+    try:
+        admitted_at = await bulk_admission.acquire(
+            timeout=settings.admission_queue_timeout,
+        )
+    except AdmissionRejectedError as e:
+        logger.warning(f"{bulk_admission.name}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The server is overloaded, retry later.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        ) from e
+    released = False
+
+    def release_once() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            bulk_admission.release(admitted_at)
+
+    return release_once
+
+
+def _stream_results(
+    source: BinaryIO,
+    fmt: str,
+    request: BulkSearchRequest,
+    release: Callable[[], None],
+) -> StreamingResponse:
+    """Stream the results of every row of a file as NDJSON."""
+
+    def cleanup() -> None:
+        source.close()
+        release()
+
+    async def lines() -> AsyncIterator[bytes]:
+        batches = iter_queries(
+            iter_record_batches(source, fmt, settings.bulk_search_batch_size),
+            request.column,
+            settings.bulk_search_batch_size,
+        )
+        try:
+            async for item in bulk_search(
+                batches,
+                VectorStore(),
+                collection=request.collection,
+                mode=request.search_mode,
+                limit=request.limit,
+            ):
+                line = json.dumps(item, ensure_ascii=False, default=str)
+                yield f"{line}\n".encode()
+        except Exception as e:
+            # The status is already sent, the error ends the stream instead.
+            logger.error(f"Bulk search stopped: {e!s}")
+            yield (json.dumps({"error": str(e)}, ensure_ascii=False) + "\n").encode()
+        finally:
+            cleanup()
+
+    # The background task also runs when the client leaves before the body
+    # is started, the generator's cleanup does not.
+    return StreamingResponse(
+        lines(),
+        media_type=NDJSON,
+        background=BackgroundTask(cleanup),
+    )
+
+
+@router.post("/file", dependencies=[Depends(batch_priority)])
+async def bulk_search_file(
+    file: UploadFile = File(...),
+    collection: str = Query(DEFAULT_COLLECTION, pattern=COLLECTION_PATTERN.pattern),
+    search_mode: Literal["flat", "hierarchical"] = "flat",
+    column: str = Query(QUERY_COLUMN, description="Column with the queries."),
+    limit: int = Query(5, ge=1, le=50),
+) -> StreamingResponse:
+    """
+    Search every row of a CSV, XLSX or Parquet file, streaming the results.
+
+    Each line of the response is the JSON result of one row, in the order
+    of the file, followed by a summary line. Lines are sent as soon as
+    their batch is searched, and the file is read batch by batch, so the
+    memory used does not depend on the number of rows.
+
+    Args:
+        file (UploadFile): The file with one query per row.
+        collection (str): Collection to search.
+        search_mode (Literal["flat", "hierarchical"]): Search mode, see
+            `VectorStore.search`.
+        column (str): Column with the queries.
+        limit (int): Results per query.
+
+    Returns:
+        StreamingResponse: The NDJSON results.
+
+    Raises:
+        HTTPException: If the file format is not supported, or the server
+            is overloaded.
+    """
+    options = BulkSearchRequest(
+        path_url=file.filename or "",
+        collection=collection,
+        search_mode=search_mode,
+        column=column,
+        limit=limit,
+    )
+    try:
+        fmt = file_format(file.filename)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+
+    release = await _admit()
+    # The upload is closed once this handler returns, before the body is
+    # streamed, so the stream reads its own spooled copy.
+    source = tempfile.TemporaryFile()
+    try:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, source)
+        source.seek(0)
+    except BaseException:
+        source.close()
+        release()
+        raise
+    return _stream_results(source, fmt, options, release)
+
+
+@router.post("/url", dependencies=[Depends(batch_priority)])
+async def bulk_search_url(request: BulkSearchRequest) -> StreamingResponse:
+    """
+    Search every row of a sheet given by its URL, streaming the results.
+
+    The sheet is downloaded as CSV, see `/bulk_search/file` for the results.
+
+    Args:
+        request (BulkSearchRequest): The sheet URL and the search options.
+
+    Returns:
+        StreamingResponse: The NDJSON results.
+
+    Raises:
+        HTTPException: If the sheet cannot be downloaded, or the server is
+            overloaded.
+    """
+    release = await _admit()
+    try:
+        path = await sheet_fetcher.fetch(request.path_url)
+        source = path.open("rb")
+    except Exception as e:
+        release()
+        logger.error(f"An error occurred while downloading the sheet: {e!s}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot download the sheet: {e!s}",
+        ) from e
+    return _stream_results(source, "csv", request, release)
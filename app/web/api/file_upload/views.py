@@ -1,24 +1,83 @@
 import logging
+from typing import List
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
 from fastapi.responses import JSONResponse
 
-from app.utils.doc_util import load_excel_url, prepare_data
-from app.utils.vector_store import VectorStore
+from app.core.settings import settings
+from app.services.admission import admission, upload_admission
+from app.utils.arrow_reader import file_format, iter_record_batches
+from app.utils.doc_util import (
+    IngestResult,
+    ingest_batches,
+    load_excel_url,
+    prepare_data,
+)
+from app.utils.priority import batch_priority
+from app.utils.vector_store import (
+    COLLECTION_PATTERN,
+    DEFAULT_COLLECTION,
+    VectorStore,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-vector_store = VectorStore()
 
+CollectionQuery = Query(
+    DEFAULT_COLLECTION,
+    pattern=COLLECTION_PATTERN.pattern,
+    description="Collection replaced by the upload, e.g. one brand catalog.",
+)
 
-@router.post("/upload")
-async def upload_file(url_str: str) -> JSONResponse:
+
+def _check_ingest(result: IngestResult) -> None:
+    """
+    Fail an upload when some of its rows could not be stored, or it has none.
+
+    It is called within `VectorStore.replace_collection`, so the error drops
+    the staging table and the previous collection is kept.
+
+    Args:
+        result (IngestResult): Counts of the ingestion.
+
+    Raises:
+        HTTPException: If a batch failed, or no row was stored.
+    """
+    if result.failed_batches:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "message": (
+                    f"{result.failed_rows} of {result.rows} rows could not be "
+                    "embedded or stored, the collection was not replaced. "
+                    "Retry later."
+                ),
+                "inserted": result.inserted,
+                "failed": result.failed_rows,
+            },
+        )
+    if not result.inserted:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The file has no valid rows, the collection was not replaced.",
+        )
+
+
+@router.post(
+    "/upload",
+    dependencies=[Depends(batch_priority), Depends(admission(upload_admission))],
+)
+async def upload_file(url_str: str, collection: str = CollectionQuery) -> JSONResponse:
     """
     Upload a file from a URL and save its data to the vector store.
 
+    The uploaded data replaces the collection, other collections are kept.
+    The collection is only replaced when every row was stored.
+
     Args:
         url_str (str): The URL of the Excel file to be uploaded.
+        collection (str): The collection to replace.
 
     Returns:
         JSONResponse: A message indicating success or failure.
@@ -32,18 +91,23 @@ async def upload_file(url_str: str) -> JSONResponse:
             detail="No input provided. Please provide a valid URL.",
         )
 
+    vector_store = VectorStore()
     # check and ensure table exist
-    if await vector_store.table_exists():
-        logger.info("Table already exists. Dropping and recreating it.")
-        await vector_store.drop_tables()
     await vector_store.create_tables()
 
     try:
         # Load data from the Excel URL
-        df = load_excel_url(url_str)
+        df = await load_excel_url(url_str)
 
         # Prepare and upsert data into the vector store
-        await prepare_data(data_excel=df, vector_store=vector_store)
+        async with vector_store.replace_collection(collection) as staging:
+            result = await prepare_data(
+                data_excel=df,
+                vector_store=vector_store,
+                collection=collection,
+                table=staging,
+            )
+            _check_ingest(result)
 
         return JSONResponse(
             content={"message": "File uploaded and processed successfully."},
@@ -57,3 +121,119 @@ async def upload_file(url_str: str) -> JSONResponse:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred: {e!s}",
         ) from e
+
+
+@router.post(
+    "/upload_file",
+    dependencies=[Depends(batch_priority), Depends(admission(upload_admission))],
+)
+async def upload_catalog_file(
+    file: UploadFile = File(...),
+    collection: str = CollectionQuery,
+) -> JSONResponse:
+    """
+    Upload a CSV, XLSX or Parquet catalog export and save it to the vector store.
+
+    The multipart body is spooled to disk while it is received and the file
+    is decoded as a stream of Arrow record batches, so neither the upload
+    nor the parsed catalog is held in memory as a whole. The uploaded data
+    replaces the collection, other collections are kept.
+
+    Args:
+        file (UploadFile): The catalog file.
+        collection (str): The collection to replace.
+
+    Returns:
+        JSONResponse: A message with the number of inserted and merged rows.
+
+    Raises:
+        HTTPException: If the file format is not supported, some rows could
+            not be stored or an error occurs during processing. The
+            collection is only replaced when every row was stored.
+    """
+    try:
+        fmt = file_format(file.filename)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+
+    vector_store = VectorStore()
+    await vector_store.create_tables()
+
+    try:
+        batches = iter_record_batches(file.file, fmt, settings.ingest_batch_size)
+        async with vector_store.replace_collection(collection) as staging:
+            result = await ingest_batches(
+                batches,
+                vector_store,
+                collection=collection,
+                table=staging,
+            )
+            _check_ingest(result)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+    except Exception as e:
+        logger.error(f"An error occurred while processing the file: {e!s}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred: {e!s}",
+        ) from e
+    finally:
+        await file.close()
+
+    return JSONResponse(
+        content={
+            "message": "File uploaded and processed successfully.",
+            "inserted": result.inserted,
+            "merged": result.merged,
+            "failed": result.failed_rows,
+        },
+        status_code=status.HTTP_200_OK,
+    )
+
+
+@router.get("/collections")
+async def list_collections() -> List[str]:
+    """
+    List the uploaded collections.
+
+    Returns:
+        List[str]: Names of the collections.
+    """
+    vector_store = VectorStore()
+    if not await vector_store.table_exists():
+        return []
+    return await vector_store.list_collections()
+
+
+@router.delete("/collections/{collection}")
+async def delete_collection(collection: str) -> JSONResponse:
+    """
+    Delete a collection with all its records.
+
+    Args:
+        collection (str): Name of the collection.
+
+    Returns:
+        JSONResponse: A message indicating success.
+
+    Raises:
+        HTTPException: If the collection does not exist.
+    """
+    if collection not in await list_collections():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Collection '{collection}' not found.",
+        )
+    await VectorStore().drop_collection(collection)
+    return JSONResponse(
+        content={"message": f"Collection '{collection}' deleted."},
+        status_code=status.HTTP_200_OK,
+    )
@@ -1,13 +1,22 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from app.utils.vector_store import COLLECTION_PATTERN, DEFAULT_COLLECTION
 
 
 class UserRequest(BaseModel):
     """request for generate response."""
 
     input_user: str
+    collection: str = Field(DEFAULT_COLLECTION, pattern=COLLECTION_PATTERN.pattern)
+    search_mode: Literal["flat", "hierarchical"] = "flat"
 
 
 class AccEval(BaseModel):
     """request file url for evaluate acc system."""
 
     path_url: str
+    collection: str = Field(DEFAULT_COLLECTION, pattern=COLLECTION_PATTERN.pattern)
+    # Search mode to evaluate, see VectorStore.search
+    search_mode: Literal["flat", "hierarchical"] = "flat"
@@ -1,24 +1,47 @@
 import asyncio
 import logging
+import math
 
-import pandas as pd
-from fastapi import HTTPException, status
+from fastapi import Depends, HTTPException, status
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
 
+from app.core.settings import settings
+from app.services.admission import admission, chat_admission, eval_admission
 from app.services.openai_util import get_chatbot_response
-from app.utils.doc_util import load_excel_url, relevant_doc
+from app.services.resilience import ProviderUnavailableError
+from app.utils.catalog_version import catalog_versions
+from app.utils.doc_util import load_excel_url, relevant_doc, retrieval_only_answer
+from app.utils.log_utils import SampledLogger
+from app.utils.priority import batch_priority
+from app.utils.singleflight import SingleFlight
+from app.utils.text_utils import normalize_query
 from app.utils.vector_store import VectorStore
 from app.web.api.gen_response.schemas import AccEval, UserRequest
 
-router = APIRouter()
-
+logger = logging.getLogger(__name__)
 
-@router.post("/gen_response")
+router = APIRouter()
+search_flight = SingleFlight("search")
+completion_flight = SingleFlight("completion")
+
+
+@router.post(
+    "/gen_response",
+    # All provider calls of the request share one time budget, which starts
+    # before the request waits for a slot
+    dependencies=[
+        Depends(admission(chat_admission, settings.request_budget_seconds)),
+    ],
+)
 async def generate_response(request: UserRequest) -> JSONResponse:
     """
     Generate a response based on user input using a chatbot and related documents.
 
+    While the completion provider is unavailable, the related documents are
+    returned alone and the response has the ``X-Degraded`` header. Requests
+    that cannot be served in time are rejected with a 503 before any work.
+
     Args:
         request (UserRequest): The user request containing the input text.
 
@@ -36,9 +59,26 @@ async def generate_response(request: UserRequest) -> JSONResponse:
         )
 
     vector_store = VectorStore()
+    headers = {}
     try:
+        # Identical requests in flight share the search and the completion
+        flight_key = (
+            request.collection,
+            catalog_versions.get(request.collection),
+            request.search_mode,
+            normalize_query(request.input_user),
+        )
+
         # Search for related documents asynchronously
-        related_docs = await vector_store.search(request.input_user, limit=10)
+        related_docs = await search_flight.do(
+            flight_key,
+            lambda: vector_store.search(
+                request.input_user,
+                limit=10,
+                collection=request.collection,
+                mode=request.search_mode,
+            ),
+        )
         if not related_docs:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -48,8 +88,17 @@ async def generate_response(request: UserRequest) -> JSONResponse:
         # Process the related documents
         docs = relevant_doc(related_docs)
 
-        # Generate chatbot response
-        result = get_chatbot_response(request.input_user, docs)
+        # Generate chatbot response, or answer with the search results
+        # alone while the completion provider is unavailable
+        try:
+            result = await completion_flight.do(
+                flight_key,
+                lambda: get_chatbot_response(request.input_user, docs),
+            )
+        except ProviderUnavailableError as e:
+            logger.warning(f"Answering with search results only: {e}")
+            result = retrieval_only_answer(related_docs)
+            headers["X-Degraded"] = "retrieval-only"
     except asyncio.CancelledError:
         logging.error("Request was cancelled.")
 
@@ -59,16 +108,33 @@ async def generate_response(request: UserRequest) -> JSONResponse:
         ) from None
     except HTTPException:
         raise
+    except ProviderUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"The LLM provider is unavailable: {e!s}",
+            headers=(
+                {"Retry-After": str(math.ceil(e.retry_after))}
+                if e.retry_after
+                else None
+            ),
+        ) from e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred while processing the request: {e!s}",
         ) from e
 
-    return JSONResponse(content=result, status_code=status.HTTP_200_OK)
+    return JSONResponse(
+        content=result,
+        status_code=status.HTTP_200_OK,
+        headers=headers,
+    )
 
 
-@router.post("/acc_eval")
+@router.post(
+    "/acc_eval",
+    dependencies=[Depends(batch_priority), Depends(admission(eval_admission))],
+)
 async def evaluate_acc(request: AccEval) -> JSONResponse:
     """
     Evaluate the accuracy of the Rag system based on the provided document URL.
@@ -94,7 +160,7 @@ async def evaluate_acc(request: AccEval) -> JSONResponse:
     # Load data from the provided URL
     try:
         logging.info(f"Loading data from {request.path_url}")
-        df = load_excel_url(request.path_url)
+        df = await load_excel_url(request.path_url)
     except ValueError as e:
         logging.error(f"Failed to load data from URL: {e!s}")
         raise HTTPException(
@@ -102,11 +168,15 @@ async def evaluate_acc(request: AccEval) -> JSONResponse:
             detail=f"Failed to load data from the provided URL: {e!s}",
         ) from e
 
+    import pandas as pd
+
     correct_predictions = 0 # the number of correct predictions
     total_predictions = 0 # total prediction
     vector_store = VectorStore()
 
     logging.info("Evaluating accuracy based on the Rag system's search results.")
+    skipped_rows = SampledLogger(logger)
+    failed_searches = SampledLogger(logger)
 
     # Iterate through the rows of the loaded dataframe
     for _, row in df.iterrows():
@@ -114,20 +184,38 @@ async def evaluate_acc(request: AccEval) -> JSONResponse:
         user_input = row.get("Tên SP")
 
         if pd.isna(user_input):
-            logging.warning(f"Skipping row {row.name} due to missing product name.")
+            skipped_rows.event(
+                logging.WARNING,
+                "Skipping row %s due to missing product name.",
+                row.name,
+            )
             continue
 
         # Skip rows with empty or invalid content in the "Danh mục cấp 4" column
         content_category = row.get("Danh mục cấp 4")
         if pd.isna(content_category) or not str(content_category).strip():
-            logging.info(f"Skipping row {row.name} due to empty 'Danh mục cấp 4'.")
+            skipped_rows.event(
+                logging.INFO,
+                "Skipping row %s due to empty 'Danh mục cấp 4'.",
+                row.name,
+            )
             continue
 
         try:
             # Perform the search in the vector store
-            result = await vector_store.search(user_input, limit=10)
+            result = await vector_store.search(
+                user_input,
+                limit=10,
+                collection=request.collection,
+                mode=request.search_mode,
+            )
         except Exception as e:
-            logging.error(f"Error searching for '{user_input}' in vector store: {e}")
+            failed_searches.event(
+                logging.ERROR,
+                "Error searching for '%s' in vector store: %s",
+                user_input,
+                e,
+            )
             continue
 
         total_predictions += 1
@@ -136,6 +224,11 @@ async def evaluate_acc(request: AccEval) -> JSONResponse:
         if content_category in str(result):
             correct_predictions += 1
 
+    logging.info(
+        f"Evaluated {total_predictions} rows, skipped {skipped_rows.count} rows, "
+        f"{failed_searches.count} searches failed.",
+    )
+
     # Calculate accuracy
     if total_predictions == 0:
         logging.warning("No valid rows found to evaluate.")
@@ -144,6 +237,10 @@ async def evaluate_acc(request: AccEval) -> JSONResponse:
         )
 
     accuracy = correct_predictions / total_predictions
-    logging.info(f"Evaluation completed. Accuracy: {accuracy:.4f}")
+    logging.info(
+        f"Evaluation completed. Accuracy ({request.search_mode}): {accuracy:.4f}",
+    )
 
-    return JSONResponse(content={"accuracy": accuracy})
+    return JSONResponse(
+        content={"accuracy": accuracy, "search_mode": request.search_mode},
+    )
@@ -0,0 +1,5 @@
+"""Prometheus metrics API."""
+
+from app.web.api.metrics.views import router
+
+__all__ = ["router"]
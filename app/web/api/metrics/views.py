@@ -0,0 +1,30 @@
+import os
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+router = APIRouter()
+
+
+@router.get("", response_class=Response)
+def export_metrics() -> Response:
+    """
+    Export metrics in the Prometheus text format.
+
+    When the application runs with several gunicorn workers, the metrics
+    of all workers are aggregated from the multiprocess directory.
+
+    :returns: metrics of the application.
+    """
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
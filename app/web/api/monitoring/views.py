@@ -1,4 +1,5 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
 
 router = APIRouter()
 
@@ -10,3 +11,21 @@ def health_check() -> None:
 
     It returns 200 if the project is healthy.
     """
+
+
+@router.get("/ready")
+def readiness_check(request: Request) -> JSONResponse:
+    """
+    Checks if the worker is ready to serve traffic.
+
+    It returns 503 until the startup warm-up is done.
+
+    :param request: current request.
+    :returns: readiness of the worker.
+    """
+    if getattr(request.app.state, "ready", False):
+        return JSONResponse(content={"ready": True})
+    return JSONResponse(
+        content={"ready": False},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -1,11 +1,31 @@
 
+from fastapi import Depends
 from fastapi.routing import APIRouter
 
-from app.web.api import echo, file_upload, gen_response, monitoring
+from app.web.api import (
+    admin,
+    bulk_search,
+    echo,
+    file_upload,
+    gen_response,
+    metrics,
+    monitoring,
+    suggest,
+)
+from app.web.api.admin.dependencies import verify_admin_token
 
 api_router = APIRouter()
 api_router.include_router(monitoring.router, prefix="/monitoring", tags=["monitoring"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["monitoring"])
 api_router.include_router(echo.router, prefix="/echo", tags=["echo"])
 api_router.include_router(gen_response.router,prefix="/generate_text"
                           ,tags = ["gen_text"])
 api_router.include_router(file_upload.router,prefix="/upload_data",tags=["upload"])
+api_router.include_router(suggest.router, prefix="/suggest", tags=["suggest"])
+api_router.include_router(bulk_search.router, prefix="/bulk_search", tags=["bulk"])
+api_router.include_router(
+    admin.router,
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(verify_admin_token)],
+)
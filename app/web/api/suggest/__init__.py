@@ -0,0 +1,5 @@
+"""Typeahead API."""
+
+from app.web.api.suggest.views import router
+
+__all__ = ["router"]
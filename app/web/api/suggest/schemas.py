@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class SuggestionItem(BaseModel):
+    """A suggested product or category."""
+
+    text: str
+    # Level in the category tree, products are the last level
+    level: int
@@ -0,0 +1,30 @@
+from typing import List
+
+from fastapi import APIRouter, Query
+
+from app.utils.suggest import suggester
+from app.utils.vector_store import COLLECTION_PATTERN, DEFAULT_COLLECTION
+from app.web.api.suggest.schemas import SuggestionItem
+
+router = APIRouter()
+
+
+@router.get("", response_model=List[SuggestionItem])
+async def suggest(
+    q: str = Query(..., max_length=100, description="Text typed so far."),
+    collection: str = Query(DEFAULT_COLLECTION, pattern=COLLECTION_PATTERN.pattern),
+    limit: int = Query(10, ge=1, le=50),
+) -> List[SuggestionItem]:
+    """
+    Suggest products and categories for a search box, as the user types.
+
+    Matches are served from an in-memory index, without embedding or LLM
+    calls. Matching ignores case and diacritics and tolerates typos.
+
+    :param q: text typed so far.
+    :param collection: collection to suggest from.
+    :param limit: maximum number of suggestions.
+    :returns: suggestions, best first.
+    """
+    suggestions = await suggester.suggest(q, collection, limit)
+    return [SuggestionItem(text=item.text, level=item.level) for item in suggestions]
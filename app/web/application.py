@@ -9,12 +9,13 @@ from fastapi.staticfiles import StaticFiles
 from app.config.logger_setup import LoggerSetup
 from app.core.settings import settings
 from app.utils.log_utils import configure_logging
+from app.utils.profiler import ProfilerMiddleware
+from app.utils.timing import ServerTimingMiddleware
 from app.web.api.router import api_router
 from app.web.lifespan import lifespan_setup
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # Lấy thư mục gốc của dự án  # noqa: PTH120
 LOGGING_CONFIG_PATH = os.path.join(BASE_DIR, "config", "logging_config.yaml")  # noqa: PTH118
-LoggerSetup.setup_logging(config_path=LOGGING_CONFIG_PATH)
 
 # Khởi tạo logger
 logger = logging.getLogger("app")
@@ -25,8 +26,11 @@ def get_app() -> FastAPI:
 
     This is the main constructor of an application.
 
+    Logging is configured here rather than on import, once per process.
+
     :return: application.
     """
+    LoggerSetup.setup_logging(config_path=LOGGING_CONFIG_PATH)
     configure_logging()
     app = FastAPI(
         title=settings.title,
@@ -59,6 +63,10 @@ def get_app() -> FastAPI:
         allow_headers=["*"],  # Allow all headers
         expose_headers=["*"],  # Allow specific headers to be exposed
     )
+    # Report per-stage latency of every request in the Server-Timing header
+    app.add_middleware(ServerTimingMiddleware)
+    # Count requests in the profiles recorded through the admin API
+    app.add_middleware(ProfilerMiddleware)
 
     # Mount some static files
     app.mount(
@@ -67,9 +75,14 @@ def get_app() -> FastAPI:
         name="media",
     )
     return app
-app = get_app()
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=5000, reload=True)  # noqa: S104
+    uvicorn.run(
+        "app.web.application:get_app",
+        factory=True,
+        host="0.0.0.0",  # noqa: S104
+        port=5000,
+        reload=True,
+    )
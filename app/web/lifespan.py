@@ -1,12 +1,40 @@
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 from typing import AsyncGenerator
 
 from fastapi import FastAPI
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from app.core.settings import settings
-from app.db.meta import meta
-from app.db.models import load_all_models
+from app.db.catalog_bus import catalog_bus
+from app.db.replicas import replica_router
+from app.db.search_pool import search_pool
+from app.db.session import engine as vector_store_engine
+from app.db.shards import shard_router
+from app.services.embedders import get_embedder
+from app.services.metrics import WORKER_MEMORY, WORKER_STARTUP
+from app.services.openai_client import provider_session
+from app.services.sheet_fetcher import sheet_fetcher
+from app.utils.catalog_version import catalog_versions
+from app.utils.embedding_cache import embedding_cache
+from app.utils.loop_monitor import loop_monitor
+from app.utils.process_stats import memory_usage, worker_uptime
+from app.utils.suggest import suggester
+from app.utils.vector_store import DEFAULT_COLLECTION, VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Loads the leaf tables of `records` and their indexes into shared buffers.
+PREWARM_QUERY = """
+SELECT pg_prewarm(relation) FROM (
+    SELECT relid AS relation FROM pg_partition_tree('records') WHERE isleaf
+    UNION ALL
+    SELECT i.indexrelid::regclass FROM pg_index AS i
+    JOIN pg_partition_tree('records') AS t ON i.indrelid = t.relid AND t.isleaf
+) AS relations
+"""
 
 
 def _setup_db(app: FastAPI) -> None:  # pragma: no cover
@@ -28,13 +56,87 @@ def _setup_db(app: FastAPI) -> None:  # pragma: no cover
     app.state.db_session_factory = session_factory
 
 
-async def _create_tables() -> None:  # pragma: no cover
-    """Populates tables in the database."""
-    load_all_models()
-    engine = create_async_engine(str(settings.db_url))
-    async with engine.begin() as connection:
-        await connection.run_sync(meta.create_all)
-    await engine.dispose()
+async def _warm_db_pool() -> None:  # pragma: no cover
+    """Open all connections of the pools used by the vector store."""
+
+    async def _ping() -> None:
+        async with vector_store_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(_ping() for _ in range(vector_store_engine.pool.size())))
+    # Its connections are opened when it is created.
+    await search_pool.get()
+
+
+async def _prewarm_records() -> None:  # pragma: no cover
+    """Load the records table and its vector index into Postgres memory."""
+    async with vector_store_engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_prewarm"))
+        result = await conn.execute(text(PREWARM_QUERY))
+        blocks = sum(row[0] for row in result)
+    logger.info(f"Prewarmed {blocks} blocks of the records table and indexes.")
+
+
+async def _warm_embedder() -> None:  # pragma: no cover
+    """Prepare the embedding backend before the first request."""
+    await get_embedder().warm_up()
+
+
+async def _warm_suggest_index() -> None:  # pragma: no cover
+    """Build the typeahead index of the default collection."""
+    await suggester.get(DEFAULT_COLLECTION)
+
+
+def _report_worker_startup() -> None:  # pragma: no cover
+    """Export the startup time and memory usage of the worker."""
+    uptime = worker_uptime()
+    if uptime is not None:
+        WORKER_STARTUP.set(uptime)
+    usage = memory_usage()
+    for kind, value in usage.items():
+        WORKER_MEMORY.labels(kind=kind).set(value)
+    logger.info(
+        f"Worker ready in {uptime or 0:.2f}s, "
+        f"RSS {usage.get('rss', 0) / 2**20:.0f} MiB, "
+        f"PSS {usage.get('pss', 0) / 2**20:.0f} MiB.",
+    )
+
+
+async def _warm_up(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Warm up the worker and mark it as ready.
+
+    The database pool must be opened for the worker to be ready,
+    other steps are best effort.
+
+    :param app: fastAPI application.
+    """
+    loaded = embedding_cache.load_snapshot(
+        settings.embedding_cache_dir,
+        get_embedder().model_id,
+        settings.embedding_cache_preload,
+    )
+    logger.info(f"Preloaded {loaded} embeddings into the embedding cache.")
+
+    delay = 1.0
+    while True:
+        try:
+            await _warm_db_pool()
+            break
+        except Exception as e:
+            logger.warning(f"Database is not reachable yet: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    for step in (_prewarm_records, _warm_embedder, _warm_suggest_index):
+        try:
+            await step()
+        except Exception as e:
+            logger.warning(f"Warm-up step {step.__name__} failed: {e}")
+
+    app.state.ready = True
+    _report_worker_startup()
+    logger.info("Warm-up finished, the worker is ready.")
 
 
 @asynccontextmanager
@@ -52,9 +154,39 @@ async def lifespan_setup(
     """
 
     app.middleware_stack = None
+    app.state.ready = False
     _setup_db(app)
-    await _create_tables()
     app.middleware_stack = app.build_middleware_stack()
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+    replica_router.start(settings.replica_poll_interval)
+    # Caches of the worker follow the catalog changes of every worker.
+    catalog_versions.subscribe(suggester.catalog_changed)
+    catalog_versions.subscribe(VectorStore().sync_centroids)
+    catalog_bus.start()
+    # All provider calls of the worker share one pool of connections.
+    provider_session.get()
+
+    if settings.warm_up_enabled:
+        app.state.warm_up_task = asyncio.create_task(_warm_up(app))
+    else:
+        app.state.ready = True
 
     yield
+    await loop_monitor.stop()
+    if settings.warm_up_enabled:
+        app.state.warm_up_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await app.state.warm_up_task
+    embedding_cache.save_snapshot(
+        settings.embedding_cache_dir,
+        get_embedder().model_id,
+    )
+    await get_embedder().aclose()
+    await provider_session.aclose()
+    await search_pool.close()
+    await replica_router.close()
+    await shard_router.close()
+    await catalog_bus.close()
+    await sheet_fetcher.aclose()
     await app.state.db_engine.dispose()
@@ -0,0 +1,136 @@
+"""
+Search benchmark: ORM path against the asyncpg fast path.
+
+Usage::
+
+    python -m benchmarks.search_path --collection default --queries 200
+
+Queries are embeddings of random records of the collection, so no
+embedding request is made. Each path is timed over the same queries,
+then run again under tracemalloc to measure the memory allocated per query.
+It needs a reachable database with a loaded collection.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+from typing import Awaitable, Callable, Dict, List
+
+from app.db.search_pool import search_pool
+from app.db.session import engine
+from app.utils.vector_store import VectorStore, partition_name
+
+SearchPath = Callable[[List[float]], Awaitable[List[dict]]]
+
+
+async def sample_queries(
+    vector_store: VectorStore,
+    collection: str,
+    count: int,
+) -> List[List[float]]:
+    """
+    Pick embeddings of random records as queries.
+
+    Args:
+        vector_store (VectorStore): The vector store.
+        collection (str): Name of the collection.
+        count (int): Number of queries.
+
+    Returns:
+        List[List[float]]: The query embeddings.
+    """
+    async with vector_store.raw_connection() as conn:
+        rows = await conn.fetch(
+            f"SELECT embedding FROM {partition_name(collection)} "  # noqa: S608
+            "ORDER BY random() LIMIT $1",
+            count,
+        )
+    return [row["embedding"].tolist() for row in rows]
+
+
+async def measure(search: SearchPath, queries: List[List[float]]) -> Dict[str, float]:
+    """
+    Time a search path, then measure its allocations.
+
+    Args:
+        search (SearchPath): Runs one search.
+        queries (List[List[float]]): Query embeddings.
+
+    Returns:
+        Dict[str, float]: Latency percentiles in ms and mean peak KiB.
+    """
+    # Warm up statement caches and connections.
+    for query in queries[:10]:
+        await search(query)
+
+    durations = []
+    for query in queries:
+        start = time.perf_counter()
+        await search(query)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    peaks = []
+    tracemalloc.start()
+    for query in queries:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await search(query)
+        peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    tracemalloc.stop()
+
+    quantiles = statistics.quantiles(durations, n=100)
+    return {
+        "mean": statistics.fmean(durations),
+        "p50": quantiles[49],
+        "p95": quantiles[94],
+        "peak_kib": statistics.fmean(peaks),
+    }
+
+
+async def run(collection: str, count: int, limit: int) -> None:
+    """
+    Compare the search paths on a collection.
+
+    Args:
+        collection (str): Name of the collection.
+        count (int): Number of queries.
+        limit (int): Hits per query.
+    """
+    vector_store = VectorStore()
+    queries = await sample_queries(vector_store, collection, count)
+    paths: Dict[str, SearchPath] = {
+        "orm": lambda query: vector_store._search_orm(  # noqa: SLF001
+            query, limit, None, collection, None,
+        ),
+        "fast": lambda query: vector_store._search_fast(  # noqa: SLF001
+            query, limit, None, collection, None,
+        ),
+    }
+    try:
+        print(f"{len(queries)} queries, {limit} hits each, on '{collection}'")
+        print(f"{'path':6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>10}")
+        for name, search in paths.items():
+            result = await measure(search, queries)
+            print(
+                f"{name:6} {result['mean']:9.2f} {result['p50']:9.2f} "
+                f"{result['p95']:9.2f} {result['peak_kib']:10.1f}",
+            )
+    finally:
+        await search_pool.close()
+        await engine.dispose()
+
+
+def main() -> None:
+    """Run the search benchmark."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.search_path")
+    parser.add_argument("--collection", default="default")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.collection, args.queries, args.limit))
+
+
+if __name__ == "__main__":
+    main()
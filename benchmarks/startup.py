@@ -0,0 +1,157 @@
+"""
+Startup benchmark: import time of the application and cold start.
+
+Usage::
+
+    python -m benchmarks.startup imports
+    python -m benchmarks.startup cold-start
+
+``imports`` profiles ``import app.web.application`` with ``-X importtime``
+in a fresh interpreter. ``cold-start`` starts the server and measures the
+time until ``/api/monitoring/health`` first answers 200, it needs a reachable
+database.
+Each run fails when its target is exceeded.
+"""
+
+import argparse
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+import httpx
+
+# Seconds to import the application, without building it
+IMPORT_TARGET = 1.5
+# Seconds from starting the server to the first served request
+FIRST_REQUEST_TARGET = 5.0
+# Modules that must not be imported to serve queries
+LAZY_MODULES = ("pandas", "pyarrow", "openai", "sentence_transformers")
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def profile_imports(module: str) -> List[Tuple[str, int, int]]:
+    """
+    Import a module in a fresh interpreter with ``-X importtime``.
+
+    Args:
+        module (str): The imported module.
+
+    Returns:
+        List[Tuple[str, int, int]]: Name, nesting level and cumulative
+            microseconds of every import, in the order they finished.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            level = len(match.group(3)) // 2
+            imports.append((match.group(4), level, int(match.group(2))))
+    return imports
+
+
+def run_imports(top: int) -> bool:
+    """
+    Report the import time of the application against its target.
+
+    Args:
+        top (int): Number of the slowest imports to list.
+
+    Returns:
+        bool: Whether the target is met and no lazy module was imported.
+    """
+    module = "app.web.application"
+    imports = profile_imports(module)
+    total = next(us for name, _, us in imports if name == module) / 1e6
+    # Modules imported directly by the application's own modules. Imports
+    # are listed once finished, so a parent comes after its children.
+    dependencies = {}
+    parents = {}
+    for name, level, us in reversed(imports):
+        parents[level] = name
+        parent = parents.get(level - 1, "")
+        if level and parent.startswith("app") and not name.startswith("app"):
+            dependencies[name] = us
+    print(f"Slowest dependencies of {module}:")
+    for name, us in sorted(dependencies.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {us / 1e3:8.1f} ms  {name}")
+    print(f"Total: {total:.2f}s (target {IMPORT_TARGET:.2f}s)")
+
+    imported = {name.split(".")[0] for name, _, _ in imports}
+    eager = [name for name in LAZY_MODULES if name in imported]
+    if eager:
+        print(f"Imported eagerly: {', '.join(eager)}")
+    return total <= IMPORT_TARGET and not eager
+
+
+def run_cold_start(url: str, timeout: float) -> bool:
+    """
+    Start the server and wait for its first successful response.
+
+    Args:
+        url (str): URL polled until it answers 200.
+        timeout (float): Seconds to wait before giving up.
+
+    Returns:
+        bool: Whether the first request was served within the target.
+    """
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app"],
+        start_new_session=True,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while (elapsed := time.perf_counter() - start) < timeout:
+                if server.poll() is not None:
+                    print(f"The server exited with code {server.returncode}.")
+                    return False
+                try:
+                    if client.get(url).status_code == httpx.codes.OK:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+            else:
+                print(f"No response from {url} within {timeout:.0f}s.")
+                return False
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+    print(
+        f"First request served after {elapsed:.2f}s "
+        f"(target {FIRST_REQUEST_TARGET:.2f}s)",
+    )
+    return elapsed <= FIRST_REQUEST_TARGET
+
+
+def main() -> None:
+    """Run a startup benchmark."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    commands = parser.add_subparsers(dest="command", required=True)
+    imports = commands.add_parser("imports", help="Profile the application imports.")
+    imports.add_argument("--top", type=int, default=15)
+    cold_start = commands.add_parser("cold-start", help="Time the first request.")
+    cold_start.add_argument("--url", default="http://127.0.0.1:8000/api/monitoring/health")
+    cold_start.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    if args.command == "imports":
+        passed = run_imports(args.top)
+    else:
+        passed = run_cold_start(args.url, args.timeout)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
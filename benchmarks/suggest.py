@@ -0,0 +1,96 @@
+"""
+Typeahead benchmark: latency of ``/api/suggest`` lookups.
+
+Usage::
+
+    python -m benchmarks.suggest --collection default --queries 2000
+
+Builds the suggest index of a collection, then looks up prefixes of its
+products as a user would type them, with a typo in every fourth query.
+The run fails when the p99 exceeds its target. It needs a reachable
+database with a loaded collection.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+from app.db.search_pool import search_pool
+from app.utils.suggest import SuggestIndex, load_suggestions
+
+# Milliseconds of the 99th percentile lookup
+P99_TARGET = 10.0
+
+
+def typed_queries(index: SuggestIndex, count: int) -> List[str]:
+    """
+    Make partial queries from random texts of the index.
+
+    Args:
+        index (SuggestIndex): The index.
+        count (int): Number of queries.
+
+    Returns:
+        List[str]: The queries.
+    """
+    rng = random.Random(0)  # noqa: S311
+    queries = []
+    for number in range(count):
+        text = rng.choice(index.suggestions).text
+        query = text[: rng.randint(1, len(text))]
+        if number % 4 == 0 and len(query) > 3:
+            position = rng.randrange(len(query))
+            query = query[:position] + "x" + query[position + 1 :]
+        queries.append(query)
+    return queries
+
+
+async def run(collection: str, count: int, limit: int) -> bool:
+    """
+    Time the lookups of a collection against the target.
+
+    Args:
+        collection (str): Name of the collection.
+        count (int): Number of queries.
+        limit (int): Suggestions per query.
+
+    Returns:
+        bool: Whether the p99 is within the target.
+    """
+    try:
+        suggestions = await load_suggestions(collection)
+    finally:
+        await search_pool.close()
+    start = time.perf_counter()
+    index = SuggestIndex(suggestions)
+    print(f"Indexed {len(index)} texts in {time.perf_counter() - start:.2f}s")
+
+    durations = []
+    for query in typed_queries(index, count):
+        start = time.perf_counter()
+        index.search(query, limit)
+        durations.append((time.perf_counter() - start) * 1000)
+    quantiles = statistics.quantiles(durations, n=100)
+    print(
+        f"{count} lookups: p50 {quantiles[49]:.3f} ms, p99 {quantiles[98]:.3f} ms, "
+        f"max {max(durations):.3f} ms (target p99 {P99_TARGET:.1f} ms)",
+    )
+    return quantiles[98] <= P99_TARGET
+
+
+def main() -> None:
+    """Run the typeahead benchmark."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suggest")
+    parser.add_argument("--collection", default="default")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.collection, args.queries, args.limit)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejectedError
+from app.services.resilience import request_deadline
+from app.utils.priority import Priority
+
+
+@pytest.mark.anyio
+async def test_full_queue_sheds_new_requests() -> None:
+    """Checks that requests beyond the limit and the queue are rejected."""
+    controller = AdmissionController("test", limit=1, queue_size=1)
+    admitted_at = await controller.acquire(Priority.INTERACTIVE)
+    waiter = asyncio.create_task(controller.acquire(Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        await controller.acquire(Priority.INTERACTIVE)
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= 1
+
+    controller.release(admitted_at)
+    controller.release(await waiter)
+    assert controller.active == 0
+
+
+@pytest.mark.anyio
+async def test_interactive_requests_go_first() -> None:
+    """Checks that interactive waiters are admitted before batch ones."""
+    controller = AdmissionController("test", limit=1, queue_size=2)
+    admitted_at = await controller.acquire(Priority.INTERACTIVE)
+    order = []
+
+    async def wait(priority: Priority) -> None:
+        admitted = await controller.acquire(priority)
+        order.append(priority)
+        controller.release(admitted)
+
+    batch = asyncio.create_task(wait(Priority.BATCH))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(wait(Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    controller.release(admitted_at)
+    await asyncio.gather(batch, interactive)
+
+    assert order == [Priority.INTERACTIVE, Priority.BATCH]
+
+
+@pytest.mark.anyio
+async def test_interactive_requests_preempt_batch_waiters() -> None:
+    """Checks that a full queue sheds batch waiters for interactive ones."""
+    controller = AdmissionController("test", limit=1, queue_size=1)
+    admitted_at = await controller.acquire(Priority.INTERACTIVE)
+    batch = asyncio.create_task(controller.acquire(Priority.BATCH))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(controller.acquire(Priority.INTERACTIVE))
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        await batch
+    assert rejected.value.reason == "preempted"
+
+    controller.release(admitted_at)
+    controller.release(await interactive)
+    assert controller.active == 0
+
+
+@pytest.mark.anyio
+async def test_requests_are_shed_at_their_deadline() -> None:
+    """Checks that waiting stops at the request deadline and frees the queue."""
+    controller = AdmissionController("test", limit=1, queue_size=4)
+    admitted_at = await controller.acquire(Priority.INTERACTIVE)
+
+    with request_deadline(0.01), pytest.raises(AdmissionRejectedError) as rejected:
+        await controller.acquire(Priority.INTERACTIVE, timeout=10.0)
+    assert rejected.value.reason == "deadline"
+    assert controller.waiting == 0
+
+    controller.release(admitted_at)
+    assert controller.active == 0
+
+
+@pytest.mark.anyio
+async def test_batch_requests_defer_to_interactive_ones() -> None:
+    """Checks that batch work does not start while chat requests wait."""
+    chat = AdmissionController("chat", limit=1, queue_size=1)
+    batch = AdmissionController("batch", limit=1, queue_size=1, defer_to=chat)
+    admitted_at = await chat.acquire(Priority.INTERACTIVE)
+    waiter = asyncio.create_task(chat.acquire(Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejectedError):
+        await batch.acquire(Priority.BATCH, timeout=0.01)
+    assert batch.active == 0
+
+    chat.release(admitted_at)
+    chat.release(await waiter)
+    batch.release(await batch.acquire(Priority.BATCH))
+
+
+@pytest.mark.anyio
+async def test_deferred_batch_requests_start_when_chat_drains() -> None:
+    """Checks that a deferred batch request starts once no chat request waits."""
+    chat = AdmissionController("chat", limit=1, queue_size=1)
+    batch = AdmissionController("batch", limit=1, queue_size=1, defer_to=chat)
+    admitted_at = await chat.acquire(Priority.INTERACTIVE)
+    waiter = asyncio.create_task(chat.acquire(Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    deferred = asyncio.create_task(batch.acquire(Priority.BATCH, timeout=5))
+    await asyncio.sleep(0)
+    assert (batch.active, batch.waiting) == (0, 1)
+
+    chat.release(admitted_at)
+    batch_admitted_at = await asyncio.wait_for(deferred, 1)
+    assert batch.active == 1
+
+    chat.release(await waiter)
+    batch.release(batch_admitted_at)
+    assert (chat.active, batch.active) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_released_batch_slots_are_not_handed_over_while_chat_waits() -> None:
+    """Checks that queued batch requests stay behind waiting chat requests."""
+    chat = AdmissionController("chat", limit=1, queue_size=1)
+    batch = AdmissionController("batch", limit=1, queue_size=1, defer_to=chat)
+    batch_admitted_at = await batch.acquire(Priority.BATCH)
+    queued = asyncio.create_task(batch.acquire(Priority.BATCH, timeout=5))
+    await asyncio.sleep(0)
+    admitted_at = await chat.acquire(Priority.INTERACTIVE)
+    waiter = asyncio.create_task(chat.acquire(Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+
+    batch.release(batch_admitted_at)
+    await asyncio.sleep(0)
+    assert (batch.active, batch.waiting) == (0, 1)
+
+    chat.release(admitted_at)
+    batch.release(await asyncio.wait_for(queued, 1))
+    chat.release(await waiter)
+    assert (chat.active, batch.active) == (0, 0)
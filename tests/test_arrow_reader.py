@@ -0,0 +1,54 @@
+import io
+from typing import Callable
+
+import pyarrow as pa
+import pytest
+from openpyxl import Workbook
+from pyarrow import parquet
+
+from app.utils.arrow_reader import file_format, iter_record_batches
+
+ROWS = {"Danh mục cấp 4": [f"Lốp {index}" for index in range(5)]}
+
+
+def _csv() -> io.BytesIO:
+    lines = ["Danh mục cấp 4", *ROWS["Danh mục cấp 4"]]
+    return io.BytesIO("\n".join(lines).encode())
+
+
+def _xlsx() -> io.BytesIO:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Danh mục cấp 4"])
+    for content in ROWS["Danh mục cấp 4"]:
+        sheet.append([content])
+    source = io.BytesIO()
+    workbook.save(source)
+    source.seek(0)
+    return source
+
+
+def _parquet() -> io.BytesIO:
+    source = io.BytesIO()
+    parquet.write_table(pa.Table.from_pydict(ROWS), source)
+    source.seek(0)
+    return source
+
+
+@pytest.mark.parametrize(
+    ("fmt", "source"),
+    [("csv", _csv), ("xlsx", _xlsx), ("parquet", _parquet)],
+)
+def test_files_are_read_in_batches(fmt: str, source: Callable[[], io.BytesIO]) -> None:
+    """Checks that every format is read in batches of at most batch_size rows."""
+    batches = list(iter_record_batches(source(), fmt, batch_size=2))
+
+    assert [batch.num_rows for batch in batches] == [2, 2, 1]
+    assert pa.Table.from_batches(batches).to_pydict() == ROWS
+
+
+def test_unsupported_formats_are_rejected() -> None:
+    """Checks that the format is taken from the file name."""
+    assert file_format("catalog.XLSX") == "xlsx"
+    with pytest.raises(ValueError, match="Unsupported file format 'xls'"):
+        file_format("catalog.xls")
@@ -0,0 +1,97 @@
+import asyncio
+from typing import Any, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pytest
+
+from app.utils.bulk_search import bulk_search, iter_queries
+
+
+class FakeVectorStore:
+    """Vector store embedding texts as their length, and failing on "boom"."""
+
+    def __init__(self) -> None:
+        self.embedded: List[List[str]] = []
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts as their length."""
+        self.embedded.append(texts)
+        return [[float(len(text))] for text in texts]
+
+    async def search_by_embedding(self, embedding: List[float], **_: Any) -> List[dict]:
+        """Find one record per embedding."""
+        if embedding == [4.0]:
+            raise RuntimeError("boom")
+        return [{"content": f"match {embedding[0]:.0f}"}]
+
+
+def test_iter_queries_numbers_rows() -> None:
+    """Checks that rows are numbered across record batches and re-sliced."""
+    batches = [
+        pa.RecordBatch.from_pydict({"q": [" a ", None, "bb"]}),
+        pa.RecordBatch.from_pydict({"q": ["", "ccc"]}),
+    ]
+
+    rows = list(iter_queries(iter(batches), "q", 2))
+
+    assert rows == [
+        [(1, "a"), (2, None)],
+        [(3, "bb")],
+        [(4, None), (5, "ccc")],
+    ]
+    with pytest.raises(ValueError, match="column 'x'"):
+        list(iter_queries(iter(batches), "x", 2))
+
+
+@pytest.mark.anyio
+async def test_bulk_search_streams_rows_in_order() -> None:
+    """Checks the results, errors and summary of a bulk search."""
+    vector_store = FakeVectorStore()
+    batches = iter([[(1, "a"), (2, None), (3, "boom")], [(4, "bb")]])
+
+    lines = [
+        line
+        async for line in bulk_search(batches, vector_store, collection="default")
+    ]
+
+    assert lines == [
+        {"row": 1, "query": "a", "results": [{"content": "match 1"}]},
+        {"row": 2, "query": None, "results": []},
+        {"row": 3, "query": "boom", "error": "boom"},
+        {"row": 4, "query": "bb", "results": [{"content": "match 2"}]},
+        {"summary": {"rows": 4, "failed": 1}},
+    ]
+    assert vector_store.embedded == [["a", "boom"], ["bb"]]
+
+
+@pytest.mark.anyio
+async def test_bulk_search_raises_reading_errors() -> None:
+    """Checks that an error reading the file ends the search instead of hanging."""
+
+    def batches() -> Iterator[List[Tuple[int, Optional[str]]]]:
+        yield [(1, "a")]
+        raise ValueError("Input data must contain the column 'q'.")
+
+    lines = []
+
+    async def consume() -> None:
+        async for line in bulk_search(batches(), FakeVectorStore(), "default"):
+            lines.append(line)
+
+    with pytest.raises(ValueError, match="column 'q'"):
+        await asyncio.wait_for(consume(), timeout=5)
+
+    assert lines == [{"row": 1, "query": "a", "results": [{"content": "match 1"}]}]
+
+
+@pytest.mark.anyio
+async def test_bulk_search_rejects_unknown_mode() -> None:
+    """Checks that the search mode is validated before the file is read."""
+    with pytest.raises(ValueError, match="Unknown search mode"):
+        async for _ in bulk_search(
+            iter([]),
+            FakeVectorStore(),
+            collection="default",
+            mode="fuzzy",
+        ):
+            pass
@@ -0,0 +1,49 @@
+import asyncio
+import json
+from dataclasses import asdict
+from typing import List
+
+import pytest
+
+from app.core.settings import settings
+from app.db.catalog_bus import CatalogBus
+from app.utils.catalog_version import CatalogChange, CatalogVersions
+
+
+@pytest.mark.anyio
+async def test_only_newer_versions_are_applied() -> None:
+    """Checks that subscribers see each new version once, despite failures."""
+    versions = CatalogVersions()
+    seen: List[CatalogChange] = []
+
+    async def record(change: CatalogChange) -> None:
+        seen.append(change)
+
+    async def fail(_: CatalogChange) -> None:
+        raise RuntimeError("cache unavailable")
+
+    versions.subscribe(fail)
+    versions.subscribe(record)
+
+    assert await versions.apply(CatalogChange("brand_a", 2))
+    assert not await versions.apply(CatalogChange("brand_a", 2))
+    assert not await versions.apply(CatalogChange("brand_a", 1))
+    assert await versions.apply(CatalogChange("brand_b", 1), notify=False)
+
+    assert versions.get("brand_a") == 2
+    assert versions.get("brand_b") == 1
+    assert seen == [CatalogChange("brand_a", 2)]
+
+
+@pytest.mark.anyio
+async def test_notifications_update_the_versions() -> None:
+    """Checks that a notification payload is applied to the versions."""
+    versions = CatalogVersions()
+    bus = CatalogBus(settings.db_url, versions, poll_interval=30.0)
+    change = CatalogChange("brand_a", 3, None, "other-host", 1.0)
+
+    bus._on_notification(None, 1, "catalog_changed", json.dumps(asdict(change)))  # noqa: SLF001
+    bus._on_notification(None, 1, "catalog_changed", "not json")  # noqa: SLF001
+    await asyncio.sleep(0)
+
+    assert versions.get("brand_a") == 3
@@ -0,0 +1,106 @@
+import uuid
+from typing import List, Optional
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.utils.vector_store import STAGING_PREFIX, VectorStore
+
+
+async def _load(
+    vector_store: VectorStore,
+    collection: str,
+    contents: List[str],
+    metadata: Optional[List[dict]] = None,
+) -> None:
+    embeddings = await vector_store.get_embeddings(contents)
+    metadata = metadata or [{} for _ in contents]
+    async with vector_store.replace_collection(collection) as staging:
+        await vector_store.insert(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "metadata": row_metadata,
+                    "contents": content,
+                    "embedding": embedding,
+                }
+                for content, row_metadata, embedding in zip(
+                    contents, metadata, embeddings,
+                )
+            ],
+            collection=collection,
+            table=staging,
+        )
+
+
+async def _contents(vector_store: VectorStore, collection: str) -> List[str]:
+    hits = await vector_store.search("phanh", limit=10, collection=collection)
+    return sorted(hit["contents"] for hit in hits)
+
+
+@pytest.mark.anyio
+async def test_replace_swaps_only_its_collection(_engine: AsyncEngine) -> None:
+    """Checks that a new version replaces its collection, not the others."""
+    vector_store = VectorStore()
+    await vector_store.create_tables()
+    await _load(vector_store, "brand_a", ["Má phanh", "Dầu phanh"])
+    await _load(vector_store, "brand_b", ["Đèn pha"])
+
+    await _load(vector_store, "brand_a", ["Phanh đĩa"])
+
+    assert await _contents(vector_store, "brand_a") == ["Phanh đĩa"]
+    assert await _contents(vector_store, "brand_b") == ["Đèn pha"]
+    assert {"brand_a", "brand_b"} <= set(await vector_store.list_collections())
+
+
+@pytest.mark.anyio
+async def test_failed_replace_keeps_the_collection(_engine: AsyncEngine) -> None:
+    """Checks that an error while loading drops the staging table only."""
+    vector_store = VectorStore()
+    await vector_store.create_tables()
+    await _load(vector_store, "brand_c", ["Má phanh"])
+
+    with pytest.raises(RuntimeError):
+        async with vector_store.replace_collection("brand_c"):
+            raise RuntimeError("provider down")
+
+    assert await _contents(vector_store, "brand_c") == ["Má phanh"]
+    async with _engine.connect() as conn:
+        staging = await conn.scalar(
+            text("SELECT count(*) FROM pg_tables WHERE tablename LIKE :prefix"),
+            {"prefix": f"{STAGING_PREFIX}%"},
+        )
+    assert staging == 0
+
+
+@pytest.mark.anyio
+async def test_dropped_collection_is_not_listed(_engine: AsyncEngine) -> None:
+    """Checks that dropping a collection removes its records."""
+    vector_store = VectorStore()
+    await vector_store.create_tables()
+    await _load(vector_store, "brand_d", ["Má phanh"])
+
+    await vector_store.drop_collection("brand_d")
+
+    assert "brand_d" not in await vector_store.list_collections()
+
+
+@pytest.mark.anyio
+async def test_delete_by_metadata(_engine: AsyncEngine) -> None:
+    """Checks that records are deleted by a metadata value."""
+    vector_store = VectorStore()
+    await vector_store.create_tables()
+    await _load(
+        vector_store,
+        "brand_e",
+        ["Má phanh", "Đèn pha"],
+        [{"Danh mục cấp 1": "Phanh"}, {"Danh mục cấp 1": "Đèn"}],
+    )
+
+    await vector_store.delete(
+        metadata_filter={"Danh mục cấp 1": "Phanh"},
+        collection="brand_e",
+    )
+
+    assert await _contents(vector_store, "brand_e") == ["Đèn pha"]
@@ -0,0 +1,113 @@
+from typing import Any, List
+
+import pyarrow as pa
+import pytest
+
+from app.utils.dedup import Deduplicator
+from app.utils.doc_util import clean_batch, ingest_batches
+
+
+class FailingVectorStore:
+    """Vector store failing to embed the first batch."""
+
+    def __init__(self) -> None:
+        self.inserted: List[dict] = []
+        self.updates: List[dict] = []
+        self.calls = 0
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts as their length, after failing once."""
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("provider down")
+        return [[float(len(text))] for text in texts]
+
+    async def insert(self, records: List[dict], **_: Any) -> None:
+        """Store the records."""
+        self.inserted.extend(records)
+
+    async def merge_sources(self, updates: List[dict], **_: Any) -> None:
+        """Store the updates of stored records."""
+        self.updates.extend(updates)
+
+
+def test_clean_batch() -> None:
+    """Checks that empty rows are dropped and categories are extracted."""
+    batch = pa.RecordBatch.from_pydict(
+        {
+            "Danh mục cấp 1": ["Phụ tùng", "Phụ tùng", None],
+            "Danh mục cấp 2": ["Lốp", None, "Đèn"],
+            "Danh mục cấp 4": ["  Lốp xe tải ", None, "   "],
+        },
+    )
+
+    contents, metadata = clean_batch(batch)
+
+    assert contents == ["Lốp xe tải"]
+    assert metadata == [{"Danh mục cấp 1": "Phụ tùng", "Danh mục cấp 2": "Lốp"}]
+
+
+def test_exact_duplicates_are_merged() -> None:
+    """Checks that rows differing in case, spaces or diacritics are merged."""
+    dedup = Deduplicator(max_sources=1)
+
+    contents, metadata, digests = dedup.exact(
+        ["Má phanh", "ma  PHANH", "Đèn pha"],
+        [{"Danh mục cấp 1": "Phanh"}, {"Danh mục cấp 1": "Xe"}, {}],
+    )
+    assert contents == ["Má phanh", "Đèn pha"]
+    assert dedup.annotate(digests[0], metadata[0]) == {
+        "Danh mục cấp 1": "Phanh",
+        "merged": 1,
+        "sources": [{"contents": "ma  PHANH", "Danh mục cấp 1": "Xe"}],
+    }
+    assert dedup.annotate(digests[1], metadata[1]) == {}
+    dedup.commit()
+
+    # Later batches update the stored row, up to max_sources sources.
+    assert dedup.exact(["MÁ PHANH", "Má phanh "], [{}, {}])[0] == []
+    assert dedup.pending_updates() == [
+        {"id": str(dedup.record_id(digests[0])), "merged": 2, "sources": []},
+    ]
+    assert dedup.merged_rows == 3
+
+
+def test_near_duplicates_are_merged() -> None:
+    """Checks that rows with close embeddings are merged into the first one."""
+    dedup = Deduplicator(similarity=0.99)
+    contents, metadata, digests = dedup.exact(
+        ["Lốp 90/90", "Lốp 90-90", "lop 90-90", "Đèn"],
+        [{}, {}, {}, {}],
+    )
+
+    kept = dedup.near(contents, metadata, digests, [[1, 0], [1, 0.01], [0, 1]])
+
+    assert kept == [0, 2]
+    assert dedup.annotate(digests[0], metadata[0]) == {
+        "merged": 2,
+        "sources": [{"contents": "Lốp 90-90"}, {"contents": "lop 90-90"}],
+    }
+    dedup.commit()
+    # Exact duplicates of a merged row go to the row kept for it.
+    dedup.exact(["LỐP 90-90"], [{}])
+    assert dedup.pending_updates()[0]["id"] == str(dedup.record_id(digests[0]))
+
+
+@pytest.mark.anyio
+async def test_rows_of_failed_batches_are_not_merged_into() -> None:
+    """Checks that duplicates of a row that failed to store are stored."""
+    vector_store = FailingVectorStore()
+    batches = [
+        pa.RecordBatch.from_pydict({"Danh mục cấp 4": ["Má phanh", "MÁ PHANH"]}),
+        pa.RecordBatch.from_pydict({"Danh mục cấp 4": ["ma phanh", "Má  phanh"]}),
+    ]
+
+    result = await ingest_batches(iter(batches), vector_store)
+
+    assert (result.inserted, result.failed_batches, result.failed_rows) == (1, 1, 1)
+    assert [record["contents"] for record in vector_store.inserted] == ["ma phanh"]
+    assert vector_store.inserted[0]["metadata"] == {
+        "merged": 1,
+        "sources": [{"contents": "Má  phanh"}],
+    }
+    assert vector_store.updates == []
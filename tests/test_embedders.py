@@ -0,0 +1,21 @@
+import math
+
+import pytest
+
+from app.services.embedders import HashingEmbedder
+
+
+@pytest.mark.anyio
+async def test_hashing_embedder_ranks_similar_texts_closer() -> None:
+    """Checks that hashed n-gram embeddings are normalized and meaningful."""
+    embedder = HashingEmbedder(dimension=256)
+    query, similar, other = await embedder.embed(
+        ["má phanh trước", "Má phanh trước xe", "lọc gió điều hòa"],
+    )
+
+    def similarity(first: list, second: list) -> float:
+        return sum(a * b for a, b in zip(first, second))
+
+    assert math.isclose(similarity(query, query), 1.0)
+    assert similarity(query, similar) > similarity(query, other)
+    assert await embedder.embed_query("má phanh trước") == query
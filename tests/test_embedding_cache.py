@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.utils.embedding_cache import EmbeddingCache
+
+
+def test_snapshots_of_workers_are_merged(tmp_path: Path) -> None:
+    """Checks that concurrent saves keep a complete snapshot of every worker."""
+    caches = []
+    for worker in range(8):
+        cache = EmbeddingCache(max_size=100)
+        cache.put(f"query {worker}", [float(worker), 1.0], hits=worker)
+        cache.put("shared", [0.0, 1.0], hits=10 + worker)
+        caches.append(cache)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda cache: cache.save_snapshot(tmp_path, "m"), caches))
+
+    assert len(list(tmp_path.glob("vectors-*.npy"))) == 1
+    loaded = EmbeddingCache(max_size=100)
+    assert loaded.load_snapshot(tmp_path, "m", limit=100) == 9
+    assert loaded.get("query 5") == [5.0, 1.0]
+    assert loaded.most_frequent(1)[0][::2] == ("shared", 17)
+    assert EmbeddingCache(max_size=100).load_snapshot(tmp_path, "other", 100) == 0
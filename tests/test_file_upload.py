@@ -0,0 +1,89 @@
+from typing import List
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from starlette import status
+
+from app.utils.vector_store import VectorStore
+
+CATALOG = "Danh mục cấp 1,Danh mục cấp 4\nPhanh,Má phanh\nĐèn,Đèn pha\n".encode()
+
+
+async def _upload(
+    client: AsyncClient,
+    fastapi_app: FastAPI,
+    collection: str,
+    catalog: bytes = CATALOG,
+) -> dict:
+    response = await client.post(
+        fastapi_app.url_path_for("upload_catalog_file"),
+        params={"collection": collection},
+        files={"file": ("catalog.csv", catalog, "text/csv")},
+    )
+    return {"status": response.status_code, **response.json()}
+
+
+@pytest.mark.anyio
+async def test_upload_replaces_the_collection(
+    client: AsyncClient,
+    fastapi_app: FastAPI,
+) -> None:
+    """
+    Checks that an uploaded file becomes the collection.
+
+    :param client: client for the app.
+    :param fastapi_app: current FastAPI application.
+    """
+    body = await _upload(client, fastapi_app, "upload_ok")
+
+    assert body["status"] == status.HTTP_200_OK
+    assert (body["inserted"], body["failed"]) == (2, 0)
+    response = await client.get(fastapi_app.url_path_for("list_collections"))
+    assert "upload_ok" in response.json()
+
+
+@pytest.mark.anyio
+async def test_failed_upload_keeps_the_collection(
+    client: AsyncClient,
+    fastapi_app: FastAPI,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Checks that rows failing to embed fail the upload without a swap.
+
+    :param client: client for the app.
+    :param fastapi_app: current FastAPI application.
+    :param monkeypatch: patches the embeddings.
+    """
+    await _upload(client, fastapi_app, "upload_failed")
+
+    async def provider_down(_: VectorStore, texts: List[str]) -> List[List[float]]:
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(VectorStore, "get_embeddings", provider_down)
+    body = await _upload(client, fastapi_app, "upload_failed")
+
+    assert body["status"] == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert (body["detail"]["inserted"], body["detail"]["failed"]) == (0, 2)
+    hits = await VectorStore().search("Má phanh", collection="upload_failed")
+    assert sorted(hit["contents"] for hit in hits) == ["Má phanh", "Đèn pha"]
+
+
+@pytest.mark.anyio
+async def test_empty_upload_is_rejected(
+    client: AsyncClient,
+    fastapi_app: FastAPI,
+) -> None:
+    """
+    Checks that a file without valid rows does not empty the collection.
+
+    :param client: client for the app.
+    :param fastapi_app: current FastAPI application.
+    """
+    empty = "Danh mục cấp 4\n \n".encode()
+    body = await _upload(client, fastapi_app, "upload_empty", empty)
+
+    assert body["status"] == status.HTTP_400_BAD_REQUEST
+    response = await client.get(fastapi_app.url_path_for("list_collections"))
+    assert "upload_empty" not in response.json()
@@ -0,0 +1,48 @@
+import logging
+from queue import SimpleQueue
+
+import pytest
+
+from app.config.logger_setup import DeferredQueueHandler
+from app.utils.log_utils import SampledLogger
+
+
+def test_sampled_logger_is_bounded(caplog: pytest.LogCaptureFixture) -> None:
+    """
+    Checks that per-row events produce a bounded amount of log output.
+
+    :param caplog: captured log records.
+    """
+    sampled = SampledLogger(logging.getLogger("test_sampled"), burst=5)
+    with caplog.at_level(logging.INFO, logger="test_sampled"):
+        for row in range(100_000):
+            sampled.event(logging.INFO, "Skipping row %s.", row)
+
+    assert sampled.count == 100_000
+    assert len(caplog.records) == sampled.logged == 10
+    assert sampled.suppressed == 100_000 - 10
+
+
+def test_queued_records_are_formatted_by_the_listener() -> None:
+    """Checks that records are queued unformatted, with their traceback."""
+    queue: SimpleQueue = SimpleQueue()
+    handler = DeferredQueueHandler(queue)
+    handler.setFormatter(logging.Formatter("never used %(message)s"))
+    logger = logging.getLogger("test_deferred")
+    logger.addHandler(handler)
+    logger.propagate = False
+    args = {"row": 1}
+    try:
+        try:
+            raise ValueError("bad row")
+        except ValueError:
+            logger.exception("Failed %s", args)
+        args["row"] = 2
+    finally:
+        logger.removeHandler(handler)
+
+    record = queue.get_nowait()
+    assert (record.msg, record.args) == ("Failed {'row': 1}", None)
+    formatted = logging.Formatter("%(levelname)s %(message)s").format(record)
+    assert formatted.startswith("ERROR Failed {'row': 1}\nTraceback")
+    assert "ValueError: bad row" in formatted
@@ -0,0 +1,32 @@
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from starlette import status
+
+
+@pytest.mark.anyio
+async def test_server_timing(client: AsyncClient, fastapi_app: FastAPI) -> None:
+    """
+    Checks that responses report their timings.
+
+    :param client: client for the app.
+    :param fastapi_app: current FastAPI application.
+    """
+    url = fastapi_app.url_path_for("health_check")
+    response = await client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert "total;dur=" in response.headers["Server-Timing"]
+
+
+@pytest.mark.anyio
+async def test_metrics(client: AsyncClient, fastapi_app: FastAPI) -> None:
+    """
+    Checks that metrics are exported in the Prometheus format.
+
+    :param client: client for the app.
+    :param fastapi_app: current FastAPI application.
+    """
+    await client.get(fastapi_app.url_path_for("health_check"))
+    response = await client.get(fastapi_app.url_path_for("export_metrics"))
+    assert response.status_code == status.HTTP_200_OK
+    assert "app_request_duration_seconds" in response.text
@@ -0,0 +1,55 @@
+import pytest
+from aiohttp import web
+from prometheus_client import REGISTRY
+
+from app.services.embedders import OpenAIEmbedder
+from app.services.openai_client import get_openai, provider_session
+
+
+@pytest.fixture
+async def embeddings_api(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Serves the embeddings endpoint of the OpenAI API locally."""
+
+    async def create_embeddings(request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response(
+            {
+                "data": [
+                    {"index": index, "embedding": [float(index), 1.0]}
+                    for index, _ in enumerate(body["input"])
+                ],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            },
+        )
+
+    app = web.Application()
+    app.router.add_post("/v1/embeddings", create_embeddings)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    monkeypatch.setattr(get_openai(), "api_base", f"http://127.0.0.1:{port}/v1")
+    yield
+    await provider_session.aclose()
+    await runner.cleanup()
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("embeddings_api")
+async def test_provider_calls_reuse_connections() -> None:
+    """Checks that consecutive calls share one keep-alive connection."""
+    embedder = OpenAIEmbedder("test-key", "test-model")
+
+    def connections(kind: str) -> float:
+        return REGISTRY.get_sample_value(
+            "app_provider_connections_total",
+            {"kind": kind},
+        ) or 0.0
+
+    new, reused = connections("new"), connections("reused")
+    for _ in range(3):
+        assert await embedder.embed(["a", "b"]) == [[0.0, 1.0], [1.0, 1.0]]
+
+    assert connections("new") - new == 1
+    assert connections("reused") - reused == 2
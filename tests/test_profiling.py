@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils.loop_monitor import LoopMonitor
+from app.utils.profiler import SamplingProfiler
+
+
+def _blocking_call() -> None:
+    time.sleep(0.2)
+
+
+@pytest.mark.anyio
+async def test_loop_stalls_record_the_blocking_call() -> None:
+    """Checks that a blocking call is recorded with its stack and duration."""
+    monitor = LoopMonitor(interval=0.01, threshold=0.05, size=10)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    _blocking_call()
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    stalls = monitor.entries()
+    assert len(stalls) == 1
+    assert stalls[0]["finished"]
+    assert stalls[0]["duration_ms"] >= 150
+    assert "in _blocking_call" in stalls[0]["stack"][-1]
+
+
+@pytest.mark.anyio
+async def test_profile_of_the_next_requests() -> None:
+    """Checks that only the claimed requests are profiled, as folded stacks."""
+    profiler = SamplingProfiler()
+
+    async def serve() -> None:
+        session = profiler.claim()
+        try:
+            _blocking_call()
+        finally:
+            if session is not None:
+                profiler.finish(session)
+
+    recording = asyncio.create_task(profiler.profile(1, 0.005, timeout=5.0))
+    await asyncio.sleep(0.01)
+    await serve()
+    assert profiler.claim() is None
+    profile = await recording
+
+    assert profile.requests == 1
+    assert profile.samples > 0
+    stack, count = profile.folded.splitlines()[0].rsplit(" ", 1)
+    assert stack.endswith(f"{__name__}:serve;{__name__}:_blocking_call")
+    assert int(count) > 0
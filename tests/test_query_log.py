@@ -0,0 +1,82 @@
+from typing import Any, List
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql
+from starlette import status
+
+from app.db.models.record import Record
+from app.utils.query_log import _explain, plan_uses_vector_index
+
+
+def test_plan_uses_vector_index() -> None:
+    """Checks that vector index scans are told apart from sequential scans."""
+    index_scan = {
+        "Node Type": "Limit",
+        "Plans": [
+            {
+                "Node Type": "Index Scan",
+                "Index Name": "ix_records_embedding_hnsw",
+                "Order By": "(embedding <-> '[0.1,0.2]'::vector)",
+            },
+        ],
+    }
+    seq_scan = {
+        "Node Type": "Limit",
+        "Plans": [{"Node Type": "Sort", "Plans": [{"Node Type": "Seq Scan"}]}],
+    }
+    assert plan_uses_vector_index(index_scan)
+    assert not plan_uses_vector_index(seq_scan)
+
+
+@pytest.mark.anyio
+async def test_only_selects_are_analyzed() -> None:
+    """Checks that sampled plans of writes do not execute them again."""
+    executed: List[str] = []
+
+    class Session:
+        """Session recording the executed statements."""
+
+        async def __aenter__(self) -> "Session":
+            return self
+
+        async def __aexit__(self, *_: object) -> None:
+            pass
+
+        async def execute(self, statement: Any) -> Any:
+            """Record the statement."""
+            executed.append(str(statement.compile(dialect=postgresql.dialect())))
+            return self
+
+        def scalar(self) -> list:
+            """Return an empty plan."""
+            return []
+
+        async def rollback(self) -> None:
+            """Do nothing."""
+
+    await _explain(select(Record.id), Session)
+    await _explain(delete(Record), Session)
+
+    assert executed[0].startswith("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT")
+    assert executed[1].startswith("EXPLAIN (FORMAT JSON) DELETE")
+
+
+@pytest.mark.anyio
+async def test_slow_queries_require_admin(
+    client: AsyncClient,
+    fastapi_app: FastAPI,
+) -> None:
+    """
+    Checks that the slow query log is not public.
+
+    :param client: client for the app.
+    :param fastapi_app: current FastAPI application.
+    """
+    response = await client.get(fastapi_app.url_path_for("get_slow_queries"))
+    assert response.status_code in {
+        status.HTTP_401_UNAUTHORIZED,
+        status.HTTP_403_FORBIDDEN,
+    }
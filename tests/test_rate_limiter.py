@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from app.services.rate_limiter import SharedRateLimiter
+from app.utils.priority import Priority
+
+
+def test_batch_calls_leave_reserve_to_interactive(tmp_path: Path) -> None:
+    """
+    Checks that batch calls cannot use the interactive reserve.
+
+    :param tmp_path: directory for the limiter state.
+    """
+    # 60 requests per minute, so buckets hold 10 requests.
+    limiter = SharedRateLimiter(
+        tmp_path / "state.bin",
+        rpm=60,
+        tpm=1_000_000,
+        interactive_reserve=0.2,
+        retries=0,
+    )
+    granted = 0
+    while limiter.try_acquire(1, Priority.BATCH) == 0:
+        granted += 1
+    assert granted == 8
+    assert limiter.try_acquire(1, Priority.INTERACTIVE) == 0
+
+
+def test_rate_limited_halves_shared_rate(tmp_path: Path) -> None:
+    """
+    Checks that a 429 seen by one worker slows down the others.
+
+    :param tmp_path: directory for the limiter state.
+    """
+    path = tmp_path / "state.bin"
+    worker = SharedRateLimiter(path, 60, 1_000_000, 0.2, 0)
+    other_worker = SharedRateLimiter(path, 60, 1_000_000, 0.2, 0)
+
+    worker.on_rate_limited(retry_after=5)
+
+    assert other_worker.try_acquire(1, Priority.INTERACTIVE) > 4
+    assert other_worker.scale == 0.5
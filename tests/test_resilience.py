@@ -0,0 +1,95 @@
+import asyncio
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import pytest
+from openai.error import APIConnectionError
+
+from app.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    LatencyTracker,
+    call_provider,
+    hedged,
+    request_deadline,
+)
+
+T = TypeVar("T")
+
+
+def test_circuit_opens_and_lets_one_trial_through() -> None:
+    """Checks that an open circuit fails fast until its reset timeout."""
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+
+    # Reset timeout passed: one trial call, the next one fails fast.
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    breaker.record_success()
+    breaker.check()
+
+
+@pytest.mark.anyio
+async def test_circuit_closes_after_trial_call() -> None:
+    """Checks that callers failing fast still let the trial call through."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+
+    async def fail(_: Optional[float]) -> None:
+        raise APIConnectionError("Connection refused")
+
+    async def succeed(_: Optional[float]) -> str:
+        return "ok"
+
+    async def call(request: Callable[[Optional[float]], Awaitable[T]]) -> T:
+        breaker.fail_fast()
+        return await call_provider(breaker, request, None)
+
+    with pytest.raises(APIConnectionError):
+        await call(fail)
+    with pytest.raises(CircuitOpenError):
+        await call(succeed)
+
+    await asyncio.sleep(0.06)
+    assert await call(succeed) == "ok"
+    assert not breaker.is_open
+    assert await call(succeed) == "ok"
+
+
+@pytest.mark.anyio
+async def test_trial_is_released_when_the_call_does_not_finish() -> None:
+    """Checks that a trial ending without a provider answer frees its slot."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    async def broken(_: Optional[float]) -> None:
+        raise ValueError("bad request")
+
+    async def succeed(_: Optional[float]) -> str:
+        return "ok"
+
+    with request_deadline(-1), pytest.raises(DeadlineExceededError):
+        await call_provider(breaker, succeed, None)
+    with pytest.raises(ValueError, match="bad request"):
+        await call_provider(breaker, broken, None)
+
+    assert await call_provider(breaker, succeed, None) == "ok"
+    assert not breaker.is_open
+
+
+@pytest.mark.anyio
+async def test_hedged_request_wins_over_stalled_one() -> None:
+    """Checks that a duplicate is sent once a call is slower than the p95."""
+    latency = LatencyTracker(min_samples=1)
+    latency.observe(0.01)
+    delays = [10.0, 0.0]
+
+    async def request() -> float:
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert await asyncio.wait_for(hedged(request, latency), timeout=1) == 0.0
@@ -0,0 +1,141 @@
+import uuid
+from typing import List, Optional, Tuple
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.settings import settings
+from app.utils.vector_store import VectorStore
+
+ROWS = [
+    ("Má phanh trước", "Phanh", "Má phanh"),
+    ("Má phanh sau", "Phanh", "Má phanh"),
+    ("Dầu phanh", "Phanh", "Dầu"),
+    ("Phanh đĩa", "Phanh", None),
+    ("Đèn pha", "Đèn", "Đèn trước"),
+    ("Lọc gió", None, None),
+]
+
+
+@pytest.fixture
+async def vector_store(_engine: AsyncEngine) -> VectorStore:
+    """
+    Vector store with a small catalog in the "search_path" collection.
+
+    :param _engine: current engine.
+    :return: the vector store.
+    """
+    vector_store = VectorStore()
+    await vector_store.create_tables()
+    contents = [content for content, _, _ in ROWS]
+    embeddings = await vector_store.get_embeddings(contents)
+    async with vector_store.replace_collection("search_path") as staging:
+        await vector_store.insert(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "metadata": {
+                        key: value
+                        for key, value in zip(
+                            ("Danh mục cấp 1", "Danh mục cấp 2"),
+                            (level_1, level_2),
+                        )
+                        if value is not None
+                    },
+                    "contents": content,
+                    "embedding": embedding,
+                }
+                for (content, level_1, level_2), embedding in zip(ROWS, embeddings)
+            ],
+            collection="search_path",
+            table=staging,
+        )
+    return vector_store
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    ("metadata_filter", "categories"),
+    [
+        (None, None),
+        ({"Danh mục cấp 2": "Má phanh"}, None),
+        (None, [("Phanh", "Dầu"), ("Đèn", "Đèn trước")]),
+        ({"Danh mục cấp 1": "Phanh"}, [("Phanh", "Má phanh")]),
+        (None, [("Phanh", "Dầu"), ("Phanh", ""), ("", "")]),
+    ],
+)
+async def test_fast_path_matches_orm(
+    vector_store: VectorStore,
+    metadata_filter: Optional[dict],
+    categories: Optional[List[Tuple[str, str]]],
+) -> None:
+    """Checks that the prepared statement finds the hits of the ORM query."""
+    embedding = await vector_store.embedder.embed_query("má phanh")
+
+    fast = await vector_store._search_fast(  # noqa: SLF001
+        embedding, 3, metadata_filter, "search_path", categories,
+    )
+    orm = await vector_store._search_orm(  # noqa: SLF001
+        embedding, 3, metadata_filter, "search_path", categories,
+    )
+
+    assert fast
+    assert [(hit["id"], hit["metadata"]) for hit in fast] == [
+        (hit["id"], hit["metadata"]) for hit in orm
+    ]
+    assert [hit["score"] for hit in fast] == pytest.approx(
+        [hit["score"] for hit in orm],
+    )
+
+
+@pytest.mark.anyio
+async def test_collection_without_records_has_no_hits(
+    vector_store: VectorStore,
+) -> None:
+    """Checks that both paths find nothing in a collection never uploaded."""
+    embedding = await vector_store.embedder.embed_query("má phanh")
+
+    for search in (vector_store._search_fast, vector_store._search_orm):  # noqa: SLF001
+        assert await search(embedding, 3, None, "never_uploaded", None) == []
+
+
+@pytest.mark.anyio
+async def test_routing_picks_the_closest_categories(
+    vector_store: VectorStore,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Checks that a query is routed to the categories of its records."""
+    monkeypatch.setattr(settings, "routing_level_1_categories", 1)
+    monkeypatch.setattr(settings, "routing_level_2_categories", 1)
+
+    for query, categories in [
+        ("Đèn pha", [("Đèn", "Đèn trước")]),
+        ("Phanh đĩa", [("Phanh", "")]),
+        ("Lọc gió", [("", "")]),
+    ]:
+        embedding = await vector_store.embedder.embed_query(query)
+        routed = await vector_store._route_categories(  # noqa: SLF001
+            embedding, "search_path",
+        )
+        assert routed == categories
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("fast_path", [True, False])
+async def test_hierarchical_search_finds_uncategorized_records(
+    vector_store: VectorStore,
+    monkeypatch: pytest.MonkeyPatch,
+    fast_path: bool,
+) -> None:
+    """Checks that records missing a category are found by routed searches."""
+    monkeypatch.setattr(settings, "search_fast_path", fast_path)
+
+    for content in ("Phanh đĩa", "Lọc gió", "Má phanh sau"):
+        embedding = await vector_store.embedder.embed_query(content)
+        hits = await vector_store.search_by_embedding(
+            embedding,
+            limit=1,
+            collection="search_path",
+            mode="hierarchical",
+        )
+        assert [hit["contents"] for hit in hits] == [content]
@@ -0,0 +1,50 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+from app.services.shared_state import CentroidIndex
+
+
+def _centroid(
+    level: int,
+    category_1: str,
+    category_2: str,
+    vector: list,
+) -> SimpleNamespace:
+    return SimpleNamespace(
+        level=level,
+        category_1=category_1,
+        category_2=category_2,
+        centroid=vector,
+    )
+
+
+def test_centroid_snapshot_routes_to_closest_categories(tmp_path: Path) -> None:
+    """
+    Checks routing with centroids mapped from a shared snapshot.
+
+    :param tmp_path: directory of the snapshot.
+    """
+    writer = CentroidIndex(tmp_path)
+    writer.write(
+        "default",
+        [
+            _centroid(1, "Phanh", "", [1.0, 0.1, 0.0]),
+            _centroid(1, "Lọc", "", [0.0, 0.1, 1.0]),
+            _centroid(2, "Phanh", "Má phanh", [1.0, 0.0, 0.0]),
+            _centroid(2, "Phanh", "Đĩa phanh", [0.8, 0.6, 0.0]),
+            _centroid(2, "Lọc", "Lọc gió", [0.9, 0.0, 0.1]),
+        ],
+    )
+
+    snapshot = CentroidIndex(tmp_path).get("default")
+
+    assert snapshot is not None
+    assert snapshot.route([2.0, 0.0, 0.0], 1, 1) == [("Phanh", "Má phanh")]
+    assert snapshot.route([2.0, 0.0, 0.0], 1, 5) == [
+        ("Phanh", "Má phanh"),
+        ("Phanh", "Đĩa phanh"),
+    ]
+
+    writer.write("default", [])
+    assert writer.get("default") is None
+    assert not list(tmp_path.glob("*.npy"))
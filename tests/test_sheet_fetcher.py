@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Generator, List, Optional
+
+import pytest
+
+from app.services.sheet_fetcher import SheetFetcher
+from app.utils.doc_util import _parse_sheet
+
+
+class SheetHandler(BaseHTTPRequestHandler):
+    """Serves the sheet of the server, answering 304 to a matching ETag."""
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Send the sheet, or 304 when the client has its ETag."""
+        server: "SheetServer" = self.server  # type: ignore[assignment]
+        etag = f'"{hashlib.sha256(server.body).hexdigest()[:16]}"'
+        server.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, *_: object) -> None:
+        """Keep the test output quiet."""
+
+
+class SheetServer(ThreadingHTTPServer):
+    """Local HTTP server of one sheet."""
+
+    body = b"name,price\nbrake,1\n"
+    requests: List[Optional[str]]
+
+    @property
+    def url(self) -> str:
+        """URL of the sheet."""
+        return f"http://127.0.0.1:{self.server_port}/sheet.csv"
+
+
+@pytest.fixture
+def sheet_server() -> Generator[SheetServer, None, None]:
+    """
+    Start a local HTTP server serving a sheet.
+
+    :yield: the server.
+    """
+    server = SheetServer(("127.0.0.1", 0), SheetHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.anyio
+async def test_sheet_is_downloaded_only_when_changed(
+    sheet_server: SheetServer,
+    tmp_path: Path,
+) -> None:
+    """Checks that unchanged sheets are revalidated and changed ones replaced."""
+    fetcher = SheetFetcher(tmp_path, timeout=5)
+    try:
+        first = await fetcher.fetch(sheet_server.url)
+        assert first.name == f"{hashlib.sha256(sheet_server.body).hexdigest()}.csv"
+        assert first.read_bytes() == sheet_server.body
+
+        # Unchanged: 304, the cached copy is reused.
+        assert await fetcher.fetch(sheet_server.url) == first
+        assert sheet_server.requests[0] is None
+        assert sheet_server.requests[1] is not None
+
+        # Changed: downloaded again, the old copy is removed.
+        sheet_server.body = b"name,price\nbrake,2\n"
+        changed = await fetcher.fetch(sheet_server.url)
+        assert changed != first
+        assert changed.read_bytes() == sheet_server.body
+        assert not first.exists()
+        assert len(sheet_server.requests) == 3
+    finally:
+        await fetcher.aclose()
+
+
+@pytest.mark.anyio
+async def test_locks_are_released_after_fetches(
+    sheet_server: SheetServer,
+    tmp_path: Path,
+) -> None:
+    """Checks that concurrent fetches share a lock dropped once they are done."""
+    fetcher = SheetFetcher(tmp_path, timeout=5)
+    try:
+        paths = await asyncio.gather(
+            *(fetcher.fetch(sheet_server.url) for _ in range(5)),
+        )
+        assert len(set(paths)) == 1
+        # Serialized: one download, then revalidations.
+        assert sheet_server.requests.count(None) == 1
+        assert fetcher._locks == {}  # noqa: SLF001
+    finally:
+        await fetcher.aclose()
+
+
+@pytest.mark.anyio
+async def test_parsed_sheets_are_cached_by_content(tmp_path: Path) -> None:
+    """Checks that a sheet with the same content is parsed once."""
+    body = "name,price\nbrake,1\n"
+    path = tmp_path / f"{hashlib.sha256(body.encode()).hexdigest()}.csv"
+    path.write_text(body, encoding="utf-8")
+
+    parsed = await _parse_sheet(path)
+
+    assert parsed["name"].tolist() == ["brake"]
+    assert await _parse_sheet(path) is parsed
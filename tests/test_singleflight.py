@@ -0,0 +1,33 @@
+import asyncio
+import unicodedata
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+from app.utils.text_utils import normalize_query
+
+
+@pytest.mark.anyio
+async def test_identical_calls_share_one_computation() -> None:
+    """Checks that concurrent calls of one key run once."""
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def compute() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flight.do("key", compute) for _ in range(10)))
+
+    assert results == [1] * 10
+    assert calls == 1
+    assert len(flight) == 0
+    assert await flight.do("key", compute) == 2
+
+
+def test_normalize_query() -> None:
+    """Checks that case, spacing and Unicode forms are normalized."""
+    decomposed = unicodedata.normalize("NFD", "Má  phanh\ttrước ")
+    assert normalize_query(decomposed) == unicodedata.normalize("NFC", "má phanh trước")
@@ -0,0 +1,49 @@
+import json
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.utils.snapshot import (
+    SnapshotWriter,
+    iter_snapshot_records,
+    read_manifest,
+    write_manifest,
+)
+
+
+def test_snapshot_round_trip(tmp_path: Path) -> None:
+    """Checks that records are read back in order with their embeddings."""
+    records = [
+        (uuid.uuid4(), json.dumps({"Danh mục cấp 1": "Phanh"}), f"row {i}", i)
+        for i in range(5)
+    ]
+    writer = SnapshotWriter(tmp_path, "brand_a", len(records), 4, batch_size=2)
+    for record_id, metadata, contents, value in records:
+        writer.write(record_id, metadata, contents, np.full(4, value, np.float32))
+    write_manifest(tmp_path, "hashing:4", 4, {"brand_a": writer.close()})
+
+    manifest = read_manifest(tmp_path, "hashing:4", 4)
+    restored = list(
+        iter_snapshot_records(
+            tmp_path,
+            "brand_a",
+            manifest["collections"]["brand_a"],
+            batch_size=3,
+        ),
+    )
+
+    assert [row[:4] for row in restored] == [
+        (record_id, "brand_a", metadata, contents)
+        for record_id, metadata, contents, _ in records
+    ]
+    assert [row[4].tolist() for row in restored] == [[i] * 4 for i in range(5)]
+
+
+def test_snapshot_of_another_model_is_rejected(tmp_path: Path) -> None:
+    """Checks that embeddings of another model are never restored."""
+    write_manifest(tmp_path, "openai:text-embedding-ada-002", 1536, {})
+
+    with pytest.raises(ValueError, match="made with"):
+        read_manifest(tmp_path, "local:/models/e5", 1536)
@@ -0,0 +1,19 @@
+import subprocess
+import sys
+
+from benchmarks.startup import LAZY_MODULES
+
+
+def test_heavy_dependencies_are_imported_lazily() -> None:
+    """Checks that importing the application skips modules queries do not use."""
+    code = (
+        "import sys, app.web.application; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == ""
@@ -0,0 +1,34 @@
+from app.utils.suggest import SuggestIndex, Suggestion
+from app.utils.text_utils import fold_accents
+
+SUGGESTIONS = [
+    Suggestion("Phụ tùng xe máy", 1),
+    Suggestion("Đèn xe", 2),
+    Suggestion("Má phanh trước Honda", 4),
+    Suggestion("Má phanh sau Yamaha", 4),
+    Suggestion("Đèn pha LED Honda", 4),
+]
+
+
+def test_fold_accents() -> None:
+    """Checks that case and Vietnamese diacritics are ignored."""
+    assert fold_accents("  Đèn PHA  Lốp ") == "den pha lop"
+
+
+def test_prefix_matches() -> None:
+    """Checks that texts and words of texts match by prefix, categories first."""
+    index = SuggestIndex(SUGGESTIONS)
+
+    assert index.search("den", 10) == [SUGGESTIONS[1], SUGGESTIONS[4]]
+    assert index.search("phanh tr", 10) == [SUGGESTIONS[2]]
+    assert index.search("honda", 1) == [SUGGESTIONS[4]]
+    assert index.search(" ", 10) == []
+
+
+def test_misspelled_words_are_corrected() -> None:
+    """Checks that queries with typos match the closest words."""
+    index = SuggestIndex(SUGGESTIONS)
+
+    assert index.search("ma phang", 10) == [SUGGESTIONS[3], SUGGESTIONS[2]]
+    assert index.search("yamahq", 10) == [SUGGESTIONS[3]]
+    assert index.search("xyzw", 10) == []